@@ -2,14 +2,17 @@
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from core import database
+from core.pagination import page_response
 from app.activity import schemas
 from app.activity.api.v1 import service
 
 
 get_db = database.get_db
+get_async_db = database.get_async_db
 
 router = APIRouter(prefix="/api/v1/activity", tags=["activity"])
 
@@ -19,26 +22,26 @@ def create_activity(request: schemas.ActivityCreateRequestSchema, db: Session=De
     return service.create_activity(request, db)
 
 @router.get('/detail', response_model=schemas.ActivityRetrievalResponseSchema)
-def get_activity(id: Optional[int] = None, user_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_activity(id: Optional[int] = None, user_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """Retrieve Activity Details from Single User"""
-    return service.retrieve_activity(id, user_id, db) 
+    return await service.retrieve_activity_async(id, user_id, db)
 
 @router.get('/details', response_model=List[schemas.ActivityRetrievalResponseSchema])
-def get_activity_details(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, db: Session=Depends(get_db)):
+def get_activity_details(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, cursor: Optional[str] = None, db: Session=Depends(get_db)):
     """Retrieve Activities by List from Multiple Users"""
-    return service.retrieve_activity_list(db, user_ids, skip, limit) 
+    return page_response(service.retrieve_activity_list(db, user_ids, skip, limit, cursor))
 
 @router.put('/update', response_model=schemas.ActivityUpdateResponseSchema)
 def update_activity(request: schemas.ActivityUpdateRequestSchema, db: Session=Depends(get_db)):
     """Update Activity"""
     return service.update_activity(request, db) 
 
-#@router.put('/update/logged-in')
-#def update_activity(db: Session=Depends(get_db)):
-#    """Update Activity"""
-#    return service.update_activity_logged_in(db) 
+@router.get('/update/logged-in')
+def update_activity_logged_in(db: Session=Depends(get_db)):
+    """Reset of the stored logged_in column, responses derive it on read"""
+    return service.update_activity_logged_in(db)
 
 @router.put('/daily-check-in', response_model=schemas.DailyCheckInResponseSchema)
-def daily_check_in(request: schemas.DailyCheckInRequestSchema, db: Session=Depends(get_db)):
+async def daily_check_in(request: schemas.DailyCheckInRequestSchema, db: AsyncSession=Depends(get_async_db)):
     """Daily check in for user"""
-    return service.daily_check_in(request, db) 
+    return await service.daily_check_in_async(request, db) 
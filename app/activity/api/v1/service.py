@@ -1,16 +1,21 @@
 """Actvity App Business Logics"""
 
 import logging
-import pytz
-from datetime import datetime, timedelta
 from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
-from app.activity import schemas
+from app.activity import check_in, jobs, schemas
 from app.activity.models import ActivityModel
 from app.point.models import PointModel
 from app.point.schemas import PointSchema
+from app.point import leaderboard as point_leaderboard
+from app.user import cache as user_cache
+from core.constants import Constants
+from core.pagination import Page, decode_cursor, page_of, paginate
+from core.upsert import upsert
 
 def create_activity(request: schemas.ActivityCreateRequestSchema, db:Session) -> schemas.ActivityCreateResponseSchema:
     """Create Activity"""
@@ -18,108 +23,104 @@ def create_activity(request: schemas.ActivityCreateRequestSchema, db:Session) ->
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User ID and activity are required")
 
     try:
-        db_activity = db.query(ActivityModel).filter(ActivityModel.user_id==request.user_id).first()
-
-        if db_activity:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Activity already exists")
-
-        new_activity=ActivityModel(
-            user_id=request.user_id,
-            logged_in=True, # FIXME: change to not_yet_claim_daily = True
-            login_streak=0,
-            total_logins=0,
-            last_action_time=None,
-            last_login_time=None,
-            custom_logs=request.activity.custom_logs
+        # user_id is unique, creating twice returns the activity already there
+        new_activity = upsert(
+            db,
+            ActivityModel,
+            dict(
+                user_id=request.user_id,
+                logged_in=True, # FIXME: change to not_yet_claim_daily = True
+                login_streak=0,
+                total_logins=0,
+                last_action_time=None,
+                last_login_time=None,
+                custom_logs=request.activity.custom_logs
+            ),
+            ["user_id"],
         )
 
-        db.add(new_activity)
-        db.commit()
-        db.refresh(new_activity)
-
-        return schemas.ActivityCreateResponseSchema(
+        response = schemas.ActivityCreateResponseSchema(
             user_id=new_activity.user_id,
-            activity=schemas.ActivityBaseSchema(
-                id=new_activity.id,
-                logged_in=new_activity.logged_in,
-                login_streak=new_activity.login_streak,
-                total_logins=new_activity.total_logins,
-                last_action_time=new_activity.last_action_time.astimezone(pytz.timezone('Asia/Singapore')) if new_activity.last_action_time else None,  
-                last_login_time=new_activity.last_login_time.astimezone(pytz.timezone('Asia/Singapore')) if new_activity.last_login_time else None,  
-                custom_logs=new_activity.custom_logs,
-                updated_at=new_activity.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if new_activity.updated_at else None, 
-                created_at=new_activity.created_at.astimezone(pytz.timezone('Asia/Singapore')) if new_activity.created_at else None, 
-            )
+            activity=_activity_base(new_activity)
         )
+        user_id = new_activity.user_id
+        db.commit()
+        user_cache.invalidate_user(user_id)
+        return response
 
     except Exception as e:
         logging.error(f"An error occured: {e}")
 
     
-def retrieve_activity(id:Optional[int], user_id:Optional[int], db: Session) -> schemas.ActivityRetrievalResponseSchema:
-    """Retrieve Activity Details from Single User"""
+def _activity_filters(id: Optional[int], user_id: Optional[int]):
+    """Build the filters of a single activity lookup"""
     if not id and not user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing id or user_id")
 
-    try:
-        base_query = db.query(ActivityModel)
-        filters = []
+    filters = []
+    if id is not None:
+        filters.append(ActivityModel.id==id)
 
-        if id is not None:
-            filters.append(ActivityModel.id==id)
+    if user_id is not None:
+        filters.append(ActivityModel.user_id==user_id)
+    return filters
 
-        if user_id is not None:
-            filters.append(ActivityModel.user_id==user_id)
 
-        if filters:
-            existing_activity = base_query.filter(*filters).first()
+def retrieve_activity(id:Optional[int], user_id:Optional[int], db: Session) -> schemas.ActivityRetrievalResponseSchema:
+    """Retrieve Activity Details from Single User"""
+    filters = _activity_filters(id, user_id)
+
+    try:
+        existing_activity = db.query(ActivityModel).filter(*filters).first()
 
-            if not existing_activity:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Activity not found")
+        if not existing_activity:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Activity not found")
             
-            return schemas.ActivityRetrievalResponseSchema(
-                user_id=existing_activity.user_id,
-                activity=schemas.ActivityBaseSchema(
-                    id=existing_activity.id,
-                    logged_in=existing_activity.logged_in,
-                    login_streak=existing_activity.login_streak,
-                    total_logins=existing_activity.total_logins,
-                    last_action_time=existing_activity.last_action_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_action_time else None,
-                    last_login_time=existing_activity.last_login_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_login_time else None,
-                    created_at=existing_activity.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.created_at else None, 
-                    updated_at=existing_activity.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.updated_at else None, 
-                    custom_logs=existing_activity.custom_logs
-                )
-            )
+        return schemas.ActivityRetrievalResponseSchema(
+            user_id=existing_activity.user_id,
+            activity=_activity_base(existing_activity)
+        )
             
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
-def retrieve_activity_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15) -> List[schemas.ActivityRetrievalResponseSchema]:
+
+async def retrieve_activity_async(id:Optional[int], user_id:Optional[int], db: AsyncSession) -> schemas.ActivityRetrievalResponseSchema:
+    """Async variant of retrieve_activity"""
+    filters = _activity_filters(id, user_id)
+
+    try:
+        result = await db.execute(select(ActivityModel).where(*filters).limit(1))
+        existing_activity = result.scalars().first()
+
+        if not existing_activity:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Activity not found")
+
+        return schemas.ActivityRetrievalResponseSchema(
+            user_id=existing_activity.user_id,
+            activity=_activity_base(existing_activity)
+        )
+
+    except Exception as e:
+        logging.error(f"An error occurred: {e}")
+
+def retrieve_activity_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15, cursor: Optional[str] = None) -> Page:
     """Retrieve Activities by List from Multiple Users"""
+    after_id = decode_cursor(cursor)
+
     try:
+        query = db.query(ActivityModel)
         if user_ids:
-            existing_activities = db.query(ActivityModel).filter(ActivityModel.user_id.in_(user_ids)).offset(skip).limit(limit).all()
-        else:
-            existing_activities = db.query(ActivityModel).offset(skip).limit(limit).all()
+            query = query.filter(ActivityModel.user_id.in_(user_ids))
+        existing_activities, next_cursor = page_of(paginate(query, ActivityModel.id, skip, limit, after_id).all(), limit)
             
-        return [
+        return Page([
             schemas.ActivityRetrievalResponseSchema(
                 user_id=existing_activity.user_id,
-                activity=schemas.ActivityBaseSchema(
-                    id=existing_activity.id,
-                    logged_in=existing_activity.logged_in,
-                    login_streak=existing_activity.login_streak,
-                    total_logins=existing_activity.total_logins,
-                    last_action_time=existing_activity.last_action_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_action_time else None,
-                    last_login_time=existing_activity.last_login_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_login_time else None,
-                    created_at=existing_activity.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.created_at else None, 
-                    updated_at=existing_activity.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.updated_at else None, 
-                    custom_logs=existing_activity.custom_logs
-                )
+                activity=_activity_base(existing_activity)
             )
             for existing_activity in existing_activities
-        ]
+        ], next_cursor)
         
     except Exception as e:
         logging.error(f"An error occurred: {e}")
@@ -141,44 +142,20 @@ def update_activity(request: schemas.ActivityUpdateRequestSchema, db: Session) -
                     setattr(existing_activity, field, value)
         
         db.commit()
+        user_cache.invalidate_user(existing_activity.user_id)
         db.refresh(existing_activity)
         
         return schemas.ActivityUpdateResponseSchema(
             user_id=existing_activity.user_id,
-            activity=schemas.ActivityBaseSchema(
-                id=existing_activity.id,
-                logged_in=existing_activity.logged_in,
-                login_streak=existing_activity.login_streak,
-                total_logins=existing_activity.total_logins,
-                last_action_time=existing_activity.last_action_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_action_time else None, 
-                last_login_time=existing_activity.last_login_time.astimezone(pytz.timezone('Asia/Singapore'))  if existing_activity.last_login_time else None, 
-                created_at=existing_activity.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.created_at else None, 
-                updated_at=existing_activity.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.updated_at else None, 
-                custom_logs=existing_activity.custom_logs
-            )
+            activity=_activity_base(existing_activity)
         )
         
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
-def update_activity_logged_in(db: Session):
-    """Update Activity Logged In"""
-    try:
-        existing_activity = db.query(ActivityModel).all()
-        
-        if not existing_activity:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Activity not found")
-        
-        for activity in existing_activity:
-            activity.logged_in = True
-        
-        db.commit()
-        db.refresh(existing_activity)
-        
-        return "Update to logged_in as True"
-        
-    except Exception as e:
-        logging.error(f"An error occurred: {e}")
+def update_activity_logged_in(db: Session) -> dict:
+    """logged_in reset, resumes the current run and stops before the function timeout"""
+    return jobs.reset_logged_in(db, max_seconds=Constants.job_max_seconds).as_dict()
 
 def delete_activity(id: int, db: Session):
     """Delete Activity"""
@@ -188,6 +165,7 @@ def delete_activity(id: int, db: Session):
         if db_activity:
             db.delete(db_activity)
             db.commit()
+            user_cache.invalidate_user(db_activity.user_id)
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Activity {id} not found")
         
@@ -197,78 +175,55 @@ def delete_activity(id: int, db: Session):
     
 #TODO: get by date range
 
+def _activity_base(existing_activity: ActivityModel) -> schemas.ActivityBaseSchema:
+    """Build the activity payload from a loaded activity"""
+    return schemas.ActivityBaseSchema.model_validate(existing_activity)
+
+
+def _daily_check_in_response(existing_activity: ActivityModel, existing_point: PointModel) -> schemas.DailyCheckInResponseSchema:
+    """Build the daily check in response from the updated rows"""
+    return schemas.DailyCheckInResponseSchema(
+        activity=_activity_base(existing_activity),
+        point=PointSchema.model_validate(existing_point)
+    )
+
+
 def daily_check_in(request: schemas.DailyCheckInRequestSchema, db: Session) -> schemas.DailyCheckInResponseSchema:
     """Daily check in for user"""
-    existing_point = db.query(PointModel).filter(PointModel.user_id == request.user_id).first()
-    existing_activity = db.query(ActivityModel).filter(ActivityModel.user_id == request.user_id).first()
+    row = db.execute(check_in.locked_check_in_rows(request.user_id)).first()
     
-    if not existing_point or not existing_activity:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"User {request.user_id} not found"
         )
     
-    current_time_utc = datetime.now()            
-    last_login_time_utc = existing_activity.last_login_time
-    
-    if last_login_time_utc is None:
-        existing_activity.logged_in = True
-        existing_activity.total_logins += 1
-        existing_activity.last_login_time = current_time_utc
-        existing_activity.login_streak += 1
-        existing_point.login_amount += 2
-        db.commit()
-        db.refresh(existing_activity)
-        db.refresh(existing_point)
-    else:
-        current_time_sgt = datetime.now(pytz.timezone('Asia/Singapore'))  # Get current time in SGT
-        last_login_time_sgt_date = existing_activity.last_login_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_login_time else None # UTC TIME FORMAT
-        if current_time_sgt.date() > last_login_time_sgt_date.date():
-            existing_activity.logged_in = True
-            existing_activity.total_logins += 1
-            #existing_activity.last_login_time = datetime.now()
-            
-            if (current_time_sgt.date() - last_login_time_sgt_date.date())>timedelta(days=1):
-                existing_activity.login_streak = 1
-            else:
-                existing_activity.login_streak += 1
-                
-            #existing_activity.last_login_time = current_time_utc
-            
-        # WEEKLY LOGIN STREAKS CHECK
-        if existing_activity.login_streak == 7:
-            existing_activity.logged_in = True
-            existing_activity.login_streak = 0
-                
-            existing_point.login_amount += 15 
-        
-        existing_point.login_amount += 2 # DAILY CHECK IN REWARD
-        existing_activity.last_login_time = current_time_utc
-        
-        db.commit()
-        db.refresh(existing_activity)
-        db.refresh(existing_point)
-                    
-    return schemas.DailyCheckInResponseSchema(
-        activity=schemas.ActivityBaseSchema(
-        id=existing_activity.id,
-        logged_in=existing_activity.logged_in,
-        login_streak=existing_activity.login_streak,
-        total_logins=existing_activity.total_logins,
-        #last_action_time=existing_activity.last_action_time, # UTC TIME FORMAT
-        last_action_time=existing_activity.last_action_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_action_time else None, # UTC TIME FORMAT
-        #last_login_time=existing_activity.last_login_time, # UTC TIME FORMAT
-        last_login_time=existing_activity.last_login_time.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.last_login_time else None,# UTC TIME FORMAT
-        created_at=existing_activity.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.created_at else None,
-        updated_at=existing_activity.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_activity.updated_at else None,
-        custom_logs=existing_activity.custom_logs
-        ),
-        point=PointSchema(
-            id=existing_point.id,
-            login_amount=existing_point.login_amount,
-            referral_amount=existing_point.referral_amount,
-            extra_profit_per_hour=existing_point.extra_profit_per_hour,
-            created_at=existing_point.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.created_at else None, 
-            updated_at=existing_point.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.updated_at else None, 
-            custom_logs=existing_point.custom_logs
+    existing_activity, existing_point = row
+    if check_in.apply_daily_check_in(existing_activity, existing_point):
+        db.flush()
+        point_leaderboard.refresh_point_totals(db, [existing_point.user_id])
+
+    # Built before commit, the flushed rows already hold the new state
+    response = _daily_check_in_response(existing_activity, existing_point)
+    db.commit()
+    user_cache.invalidate_user(request.user_id)
+    return response
+
+
+async def daily_check_in_async(request: schemas.DailyCheckInRequestSchema, db: AsyncSession) -> schemas.DailyCheckInResponseSchema:
+    """Async variant of daily_check_in"""
+    row = (await db.execute(check_in.locked_check_in_rows(request.user_id))).first()
+
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"User {request.user_id} not found"
         )
-    )
\ No newline at end of file
+
+    existing_activity, existing_point = row
+    if check_in.apply_daily_check_in(existing_activity, existing_point):
+        await db.flush()
+        await point_leaderboard.refresh_point_totals_async(db, [existing_point.user_id])
+
+    response = _daily_check_in_response(existing_activity, existing_point)
+    await db.commit()
+    await user_cache.invalidate_user_async(request.user_id)
+    return response
@@ -0,0 +1,57 @@
+"""Daily Check In
+
+Streak and reward rules of the daily check in, shared by the sync and async
+services. The activity and point rows of a user are read with a single
+``SELECT ... FOR UPDATE`` so two concurrent taps serialize on the row lock and
+only the first one of a Singapore day is credited.
+"""
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.activity.models import ActivityModel
+from app.activity.streak import evaluate
+from app.point.models import PointModel
+
+CHECK_IN_REWARD = 2
+WEEKLY_STREAK_LENGTH = 7
+WEEKLY_STREAK_BONUS = 15
+
+
+def locked_check_in_rows(user_id: int):
+    """Activity and point rows of a user, locked until the transaction ends"""
+    return (
+        select(ActivityModel, PointModel)
+        .join(PointModel, PointModel.user_id == ActivityModel.user_id)
+        .where(ActivityModel.user_id == user_id)
+        .order_by(PointModel.id)
+        .limit(1)
+        .with_for_update()
+    )
+
+
+def apply_daily_check_in(
+    activity: ActivityModel, point: PointModel, now: Optional[datetime] = None
+) -> bool:
+    """Update the streak and credit the reward, False if already checked in today"""
+    now = now or datetime.now()
+    state = evaluate(activity.last_login_time, activity.login_streak, now)
+    if state.logged_in:
+        return False
+
+    # A broken streak evaluates to 0, so the check in starts a new one
+    activity.login_streak = state.login_streak + 1
+    activity.logged_in = True
+    activity.total_logins = (activity.total_logins or 0) + 1
+    activity.last_login_time = now
+
+    reward = CHECK_IN_REWARD
+    # WEEKLY LOGIN STREAKS CHECK
+    if activity.login_streak == WEEKLY_STREAK_LENGTH:
+        activity.login_streak = 0
+        reward += WEEKLY_STREAK_BONUS
+
+    point.login_amount = (point.login_amount or 0) + reward
+    return True
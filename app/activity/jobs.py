@@ -0,0 +1,105 @@
+"""Activity Jobs
+
+Reset of the stored ``activity.logged_in`` column, through
+``GET /api/v1/activity/update/logged-in`` or by hand:
+
+    python -m app.activity.jobs reset-logged-in
+
+Activity responses derive ``logged_in`` and the streak from
+``last_login_time`` (``app.activity.streak``), so the reset is no longer
+scheduled, nothing read depends on it.
+
+The reset walks the activity table in primary key ranges with one UPDATE per
+range and resumes where it stopped if a run is cut short, on a later day too.
+"""
+
+import argparse
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.activity.models import ActivityModel
+from app.activity.streak import sgt_date
+from app.user import cache as user_cache
+from core.constants import Constants
+from core.jobs import JobProgress, run_in_pk_ranges, unfinished_run_key
+
+LOGGED_IN_RESET_JOB = "activity_logged_in_reset"
+
+
+def _range_filters(after_id: int, up_to_id: int):
+    return (
+        ActivityModel.id > after_id,
+        ActivityModel.id <= up_to_id,
+        ActivityModel.logged_in.is_(False),
+    )
+
+
+def reset_logged_in(
+    db: Session,
+    run_key: Optional[str] = None,
+    chunk_size: int = Constants.job_chunk_size,
+    max_seconds: Optional[float] = None,
+) -> JobProgress:
+    """Set logged_in on every activity row, one Singapore day per run by default
+
+    Without a run key an unfinished run is resumed first, even past its day.
+    """
+    run_key = run_key or unfinished_run_key(db, LOGGED_IN_RESET_JOB) or sgt_date(datetime.now()).isoformat()
+    reset_user_ids: List[int] = []
+
+    def reset_range(db: Session, after_id: int, up_to_id: int) -> int:
+        user_ids = db.scalars(select(ActivityModel.user_id).where(*_range_filters(after_id, up_to_id))).all()
+        if not user_ids:
+            return 0
+        db.execute(
+            update(ActivityModel)
+            .where(*_range_filters(after_id, up_to_id))
+            .values(logged_in=True, updated_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        )
+        reset_user_ids.extend(user_ids)
+        return len(user_ids)
+
+    def report(progress: JobProgress) -> None:
+        # Called once the range is committed
+        user_cache.invalidate_users(reset_user_ids)
+        reset_user_ids.clear()
+        logging.info(str(progress))
+
+    return run_in_pk_ranges(
+        db,
+        LOGGED_IN_RESET_JOB,
+        run_key,
+        ActivityModel.id,
+        reset_range,
+        chunk_size=chunk_size,
+        max_seconds=max_seconds,
+        report=report,
+    )
+
+
+def main():
+    """Activity maintenance command"""
+    from core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Activity maintenance jobs")
+    parser.add_argument("command", choices=["reset-logged-in"])
+    parser.add_argument("--run-key", help="run to start or resume, defaults to the unfinished run or today in Singapore time")
+    parser.add_argument("--chunk-size", type=int, default=Constants.job_chunk_size)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        progress = reset_logged_in(db, args.run_key, args.chunk_size)
+        print(progress)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
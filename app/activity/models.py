@@ -12,8 +12,6 @@ class ActivityModel(Base):
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
-        unique=True,
-        index=True,
         nullable=False,
         autoincrement=True
     )
@@ -31,4 +29,4 @@ class ActivityModel(Base):
     user = relationship("UserModel", back_populates="activity")
 
     def __repr__(self) -> str:
-        return f"<ActivityModel by {self.id} from user {self.user.id}>"
+        return f"<ActivityModel by {self.id} from user {self.user_id}>"
@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+from app.activity import streak
 from app.point.schemas import PointSchema
+from core.serialization import SGTDateTime
 
 class ActivityBaseSchema(BaseModel):
     """
@@ -12,12 +14,23 @@ class ActivityBaseSchema(BaseModel):
     logged_in: bool
     login_streak: int
     total_logins: int
-    last_action_time: Optional[datetime] = None
-    last_login_time: Optional[datetime] = None
-    created_at: datetime
-    updated_at: datetime
+    last_action_time: Optional[SGTDateTime] = None
+    last_login_time: Optional[SGTDateTime] = None
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
+    @model_validator(mode="after")
+    def _current_streak(self) -> "ActivityBaseSchema":
+        # logged_in and login_streak as of now, also for responses read back from the cache
+        self.logged_in, self.login_streak = streak.evaluate(self.last_login_time, self.login_streak)
+        return self
+
 
 class ActivitySchema(BaseModel):
     logged_in: bool
@@ -0,0 +1,46 @@
+"""Login Streak
+
+The streak state of a user follows from ``last_login_time`` and the Singapore
+day it is read on, so it is derived on read instead of kept current by a job:
+
+- checked in today: ``logged_in``, streak as stored
+- checked in yesterday: not ``logged_in``, the streak still stands
+- anything older: not ``logged_in``, the streak is broken (0)
+
+The stored ``logged_in`` and ``login_streak`` columns are only brought up to
+date by the next check in. Every activity response goes through ``evaluate``
+(``ActivityBaseSchema``), and so does the check in itself.
+"""
+
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+from core.serialization import SGT
+
+
+class StreakState(NamedTuple):
+    """Streak of a user as of a given time"""
+
+    logged_in: bool
+    login_streak: int
+
+
+def sgt_date(value: datetime) -> date:
+    """Singapore calendar day of a stored (server local) timestamp"""
+    return value.astimezone(SGT).date()
+
+
+def evaluate(
+    last_login_time: Optional[datetime], login_streak: Optional[int], now: Optional[datetime] = None
+) -> StreakState:
+    """Streak state at ``now`` from the last check in and the stored streak"""
+    login_streak = login_streak or 0
+    if last_login_time is None:
+        return StreakState(logged_in=False, login_streak=login_streak)
+
+    days = (sgt_date(now or datetime.now()) - sgt_date(last_login_time)).days
+    if days <= 0:
+        return StreakState(logged_in=True, login_streak=login_streak)
+    if days == 1:
+        return StreakState(logged_in=False, login_streak=login_streak)
+    return StreakState(logged_in=False, login_streak=0)
@@ -2,17 +2,18 @@
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 
 from core import database
+from core.pagination import page_response
+from core.serialization import ORJSONResponse
 from app.friend import schemas
 from app.friend.api.v1 import service
 
-from fastapi.responses import JSONResponse
-from fastapi.encoders import jsonable_encoder
-
 get_db = database.get_db
+get_async_db = database.get_async_db
 
 router = APIRouter(prefix="/api/v1/friend", tags=["friend"])
 
@@ -26,19 +27,15 @@ def create_friend(request: schemas.FriendCreateRequestSchema, db: Session = Depe
 
 # REVIEW:  get from user & get from users
 @router.get("/detail", response_model=schemas.FriendWithIdsRetrievalResponseSchema)
-def get_friend_from_user(id: Optional[int] = None, user_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_friend_from_user(id: Optional[int] = None, user_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """Retrieve Friend Details from Single User"""
-    result = service.retrieve_friends(id, user_id, db)
-    print('result')
-    print(result)
-    json_compatible_item_data = jsonable_encoder(service.retrieve_friends(id, user_id, db))
-    return JSONResponse(content=json_compatible_item_data)
+    return ORJSONResponse(await service.retrieve_friends_async(id, user_id, db))
 
 # REVIEW:  get from user & get from users
 @router.get("/details", response_model=schemas.FriendWithIdsRetrievalResponseSchema)
-def get_friend_from_users(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, db: Session = Depends(get_db)):
+def get_friend_from_users(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """Retrieve Friend by List from Multiple Users"""
-    return service.retrieve_friend_list(db, user_ids, skip, limit)
+    return page_response(service.retrieve_friend_list(db, user_ids, skip, limit, cursor))
 
 
 @router.put("/update", response_model=List[schemas.FriendDetailsResponseSchema])
@@ -47,11 +44,17 @@ def update_friend(friend_status: str, id: Optional[int] = None, sender_id: Optio
     return service.update_friend(id, sender_id, receiver_id, friend_status, custom_logs, db)
 
 
-@router.patch("/reward-update", response_model=List[schemas.FriendDetailsResponseSchema])
+@router.patch("/reward-update", response_model=List[schemas.FriendDetailsResponseSchema], deprecated=True)
 def batch_update_reward_claimed_by_sender_id(sender_id: int= Query(...), db: Session = Depends(get_db)):
-    """Update multiple friend has_claimed by sender id"""
+    """Mark the referral rewards of a sender claimed, the points are credited through /point/update (use /reward-claim)"""
     return service.batch_update_reward_claimed_by_sender_id(db, sender_id)
 
+
+@router.post("/reward-claim", response_model=List[schemas.FriendDetailsResponseSchema])
+def claim_referral_rewards(sender_id: int = Query(...), db: Session = Depends(get_db)):
+    """Claim all unclaimed referral rewards of a sender and credit the referral points"""
+    return service.claim_referral_rewards(db, sender_id)
+
 #@router.get('/ranking')
 #def get_referral_ranking(user_id: Optional[int] = None, db: Session = Depends(get_db)):
 #    """Get referral ranking"""
@@ -1,60 +1,56 @@
 """Friend App Business Logics"""
 
 import logging
-import pytz
+from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import desc, distinct, func, literal, union
+from sqlalchemy import desc, distinct, func, literal, or_, select, union, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from sqlalchemy import func, desc, distinct, literal, union
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.friend import schemas
+from app.friend import leaderboard
 from app.user.models import UserModel
-from app.friend.models import FriendModel
+from app.user import cache as user_cache
+from app.friend.models import FRIEND_PAIR, FriendModel
+from app.point import leaderboard as point_leaderboard
+from app.point.models import PointModel
+from core.constants import Constants
+from core.pagination import Page, decode_cursor, page_of, paginate
+from core.serialization import to_sgt
+from core.upsert import upsert
 
 def create_friend(request: schemas.FriendCreateRequestSchema, db: Session) -> schemas.FriendCreateResponseSchema:
     """Create Friend"""
-    print('create friend request')
-    print(request)
+    logging.info(f"create_friend called with sender_id={request.sender_id} receiver_id={request.receiver_id}")
 
     if not request.sender_id or not request.receiver_id or not request.status:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Sender id, receiver id and status are required")
 
-    # Check for existing friendship (more efficient approach)
-    existing_friend = db.query(FriendModel).filter(
-        ((FriendModel.sender_id == request.sender_id) & (FriendModel.receiver_id == request.receiver_id)) |
-        ((FriendModel.sender_id == request.receiver_id) & (FriendModel.receiver_id == request.sender_id))
-    ).first()
-
-    if existing_friend:
+    # Both directions of the pair land on the same row through ux_friend_users
+    new_friend = upsert(
+        db,
+        FriendModel,
+        dict(
+            sender_id=request.sender_id,
+            receiver_id=request.receiver_id,
+            status=request.status,
+            has_claimed=request.has_claimed,
+        ),
+        FRIEND_PAIR,
+    )
+    if new_friend.sender_id != request.sender_id:
+        db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Friend relationship already exists")
+    leaderboard.refresh_referral_counts(db, [new_friend.sender_id])
 
-    # Create new friend if no existing relationship
-    new_friend = FriendModel(
-        sender_id=request.sender_id,
-        receiver_id=request.receiver_id,
-        status=request.status,
-        has_claimed=request.has_claimed,
+    response = schemas.FriendCreateResponseSchema(
+        friend_details=_friend_details(new_friend)
     )
-    db.add(new_friend)
     db.commit()
-    db.refresh(new_friend)
-
-    return schemas.FriendCreateResponseSchema(
-        friend_details=schemas.FriendDetailsSchema(
-            friend_base=schemas.FriendSchema(
-                id=new_friend.id,
-                status=new_friend.status,
-                has_claimed=new_friend.has_claimed,
-                created_at=new_friend.created_at.astimezone(pytz.timezone('Asia/Singapore')) if new_friend.created_at else None, 
-                updated_at=new_friend.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if new_friend.updated_at else None, 
-                custom_logs=new_friend.custom_logs
-            ),
-            sender_id=new_friend.sender_id,
-            receiver_id=new_friend.receiver_id,
-        )
-    )
+    user_cache.invalidate_user(request.sender_id, request.receiver_id)
+    return response
 
 
 # This method combines with get_friends_as_receiver ->> total friend from the given user_id
@@ -71,8 +67,8 @@ def get_friends_as_sender(user_id: int, db: Session) -> List[schemas.FriendRetri
                     id=friend.sender.id,
                     status=friend.sender.status,
                     has_claimed=friend.has_claimed,
-                    created_at=friend.sender.created_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.sender.created_at else None, 
-                    updated_at=friend.sender.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.sender.updated_at else None, 
+                    created_at=to_sgt(friend.sender.created_at), 
+                    updated_at=to_sgt(friend.sender.updated_at), 
                     custom_logs=friend.sender.custom_logs
                 ),
                 sender_id=friend.sender.sender_id,
@@ -98,8 +94,8 @@ def get_friends_as_receiver(user_id: int, db: Session) -> List[schemas.FriendRet
                     id=friend.receiver.id,
                     status=friend.receiver.status,
                     has_claimed=friend.has_claimed,
-                    created_at=friend.receiver.created_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.receiver.created_at else None, 
-                    updated_at=friend.receiver.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.receiver.updated_at else None, 
+                    created_at=to_sgt(friend.receiver.created_at), 
+                    updated_at=to_sgt(friend.receiver.updated_at), 
                     custom_logs=friend.receiver.custom_logs
                 ),
                 sender_id=friend.receiver.sender_id,
@@ -109,67 +105,65 @@ def get_friends_as_receiver(user_id: int, db: Session) -> List[schemas.FriendRet
         for friend in friends
     ]
 
-# FIXME
-def retrieve_friends(id: Optional[int], user_id: Optional[int], db: Session) -> schemas.FriendWithIdsRetrievalResponseSchema:
-    """Retrieve Friend Details from Single User"""
-    print('retrieve friends request')
-    print('id:', id )
-    print('user_id:', user_id)
-
+def _friend_lookup_filters(id: Optional[int], user_id: Optional[int]):
+    """Build the sender side and receiver side filters of a friend lookup"""
     if not id and not user_id: # avoid both none on optional case
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing id or user_id")
 
+    sender_filters = []
+    receiver_filters = []
+    
+    if id is not None:
+        sender_filters.append(FriendModel.id == id)
+        receiver_filters.append(FriendModel.id == id)
+
+    if user_id is not None:
+        # filters.append((FriendModel.sender_id == user_id)|(FriendModel.receiver_id == user_id))
+        sender_filters.append(FriendModel.sender_id == user_id)
+        receiver_filters.append(FriendModel.receiver_id == user_id)
+    return sender_filters, receiver_filters
+
+
+def _friend_base(friend: FriendModel) -> schemas.FriendBaseSchema:
+    """Build the friend payload from a loaded friend"""
+    return schemas.FriendBaseSchema.model_validate(friend)
+
+
+def retrieve_friends(id: Optional[int], user_id: Optional[int], db: Session) -> schemas.FriendWithIdsRetrievalResponseSchema:
+    """Retrieve Friend Details from Single User"""
+    logging.info(f"retrieve_friends called with id={id} user_id={user_id}")
+    sender_filters, receiver_filters = _friend_lookup_filters(id, user_id)
+
     try:
-        sender_query = db.query(FriendModel)
-        receiver_query = db.query(FriendModel)
-        
-        sender_filters = []
-        receiver_filters = []
-        
-        if id is not None:
-            sender_filters.append(FriendModel.id == id)
-            receiver_filters.append(FriendModel.id == id)
-
-        if user_id is not None:
-            # filters.append((FriendModel.sender_id == user_id)|(FriendModel.receiver_id == user_id))
-            sender_filters.append(FriendModel.sender_id == user_id)
-            receiver_filters.append(FriendModel.receiver_id == user_id)
-            
-            
-        if sender_filters and receiver_filters:
-            existing_sender = sender_query.filter(*sender_filters).all()
-            existing_receiver = receiver_query.filter(*receiver_filters).all()
-            
-            sender = [
-                schemas.FriendBaseSchema(
-                    id=fs.id,
-                    sender_id=fs.sender_id,
-                    receiver_id=fs.receiver_id,
-                    created_at=fs.created_at.astimezone(pytz.timezone('Asia/Singapore')) if fs.created_at else None, 
-                    updated_at=fs.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if fs.updated_at else None, 
-                    status=fs.status,
-                    has_claimed=fs.has_claimed
-                )
-                for fs in existing_sender
-            ]
-            
-            receiver = [
-                schemas.FriendBaseSchema(
-                    id=fr.id,
-                    sender_id=fr.sender_id,
-                    receiver_id=fr.receiver_id,
-                    created_at=fr.created_at.astimezone(pytz.timezone('Asia/Singapore')) if fr.created_at else None, 
-                    updated_at=fr.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if fr.updated_at else None, 
-                    status=fr.status,
-                    has_claimed=fr.has_claimed
-                )
-                for fr in existing_receiver
-            ]
-            return schemas.FriendWithIdsRetrievalResponseSchema(sender=sender,receiver=receiver)
+        existing_sender = db.query(FriendModel).filter(*sender_filters).all()
+        existing_receiver = db.query(FriendModel).filter(*receiver_filters).all()
+
+        return schemas.FriendWithIdsRetrievalResponseSchema(
+            sender=[_friend_base(fs) for fs in existing_sender],
+            receiver=[_friend_base(fr) for fr in existing_receiver],
+        )
                
     except Exception as e:
         logging.error(f"An error occured: {e}")
 
+
+async def retrieve_friends_async(id: Optional[int], user_id: Optional[int], db: AsyncSession) -> schemas.FriendWithIdsRetrievalResponseSchema:
+    """Async variant of retrieve_friends"""
+    logging.info(f"retrieve_friends_async called with id={id} user_id={user_id}")
+    sender_filters, receiver_filters = _friend_lookup_filters(id, user_id)
+
+    try:
+        existing_sender = (await db.execute(select(FriendModel).where(*sender_filters))).scalars().all()
+        existing_receiver = (await db.execute(select(FriendModel).where(*receiver_filters))).scalars().all()
+
+        return schemas.FriendWithIdsRetrievalResponseSchema(
+            sender=[_friend_base(fs) for fs in existing_sender],
+            receiver=[_friend_base(fr) for fr in existing_receiver],
+        )
+
+    except Exception as e:
+        logging.error(f"An error occured: {e}")
+
 # FIXME
 def get_referral_ranking(user_id: int, db: Session) -> dict:
     """Retrieve referral ranking for a user"""
@@ -234,80 +228,25 @@ def get_referral_ranking(user_id: int, db: Session) -> dict:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred: {str(e)}")
 
 
-def retrieve_friend_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15) -> schemas.FriendWithIdsRetrievalResponseSchema:
+def retrieve_friend_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15, cursor: Optional[str] = None) -> Page:
     """Retrieve Friends by List from Multiple Users"""
+    after_id = decode_cursor(cursor)
     try:
+        # One id-ordered stream split into sender and receiver sides, paged like every other list
+        query = db.query(FriendModel)
         if user_ids:
-            existing_friends_as_sender = db.query(FriendModel).filter(FriendModel.sender_id.in_(user_ids)).offset(skip).limit(limit).all()
-            existing_friends_as_receiver = db.query(FriendModel).filter(FriendModel.receiver_id.in_(user_ids)).offset(skip).limit(limit).all()
-            as_sender_list = [
-            schemas.FriendBaseSchema(
-                id=friend_from_as_sender.id,
-                sender_id=friend_from_as_sender.sender_id,
-                receiver_id=friend_from_as_sender.receiver_id,
-                created_at=friend_from_as_sender.created_at.astimezone(pytz.timezone('Asia/Singapore')) if friend_from_as_sender.created_at else None,
-                updated_at=friend_from_as_sender.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if friend_from_as_sender.updated_at else None,
-                status=friend_from_as_sender.status,
-                has_claimed=friend_from_as_sender.has_claimed
-            )
-            for friend_from_as_sender in existing_friends_as_sender
-            ]
-
-            as_receiver_list = [
-            schemas.FriendBaseSchema(
-                id=friend_from_as_receiver.id,
-                sender_id=friend_from_as_receiver.sender_id,
-                receiver_id=friend_from_as_receiver.receiver_id,
-                created_at=friend_from_as_receiver.created_at.astimezone(pytz.timezone('Asia/Singapore')) if friend_from_as_receiver.created_at else None,
-                updated_at=friend_from_as_receiver.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if friend_from_as_receiver.updated_at else None,
-                status=friend_from_as_receiver.status,
-                has_claimed=friend_from_as_receiver.has_claimed
-            )
-            for friend_from_as_receiver in existing_friends_as_receiver
-            ]
-
-            return schemas.FriendWithIdsRetrievalResponseSchema(
-                sender=as_sender_list, receiver=as_receiver_list
-            )
-
-        else:
-            existing_friends =  db.query(FriendModel).offset(skip).limit(limit).all()
-
-            as_sender = []
-            as_receiver = []
-
-            for friend in existing_friends:
-                if friend.sender and len(friend.sender):
-                    as_sender.append(
-                        schemas.FriendBaseSchema(
-                            id=friend.id,
-                            sender_id=friend.sender_id,
-                            receiver_id=friend.receiver_id,
-                            created_at=friend.created_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.created_at else None,
-                            updated_at=friend.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.updated_at else None,
-                            status=friend.status,
-                            has_claimed=friend.has_claimed
-                        )
-                    )
-                if friend.receiver and len(friend.receiver):
-                    as_receiver.append(
-                        schemas.FriendBaseSchema(
-                            id=friend.id,
-                            sender_id=friend.sender_id,
-                            receiver_id=friend.receiver_id,
-                            created_at=friend.created_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.created_at else None,
-                            updated_at=friend.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if friend.updated_at else None,
-                            status=friend.status,
-                            has_claimed=friend.has_claimed
-                        )
-                    )
-
-            return schemas.FriendWithIdsRetrievalResponseSchema(
-                sender=as_sender, receiver=as_receiver
-            )
-
-        # return as_sender_list, as_receiver_list
+            query = query.filter(or_(FriendModel.sender_id.in_(user_ids), FriendModel.receiver_id.in_(user_ids)))
+        existing_friends, next_cursor = page_of(paginate(query, FriendModel.id, skip, limit, after_id).all(), limit)
+        return Page(
+            schemas.FriendWithIdsRetrievalResponseSchema(
+                sender=[_friend_base(friend) for friend in existing_friends if (friend.sender_id in user_ids if user_ids else friend.sender_id)],
+                receiver=[_friend_base(friend) for friend in existing_friends if (friend.receiver_id in user_ids if user_ids else friend.receiver_id)],
+            ),
+            next_cursor,
+        )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"An error occured: {e}")
 
@@ -319,18 +258,7 @@ def get_Friend_by_sender_id_receiver_id(sender_id: int, db: Session, receiver_id
     existing_friend = db.query(FriendModel).filter(FriendModel.sender_id == sender_id, FriendModel.receiver_id == receiver_id).first()
 
     return schemas.FriendRetrievalResponseSchema(
-        friend_details=schemas.FriendDetailsSchema(
-            friend_base=schemas.FriendSchema(
-                id=existing_friend.id,
-                status=existing_friend.status,
-                created_at=existing_friend.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_friend.created_at else None,
-                updated_at=existing_friend.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_friend.updated_at else None,
-                custom_logs=existing_friend.custom_logs,
-                has_claimed=existing_friend.has_claimed
-            ),
-            sender_id=existing_friend.sender_id,
-            receiver_id=existing_friend.receiver_id,
-        )
+        friend_details=_friend_details(existing_friend)
     )
 
 
@@ -362,29 +290,22 @@ def update_friend(id: Optional[int], sender_id: Optional[int], receiver_id: Opti
             if not existing_friends:
                 raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Friend not found")
 
+            involved_user_ids = [user_id for f in existing_friends for user_id in (f.sender_id, f.receiver_id)]
+
             for friend in existing_friends:
                 friend.status = friend_status
                 friend.custom_logs = custom_logs
-                db.commit()
+            db.flush()
+
+            # Recounted from the updated rows, committed together with them
+            leaderboard.refresh_referral_counts(db, [f.sender_id for f in existing_friends])
+            db.commit()
+            for friend in existing_friends:
                 db.refresh(friend)
 
-            return [
-                schemas.FriendDetailsResponseSchema(
-                friend_details=schemas.FriendDetailsSchema(
-                    friend_base=schemas.FriendSchema(
-                        id=f.id,
-                        status=f.status,
-                        created_at=f.created_at.astimezone(pytz.timezone('Asia/Singapore')) if f.created_at else None,
-                        updated_at=f.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if f.updated_at else None,
-                        custom_logs=f.custom_logs,
-                        has_claimed=f.has_claimed
-                    ),
-                    sender_id=f.sender_id,
-                    receiver_id=f.receiver_id,
-                )
-            )
-                for f in existing_friends
-            ]
+            user_cache.invalidate_users(involved_user_ids)
+
+            return [_friend_details_response(f) for f in existing_friends]
     except Exception as e:
         logging.error(f"An error occured: {e}")
 
@@ -403,21 +324,11 @@ def update_friend_status_by_sender_id(request: schemas.FriendUpdateBySenderIdReq
             db_friend.custom_logs = request.friend_payload.custom_logs
 
         db.commit()
+        user_cache.invalidate_user(db_friend.sender_id, db_friend.receiver_id)
         db.refresh(db_friend)
 
     return schemas.FriendDetailsResponseSchema(
-        friend_details=schemas.FriendDetailsSchema(
-            friend_base=schemas.FriendSchema(
-                id=db_friend.id,
-                status=db_friend.status,
-                created_at=db_friend.created_at.astimezone(pytz.timezone('Asia/Singapore')) if db_friend.created_at else None, 
-                updated_at=db_friend.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if db_friend.updated_at else None, 
-                custom_logs=db_friend.custom_logs,
-                has_claimed=db_friend.has_claimed
-            ),
-            sender_id=db_friend.sender_id,
-            receiver_id=db_friend.receiver_id,
-        )
+        friend_details=_friend_details(db_friend)
     )
 
 
@@ -439,67 +350,113 @@ def update_friend_status_by_receiver_id(request: schemas.FriendUpdateByReceiverI
             db_friend.custom_logs = request.friend_payload.custom_logs
 
         db.commit()
+        user_cache.invalidate_user(db_friend.sender_id, db_friend.receiver_id)
         db.refresh(db_friend)
 
     return schemas.FriendDetailsResponseSchema(
-        friend_details=schemas.FriendDetailsSchema(
-            friend_base=schemas.FriendSchema(
-                id=db_friend.id,
-                status=db_friend.status,
-                created_at=db_friend.created_at.astimezone(pytz.timezone('Asia/Singapore')) if db_friend.created_at else None, 
-                updated_at=db_friend.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if db_friend.updated_at else None, 
-                custom_logs=db_friend.custom_logs,
-                has_claimed=db_friend.has_claimed
-            ),
-            sender_id=db_friend.sender_id,
-            receiver_id=db_friend.receiver_id,
-        )
+        friend_details=_friend_details(db_friend)
     )
 
 
 def batch_update_by_user_id_to_receiver():
     pass
 
+def _friend_details(friend: FriendModel) -> schemas.FriendDetailsSchema:
+    """Build the friend payload with its user ids from a loaded friend"""
+    return schemas.FriendDetailsSchema(
+        friend_base=schemas.FriendSchema.model_validate(friend),
+        sender_id=friend.sender_id,
+        receiver_id=friend.receiver_id,
+    )
+
+
+def _friend_details_response(friend: FriendModel) -> schemas.FriendDetailsResponseSchema:
+    """Build the friend details payload from a loaded friend"""
+    return schemas.FriendDetailsResponseSchema(friend_details=_friend_details(friend))
+
+
+def _mark_claimed(db: Session, friend_ids: List[int]) -> None:
+    """Flip has_claimed for the given rows with a single UPDATE, keeping loaded objects in sync"""
+    db.execute(
+        update(FriendModel)
+        .where(FriendModel.id.in_(friend_ids))
+        .values(has_claimed=True, updated_at=datetime.now())
+        .execution_options(synchronize_session="evaluate")
+    )
+
+
+def _lock_unclaimed(db: Session, sender_id: int) -> List[FriendModel]:
+    return db.execute(
+        select(FriendModel)
+        .where(FriendModel.sender_id == sender_id, FriendModel.has_claimed.is_(False))
+        .order_by(FriendModel.id)
+        .with_for_update()
+    ).scalars().all()
+
+
 def batch_update_reward_claimed_by_sender_id(db: Session, sender_id: int) -> List[schemas.FriendDetailsResponseSchema]:
-    """Update multiple friend has_claimed by list of sender id"""
+    """Mark the unclaimed referrals of a sender claimed without crediting them
+
+    Legacy flow of ``/reward-update``, its clients credit the points themselves
+    through ``/point/update``. Only the rows changed by this call come back.
+    """
     if sender_id is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing sender_id")
-    try:
-        existing_friends = db.query(FriendModel).filter(FriendModel.sender_id==sender_id).all()
 
-        if not existing_friends:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Friend not found")
-        
-        for friend in existing_friends:
-            friend.has_claimed = True
-            
-        db.commit()
-        
-        return [
-            schemas.FriendDetailsResponseSchema(
-            friend_details=schemas.FriendDetailsSchema(
-                friend_base=schemas.FriendSchema(
-                    id=f.id,
-                    status=f.status,
-                    has_claimed=f.has_claimed,
-                    created_at=f.created_at.astimezone(pytz.timezone('Asia/Singapore')) if f.created_at else None, 
-                    updated_at=f.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if f.updated_at else None, 
-                    custom_logs=f.custom_logs
-                ),
-                sender_id=f.sender_id,
-                receiver_id=f.receiver_id,
-            )
-        )
-            for f in existing_friends
-        ]
-    except Exception as e:
-        logging.error(f"An error occured: {e}")
+    unclaimed = _lock_unclaimed(db, sender_id)
+    if not unclaimed:
+        db.rollback()
+        return []
+
+    _mark_claimed(db, [f.id for f in unclaimed])
+    response = [_friend_details_response(f) for f in unclaimed]
+    user_ids = {user_id for f in unclaimed for user_id in (f.sender_id, f.receiver_id)}
+    db.commit()
+    user_cache.invalidate_users(user_ids)
+    return response
+
+
+def claim_referral_rewards(db: Session, sender_id: int) -> List[schemas.FriendDetailsResponseSchema]:
+    """Claim every unclaimed referral of a sender and credit referral_amount in the same transaction"""
+    if sender_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing sender_id")
+
+    # The point row lock serializes concurrent claims of the same sender
+    existing_point = db.execute(
+        select(PointModel)
+        .where(PointModel.user_id == sender_id)
+        .order_by(PointModel.id)
+        .limit(1)
+        .with_for_update()
+    ).scalar_one_or_none()
+    if not existing_point:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Point of user {sender_id} not found")
+
+    unclaimed = _lock_unclaimed(db, sender_id)
+    if not unclaimed:
+        db.rollback()
+        return []
+
+    _mark_claimed(db, [f.id for f in unclaimed])
+    existing_point.referral_amount = (existing_point.referral_amount or 0) + len(unclaimed) * Constants.referral_reward_points
+    db.flush()
+    point_leaderboard.refresh_point_totals(db, [sender_id])
+
+    # Built before commit so the expired rows are not reloaded one by one
+    response = [_friend_details_response(f) for f in unclaimed]
+    user_ids = {user_id for f in unclaimed for user_id in (f.sender_id, f.receiver_id)}
+    db.commit()
+    user_cache.invalidate_users(user_ids)
+    return response
 
 
 def remove_friend(sender_id: int, receiver_id: int, db: Session):
     friendship = get_Friend_by_sender_id_receiver_id(sender_id, db, receiver_id)
     if friendship:
         db.delete(friendship)
+        db.flush()
+        leaderboard.refresh_referral_counts(db, [sender_id])
         db.commit()
+        user_cache.invalidate_user(sender_id, receiver_id)
     else:
         raise ValueError("Friendship not found")
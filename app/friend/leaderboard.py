@@ -0,0 +1,172 @@
+"""Referral Leaderboard
+
+Keeps one ``referral_count`` row per sender so the referral ranking is served
+from the ``(referral_count, sender_id)`` index instead of loading every user.
+
+Rebuild from the friend table after drift:
+
+    python -m app.friend.leaderboard rebuild
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import and_, func, literal, or_, select
+from sqlalchemy.orm import Session
+
+from app.friend.models import FriendModel, ReferralCountModel
+from app.user.models import UserModel
+from core import leaderboard
+from core.upsert import upsert_statement
+
+
+def _count_query(sender_ids: Optional[List[int]] = None):
+    """Referrals per sender straight from the friend table"""
+    query = select(
+        FriendModel.sender_id,
+        func.count(FriendModel.id),
+        literal(datetime.now()),
+    ).group_by(FriendModel.sender_id)
+    if sender_ids is not None:
+        query = query.where(FriendModel.sender_id.in_(sender_ids))
+    return query
+
+
+REFERRAL_COUNTS = leaderboard.Aggregate(
+    model=ReferralCountModel,
+    columns=["sender_id", "referral_count", "updated_at"],
+    query=_count_query,
+    source_key=FriendModel.sender_id,
+)
+
+
+def refresh_referral_counts(db: Session, sender_ids: Iterable[int]) -> None:
+    """Recount the referrals of the given senders (caller commits)"""
+    leaderboard.refresh(db, REFERRAL_COUNTS, sender_ids)
+
+
+def increment_referral_count(db: Session, sender_id: int, by: int = 1) -> None:
+    """Count new referrals of a sender in place (caller commits)
+
+    Concurrent signups from one link each add to the row under its lock instead
+    of recounting, a sender without a row yet is counted from the friend table.
+    """
+    stmt = upsert_statement(
+        db.get_bind().dialect.name,
+        ReferralCountModel,
+        ["sender_id"],
+        lambda proposed: {
+            "referral_count": ReferralCountModel.referral_count + by,
+            "updated_at": proposed.updated_at,
+        },
+        source=_count_query([sender_id]),
+        columns=REFERRAL_COUNTS.columns,
+    )
+    db.execute(stmt)
+
+
+def rebuild_referral_counts(db: Session) -> int:
+    """Rebuild the whole referral_count table from the friend table"""
+    return leaderboard.rebuild(db, REFERRAL_COUNTS)
+
+
+def get_top_referrers(db: Session, limit: int = 10) -> List[dict]:
+    """Top senders by referral count, ties broken by user id"""
+    top = (
+        db.query(
+            UserModel.id,
+            UserModel.telegram_id,
+            UserModel.username,
+            ReferralCountModel.referral_count,
+        )
+        .join(ReferralCountModel, ReferralCountModel.sender_id == UserModel.id)
+        .filter(ReferralCountModel.referral_count > 0)
+        .order_by(ReferralCountModel.referral_count.desc(), ReferralCountModel.sender_id)
+        .limit(limit)
+        .all()
+    )
+
+    # Fewer referrers than the page size, pad with users without referrals
+    if len(top) < limit:
+        referrers = select(ReferralCountModel.sender_id).where(
+            ReferralCountModel.referral_count > 0
+        )
+        top += (
+            db.query(UserModel.id, UserModel.telegram_id, UserModel.username, literal(0))
+            .filter(UserModel.id.not_in(referrers))
+            .order_by(UserModel.id)
+            .limit(limit - len(top))
+            .all()
+        )
+
+    return [
+        {
+            "rank": rank,
+            "sender_count": sender_count,
+            "user_id": user_id,
+            "telegram_id": telegram_id,
+            "username": username,
+        }
+        for rank, (user_id, telegram_id, username, sender_count) in enumerate(top, start=1)
+    ]
+
+
+def get_referrer_rank(db: Session, user_id: int) -> Optional[dict]:
+    """Rank of a single user, None if the user does not exist"""
+    user = (
+        db.query(UserModel.id, UserModel.telegram_id, UserModel.username)
+        .filter(UserModel.id == user_id)
+        .first()
+    )
+    if not user:
+        return None
+
+    sender_count = (
+        db.query(ReferralCountModel.referral_count)
+        .filter(ReferralCountModel.sender_id == user_id)
+        .scalar()
+    ) or 0
+
+    if sender_count > 0:
+        ahead = (
+            db.query(func.count(ReferralCountModel.sender_id))
+            .filter(
+                or_(
+                    ReferralCountModel.referral_count > sender_count,
+                    and_(
+                        ReferralCountModel.referral_count == sender_count,
+                        ReferralCountModel.sender_id < user_id,
+                    ),
+                )
+            )
+            .scalar()
+        )
+    else:
+        # Every referrer plus the users without referrals and a lower id
+        referrers = (
+            db.query(func.count(ReferralCountModel.sender_id))
+            .filter(ReferralCountModel.referral_count > 0)
+            .scalar()
+        )
+        lower_ids = db.query(func.count(UserModel.id)).filter(UserModel.id < user_id).scalar()
+        lower_referrers = (
+            db.query(func.count(ReferralCountModel.sender_id))
+            .filter(
+                ReferralCountModel.referral_count > 0,
+                ReferralCountModel.sender_id < user_id,
+            )
+            .scalar()
+        )
+        ahead = referrers + lower_ids - lower_referrers
+
+    return {
+        "rank": ahead + 1,
+        "sender_count": sender_count,
+        "user_id": user.id,
+        "telegram_id": user.telegram_id,
+        "username": user.username,
+    }
+
+
+if __name__ == "__main__":
+    leaderboard.main(REFERRAL_COUNTS, "Referral leaderboard maintenance")
@@ -1,21 +1,22 @@
 """Friend app DB models"""
 
 from typing import Literal, get_args, Optional
-from sqlalchemy import Integer, DateTime, ForeignKey, Enum, JSON, Column
+from sqlalchemy import Integer, DateTime, ForeignKey, Enum, JSON, Column, Computed, Index
 from sqlalchemy.orm import Mapped, relationship, mapped_column, backref
 from datetime import datetime
 from core.database import Base
 
 FriendStatusType = Literal["pending", "active", "rejected"]
 
+# Upsert key of a friendship, the same for both directions of a pair
+FRIEND_PAIR = ["low_user_id", "high_user_id"]
+
 
 class FriendModel(Base):
     __tablename__ = "friend"
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
-        unique=True,
-        index=True,
         nullable=False,
         autoincrement=True,
     )
@@ -32,6 +33,13 @@ class FriendModel(Base):
 
     sender_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
     receiver_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    # Pair ordered by id, unique in ux_friend_users so a reverse pair is rejected by the key
+    low_user_id: Mapped[int] = mapped_column(
+        Integer, Computed("CASE WHEN sender_id < receiver_id THEN sender_id ELSE receiver_id END", persisted=False)
+    )
+    high_user_id: Mapped[int] = mapped_column(
+        Integer, Computed("CASE WHEN sender_id < receiver_id THEN receiver_id ELSE sender_id END", persisted=False)
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.now, onupdate=datetime.now
@@ -49,5 +57,33 @@ class FriendModel(Base):
         foreign_keys=[receiver_id],
     )
 
+    # Referral claims filter a sender's unclaimed rows, pending requests a receiver's status,
+    # two users are linked once, whichever of them sent the request
+    __table_args__ = (
+        Index("ux_friend_users", "low_user_id", "high_user_id", unique=True),
+        Index("ix_friend_sender_claimed", "sender_id", "has_claimed"),
+        Index("ix_friend_receiver_status", "receiver_id", "status"),
+    )
+
     def __repr__(self) -> str:
         return f"<FriendModel id={self.id} sender_id={self.sender_id} receiver_id={self.receiver_id}>"
+
+
+class ReferralCountModel(Base):
+    """Denormalized referral count per sender, maintained by the friend service"""
+
+    __tablename__ = "referral_count"
+    sender_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id"), primary_key=True, autoincrement=False
+    )
+    referral_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.now, onupdate=datetime.now
+    )
+
+    __table_args__ = (
+        Index("ix_referral_count_rank", "referral_count", "sender_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ReferralCountModel sender_id={self.sender_id} referral_count={self.referral_count}>"
@@ -0,0 +1,78 @@
+"""Referral Attribution
+
+Signups through a referral link carry the referrer's telegram id in
+``start_param`` (``<telegram_id>`` or ``ref_<telegram_id>``). The referrer is
+resolved through the unique ``telegram_id`` index and the friend row and the
+referral count are written in the signup transaction, so the client no longer
+creates the friendship itself. Onboarding inserts the friend row with the new
+user, ``create_user`` upserts it so a pair the client already created is not
+counted twice.
+"""
+
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.friend import leaderboard
+from app.friend.models import FRIEND_PAIR, FriendModel
+from app.user.models import UserModel
+from core.upsert import upsert
+
+START_PARAM_PREFIX = "ref_"
+
+
+def referrer_telegram_id(start_param: Optional[str]) -> Optional[str]:
+    """Telegram id a start param refers to, None if it carries none"""
+    if not start_param:
+        return None
+    start_param = start_param.strip()
+    if start_param.startswith(START_PARAM_PREFIX):
+        start_param = start_param[len(START_PARAM_PREFIX):]
+    return start_param or None
+
+
+def _referrer_id(db: Session, user: UserModel) -> Optional[int]:
+    """Id of the user the start param of ``user`` refers to, None for no or a self referral"""
+    telegram_id = referrer_telegram_id(user.start_param)
+    if telegram_id is None or telegram_id == user.telegram_id:
+        return None
+    return db.execute(
+        select(UserModel.id).where(UserModel.telegram_id == telegram_id)
+    ).scalar_one_or_none()
+
+
+def attribute_referral(db: Session, new_user: UserModel) -> Optional[FriendModel]:
+    """Link a new user to the referrer of its start param (caller flushes and commits)"""
+    sender_id = _referrer_id(db, new_user)
+    if sender_id is None:
+        return None
+
+    friend = FriendModel(sender_id=sender_id, receiver=new_user, status="active", has_claimed=False)
+    db.add(friend)
+    return friend
+
+
+def count_referral(db: Session, friend: FriendModel) -> None:
+    """Add a flushed referral to its sender's referral count (caller commits)"""
+    leaderboard.increment_referral_count(db, friend.sender_id)
+
+
+def upsert_referral(db: Session, user: UserModel) -> Optional[int]:
+    """Link a stored user to its referrer and recount the referrer, returns the referrer id (caller commits)
+
+    Safe to repeat for the same user, ``ux_friend_users`` keeps a single row and
+    the count is rebuilt instead of incremented.
+    """
+    sender_id = _referrer_id(db, user)
+    if sender_id is None:
+        return None
+
+    upsert(
+        db,
+        FriendModel,
+        dict(sender_id=sender_id, receiver_id=user.id, status="active", has_claimed=False),
+        FRIEND_PAIR,
+    )
+    leaderboard.refresh_referral_counts(db, [sender_id])
+    return sender_id
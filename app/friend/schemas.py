@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional, List, Literal
 from pydantic import BaseModel
+from core.serialization import SGTDateTime
 
 FriendStatusType = Literal["pending", "active", "rejected"]
 
@@ -18,12 +19,13 @@ class FriendBaseSchema(BaseModel):
     status: FriendStatusType
     has_claimed: bool
     id: int
-    updated_at: datetime
+    updated_at: SGTDateTime
     receiver_id: int
-    created_at: datetime
+    created_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
     class Config:
+        from_attributes = True
         use_enum_values = True
 
 
@@ -44,11 +46,12 @@ class FriendSchema(BaseModel):  # all except the relationship
     id: int
     status: FriendStatusType
     has_claimed: bool
-    created_at: datetime
-    updated_at: datetime
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
     class Config:
+        from_attributes = True
         use_enum_values = True
 
 
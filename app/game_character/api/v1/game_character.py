@@ -2,14 +2,17 @@
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from core import database
+from core.pagination import page_response
 from app.game_character import schemas
 from app.game_character.api.v1 import service
 
 
 get_db = database.get_db
+get_async_db = database.get_async_db
 
 router = APIRouter(prefix="/api/v1/game_character", tags=["game_character"])
 
@@ -21,9 +24,9 @@ def create_game_character(request: schemas.GameCharacterCreateRequestSchema, db:
 
 
 @router.get("/detail", response_model=List[schemas.GameCharacterRetrievalResponseSchema])
-def get_game_character(game_character_id: Optional[int] = None, user_id: Optional[int] = None,db: Session = Depends(get_db)):
+async def get_game_character(game_character_id: Optional[int] = None, user_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """Retrieve Game Character Details from Single User"""
-    return service.retrieve_game_character(game_character_id, user_id, db)
+    return await service.retrieve_game_character_async(game_character_id, user_id, db)
 
 
 @router.get("/detail/stat",response_model=schemas.GameCharacterStatRetrievalResponseSchema)
@@ -32,9 +35,9 @@ def get_game_character_stat(id: Optional[int] = None, game_character_id: Optiona
     return service.retrieve_game_character_stat(id, game_character_id, db)
 
 @router.get("/details/all/list", response_model=List[schemas.GameCharacterRetrievalResponseSchema])
-def get_game_character_list(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, db: Session = Depends(get_db)):
+def get_game_character_list(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """Retrieve Game Character List from all Users"""
-    return service.retrieve_game_character_all_list(db, user_ids, skip, limit)
+    return page_response(service.retrieve_game_character_all_list(db, user_ids, skip, limit, cursor))
 
 @router.get("/detail/list/{user_id}", response_model=List[schemas.GameCharacterSchema])
 def get_game_character_from_one_user(user_id: int, skip: int = 0, limit: int = 15, db: Session = Depends(get_db)):
@@ -1,12 +1,16 @@
 """Game Character App Business Logics"""
 import logging
-import pytz
 from typing import List, Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException, status
 
 from app.game_character import schemas
 from app.game_character.models import GameCharacterModel, GameCharacterStatsModel
+from app.user import cache as user_cache
+from core.pagination import Page, decode_cursor, page_of, paginate
+from core.upsert import upsert
 
 def create_game_character(request: schemas.GameCharacterCreateRequestSchema, db: Session) -> schemas.GameCharacterCreateResponseSchema:
     """Create New Game Character"""
@@ -22,105 +26,95 @@ def create_game_character(request: schemas.GameCharacterCreateRequestSchema, db:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="missing title")
     
     try:
-        game_character = (
-            db.query(GameCharacterModel).filter(
-                GameCharacterModel.first_name.ilike(request.character_details.first_name),
-                GameCharacterModel.last_name.ilike(request.character_details.last_name),
-            )
-            .first()
-        )
-    
-        if game_character and game_character.user_id == request.user_id:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail=f"Character with same name already exists")
-
-        new_game_character = GameCharacterModel(
-            first_name=request.character_details.first_name,
-            last_name=request.character_details.last_name,
-            gender=request.character_details.gender,
-            title=request.character_details.title,
-            user_id=request.user_id,
-            custom_logs=request.character_details.custom_logs,
+        # Same user and name lands on the existing character and its stats
+        new_game_character = upsert(
+            db,
+            GameCharacterModel,
+            dict(
+                first_name=request.character_details.first_name,
+                last_name=request.character_details.last_name,
+                gender=request.character_details.gender,
+                title=request.character_details.title,
+                user_id=request.user_id,
+                custom_logs=request.character_details.custom_logs,
+            ),
+            ["user_id", "first_name", "last_name"],
         )
+        stats = upsert(db, GameCharacterStatsModel, dict(game_character_id=new_game_character.id), ["game_character_id"])
 
-        stats = GameCharacterStatsModel(game_character=new_game_character)
-        db.add(new_game_character)
-        db.add(stats)
-        db.commit()
-        db.refresh(new_game_character)
-
-        return schemas.GameCharacterCreateResponseSchema(
+        response = schemas.GameCharacterCreateResponseSchema(
             game_character_id=new_game_character.id,
-            character_stats=schemas.GameCharacterStatsSchema(
-                id=stats.id,
-                level=stats.level,
-                exp_points=stats.exp_points,
-                stamina=stats.stamina,
-                recovery=stats.recovery,
-                condition=stats.recovery,
-                created_at=stats.created_at.astimezone(pytz.timezone('Asia/Singapore')) if stats.created_at else None,
-                updated_at=stats.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if stats.updated_at else None,
-                custom_logs=stats.custom_logs,
-            ),
+            character_stats=schemas.GameCharacterStatsSchema.model_validate(stats),
         )
+        user_id = new_game_character.user_id
+        db.commit()
+        user_cache.invalidate_user(user_id)
+        return response
     except Exception as e:
         logging.error(f"An error occurred: {e}")  
 
 
-def retrieve_game_character(game_character_id: Optional[int], user_id: Optional[int], db: Session)-> List[schemas.GameCharacterCreateResponseSchema]:
-    """Retrieve Game Character Details from Single User"""
+def _game_character_filters(game_character_id: Optional[int], user_id: Optional[int]):
+    """Build the filters of a game character lookup"""
     if not game_character_id and not user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Missing id or game character id")
+
+    filters = []
+    if game_character_id is not None:
+        filters.append(GameCharacterModel.id == game_character_id)
+
+    if user_id is not None:
+        filters.append(GameCharacterModel.user_id == user_id)
+    return filters
+
+
+def _game_character_retrieval(game_character: GameCharacterModel) -> schemas.GameCharacterRetrievalResponseSchema:
+    """Build the game character payload from a character with its stats loaded"""
+    return schemas.GameCharacterRetrievalResponseSchema(
+        character_details=schemas.GameCharacterDetailsSchema(
+            game_character_base=schemas.GameCharacterSchema.model_validate(game_character)
+        ),
+        character_stats=[
+            schemas.GameCharacterStatDetailsSchema(
+                game_character_id=stat.game_character_id,
+                game_character_stat_base=schemas.GameCharacterStatsSchema.model_validate(stat),
+            )
+            for stat in game_character.stats
+        ]
+    )
+
+
+def retrieve_game_character(game_character_id: Optional[int], user_id: Optional[int], db: Session)-> List[schemas.GameCharacterCreateResponseSchema]:
+    """Retrieve Game Character Details from Single User"""
+    filters = _game_character_filters(game_character_id, user_id)
     
     try:
-        base_query = db.query(GameCharacterModel)
-        filters = []
+        existing_characters = db.query(GameCharacterModel).options(selectinload(GameCharacterModel.stats)).filter(*filters).all()
 
-        if game_character_id is not None:
-            filters.append(GameCharacterModel.id == game_character_id)
+        if not existing_characters:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"Game Character with id {game_character_id} not found")
 
-        if user_id is not None:
-            filters.append(GameCharacterModel.user_id == user_id)
+        return [_game_character_retrieval(game_character) for game_character in existing_characters]
+    except Exception as e:
+        logging.error(f"An error occurred: {e}")
 
-        if filters:
-            existing_characters = base_query.filter(*filters).all()
 
-            if not existing_characters:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"Game Character with id {game_character_id} not found")
+async def retrieve_game_character_async(game_character_id: Optional[int], user_id: Optional[int], db: AsyncSession)-> List[schemas.GameCharacterCreateResponseSchema]:
+    """Async variant of retrieve_game_character, stats are eager loaded up front"""
+    filters = _game_character_filters(game_character_id, user_id)
 
-            return [
-                schemas.GameCharacterRetrievalResponseSchema(
-                    character_details=schemas.GameCharacterDetailsSchema(
-                        game_character_base=schemas.GameCharacterSchema(
-                            id=game_character.id,
-                            first_name=game_character.first_name,
-                            last_name=game_character.last_name,
-                            gender=game_character.gender,
-                            title=game_character.title,
-                            created_at=game_character.created_at.astimezone(pytz.timezone('Asia/Singapore')) if game_character.created_at else None,
-                            updated_at=game_character.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if game_character.updated_at else None,
-                            custom_logs=game_character.custom_logs,
-                        )
-                    ),
-                    character_stats=[
-                        schemas.GameCharacterStatDetailsSchema(
-                            game_character_id=stat.game_character_id,
-                            game_character_stat_base=schemas.GameCharacterStatsSchema(
-                                id=stat.id,
-                                level=stat.level,
-                                exp_points=stat.exp_points,
-                                stamina=stat.stamina,
-                                recovery=stat.recovery,
-                                condition=stat.condition,
-                                created_at=stat.created_at.astimezone(pytz.timezone('Asia/Singapore')) if stat.created_at else None,
-                                updated_at=stat.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if stat.updated_at else None,
-                                custom_logs=stat.custom_logs,
-                            ),
-                        )
-                        for stat in game_character.stats
-                    ]
-                )
-                for game_character in existing_characters
-            ]
+    try:
+        result = await db.execute(
+            select(GameCharacterModel)
+            .where(*filters)
+            .options(selectinload(GameCharacterModel.stats))
+        )
+        existing_characters = result.scalars().all()
+
+        if not existing_characters:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail=f"Game Character with id {game_character_id} not found")
+
+        return [_game_character_retrieval(game_character) for game_character in existing_characters]
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
@@ -147,64 +141,25 @@ def retrieve_game_character_stat(id: Optional[int], game_character_id: Optional[
             
             return schemas.GameCharacterStatRetrievalResponseSchema(
                 game_character_id=existing_stats.game_character_id,
-                character_stats=schemas.GameCharacterStatsSchema(
-                    id=existing_stats.id,
-                    level=existing_stats.level,
-                    exp_points=existing_stats.exp_points,
-                    stamina=existing_stats.stamina,
-                    recovery=existing_stats.recovery,
-                    condition=existing_stats.condition,
-                    created_at=existing_stats.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_stats.created_at else None,
-                    updated_at=existing_stats.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_stats.updated_at else None,
-                    custom_logs=existing_stats.custom_logs,
-                    ),
+                character_stats=schemas.GameCharacterStatsSchema.model_validate(existing_stats),
                 )
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
 
-def retrieve_game_character_all_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15) -> List[schemas.GameCharacterCreateResponseSchema]:
+def retrieve_game_character_all_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15, cursor: Optional[str] = None) -> Page:
     """Retrieve Game Character List from all Users"""
+    after_id = decode_cursor(cursor)
+
     try:
+        query = db.query(GameCharacterModel).options(selectinload(GameCharacterModel.stats))
         if user_ids:
-            existing_game_characters = db.query(GameCharacterModel).filter(GameCharacterModel.user_id.in_(user_ids)).offset(skip).limit(limit).all()
-        else:
-            existing_game_characters = db.query(GameCharacterModel).offset(skip).limit(limit).all()
-        return [
-            schemas.GameCharacterRetrievalResponseSchema(
-                character_details=schemas.GameCharacterDetailsSchema(
-                    game_character_base=schemas.GameCharacterSchema(
-                        id=existing_game_character.id, 
-                        first_name=existing_game_character.first_name,
-                        last_name=existing_game_character.last_name,
-                        gender=existing_game_character.gender,
-                        title=existing_game_character.title,
-                        created_at=existing_game_character.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_game_character.created_at else None,
-                        updated_at=existing_game_character.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_game_character.updated_at else None,
-                        custom_logs=existing_game_character.custom_logs,
-                    )
-                ),
-                character_stats=[
-                    schemas.GameCharacterStatDetailsSchema(
-                        game_character_id=stat.game_character_id,
-                        game_character_stat_base=schemas.GameCharacterStatsSchema(
-                            id=stat.id,
-                            level=stat.level,
-                            exp_points=stat.exp_points,
-                            stamina=stat.stamina,
-                            recovery=stat.recovery,
-                            condition=stat.condition,
-                            created_at=stat.created_at.astimezone(pytz.timezone('Asia/Singapore')) if stat.created_at else None,
-                            updated_at=stat.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if stat.updated_at else None,
-                            custom_logs=stat.custom_logs,
-                        ),
-                    )
-                    for  stat in existing_game_character.stats
-                ]
-            )
-
-            for existing_game_character in existing_game_characters
-        ]
+            query = query.filter(GameCharacterModel.user_id.in_(user_ids))
+        existing_game_characters, next_cursor = page_of(paginate(query, GameCharacterModel.id, skip, limit, after_id).all(), limit)
+        return Page(
+            [_game_character_retrieval(existing_game_character) for existing_game_character in existing_game_characters],
+            next_cursor,
+        )
     except Exception as e:
         logging.error(f"An error occured: {e}")
       
@@ -216,16 +171,7 @@ def retrieve_game_character_list_from_one_user(db: Session, user_id: int, skip:
     try:
         existing_game_characters = db.query(GameCharacterModel).filter(GameCharacterModel.user_id==user_id).offset(skip).limit(limit).all()
         return [
-            schemas.GameCharacterSchema(
-                id=existing_game_character.id,
-                first_name=existing_game_character.first_name,
-                last_name=existing_game_character.last_name,
-                gender=existing_game_character.gender,
-                title=existing_game_character.title,
-                created_at=existing_game_character.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_game_character.created_at else None,
-                updated_at=existing_game_character.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_game_character.updated_at else None,
-                custom_logs=existing_game_character.custom_logs,
-            )
+            schemas.GameCharacterSchema.model_validate(existing_game_character)
             for existing_game_character in existing_game_characters
         ]
     except Exception as e:
@@ -255,31 +201,13 @@ def update_game_character(request: schemas.GameCharacterUpdateRequestSchema, db:
                     setattr(stats, field, value)
         
         db.commit()
+        user_cache.invalidate_user(game_character.user_id)
         db.refresh(game_character)
         db.refresh(stats)
         
         return schemas.GameCharacterUpdateResponseSchema(
-            character_details=schemas.GameCharacterSchema(
-                id=game_character.id,
-                first_name=game_character.first_name,
-                last_name=game_character.last_name,
-                gender=game_character.gender,
-                title=game_character.title,
-                created_at=game_character.created_at.astimezone(pytz.timezone('Asia/Singapore')) if game_character.created_at else None,
-                updated_at=game_character.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if game_character.updated_at else None,
-                custom_logs=game_character.custom_logs,
-            ),
-            character_stats=schemas.GameCharacterStatsSchema(
-                id=stats.id,
-                level=stats.level,
-                exp_points=stats.exp_points,
-                stamina=stats.stamina,
-                recovery=stats.recovery,
-                condition=stats.condition,
-                created_at=stats.created_at.astimezone(pytz.timezone('Asia/Singapore')) if stats.created_at else None,
-                updated_at=stats.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if stats.updated_at else None,
-                custom_logs=stats.custom_logs,
-            )
+            character_details=schemas.GameCharacterSchema.model_validate(game_character),
+            character_stats=schemas.GameCharacterStatsSchema.model_validate(stats)
         )
     except Exception as e:
         logging.error(f"An error occured: {e}")
@@ -293,6 +221,7 @@ def delete_game_character(id: int, db: Session):
         if db_game_character:
             db.delete(db_game_character)
             db.commit()
+            user_cache.invalidate_user(db_game_character.user_id)
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Game Character {id} not found")
         
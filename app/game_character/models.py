@@ -2,7 +2,7 @@
 
 from datetime import datetime
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, UniqueConstraint, DateTime, JSON
+from sqlalchemy import String, Integer, ForeignKey, UniqueConstraint, DateTime, JSON, Index
 from core.database import Base
 from typing import Optional
 
@@ -11,8 +11,6 @@ class GameCharacterModel(Base):
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
-        unique=True,
-        index=True,
         nullable=False,
         autoincrement=True,
     )
@@ -28,6 +26,9 @@ class GameCharacterModel(Base):
     user = relationship("UserModel", back_populates="game_characters", single_parent=True)
     stats = relationship("GameCharacterStatsModel", back_populates="game_character")
 
+    # A user names each character once, the key also serves the user_id lookups
+    __table_args__ = (Index("ux_game_character_user_name", "user_id", "first_name", "last_name", unique=True),)
+
     def __repr__(self) -> str:
         return f"<CharacterModel first_name={self.first_name} by {self.user_id}>"
 
@@ -37,8 +38,6 @@ class GameCharacterStatsModel(Base):
     id: Mapped[int] = mapped_column(
         Integer, 
         primary_key=True, 
-        unique=True, 
-        index=True, 
         nullable=False,
         autoincrement=True,
     )
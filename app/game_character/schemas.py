@@ -5,6 +5,7 @@ Character App Pydantic Schemas (Based on Reference)
 from datetime import datetime
 from typing import Optional, List
 from pydantic import BaseModel
+from core.serialization import SGTDateTime
 
 
 class GameCharacterBaseSchema(BaseModel):
@@ -15,10 +16,15 @@ class GameCharacterBaseSchema(BaseModel):
     last_name: str
     gender: int  # Assuming gender is an integer
     title: str
-    created_at: datetime
-    updated_at: datetime
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
 
 class GameCharacterStatBaseSchema(BaseModel):
     """Game Character Stat Schema"""
@@ -41,10 +47,15 @@ class GameCharacterStatsSchema(BaseModel):
     stamina: int  # (strength from reference)
     recovery: int  # (driving from reference)
     condition: int  # (club_control from reference)
-    created_at: datetime
-    updated_at: datetime
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
     # Removed spin and putt fields not present in the model
 
 
@@ -56,10 +67,15 @@ class GameCharacterSchema(BaseModel):
     last_name: str
     gender: int
     title: str
-    created_at: datetime
-    updated_at: datetime
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
 
 class GameCharacterDetailsSchema(BaseModel):  # Base + relationship
     """Game Character Details Schema (Matches Reference with Model Adjustments)"""
@@ -0,0 +1,69 @@
+"""Passive Income Accrual
+
+``extra_profit_per_hour`` earns points continuously, but no job writes them as
+time passes. A point row keeps the income earned up to ``last_accrued_at`` in
+``profit_amount`` and readers add what the current rate earned since then:
+
+    profit = profit_amount + floor(extra_profit_per_hour * hours since last_accrued_at)
+
+The row is only brought forward (materialized) when its rate changes
+(``app.point.ledger.apply``) or when the user claims the income, so nothing
+touches the point table on a schedule. The ranking computes the same amount
+in SQL (``accrued_sql``) from the rate and clock copied to the leaderboard.
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, and_, case, cast, func, literal, literal_column
+
+from app.point.models import PointModel
+
+SECONDS_PER_HOUR = 3600
+
+
+def accrued_since(rate: Optional[int], since: Optional[datetime], now: datetime) -> Tuple[int, datetime]:
+    """Whole points earned at ``rate`` per hour from ``since`` to ``now``, and the time they are earned through
+
+    Only the time the whole points took moves the clock, the fraction of a
+    point carries over to the next read. Without a positive rate nothing
+    carries over and the clock moves to ``now``.
+    """
+    if since is None or not rate or rate <= 0:
+        return 0, now
+    if now <= since:
+        return 0, since
+    earned = int(rate * (now - since).total_seconds() // SECONDS_PER_HOUR)
+    # Whole seconds, DATETIME columns drop the fraction
+    return earned, since + timedelta(seconds=math.ceil(earned * SECONDS_PER_HOUR / rate))
+
+
+def profit(point: PointModel, now: Optional[datetime] = None) -> int:
+    """Passive income of a point row up to now, materialized or not"""
+    earned, _ = accrued_since(point.extra_profit_per_hour, point.last_accrued_at, now or datetime.now())
+    return (point.profit_amount or 0) + earned
+
+
+def materialize(point: PointModel, now: Optional[datetime] = None) -> int:
+    """Move the income earned so far into ``profit_amount``, return the points moved
+
+    The caller holds the row lock (``with_for_update``) and commits.
+    """
+    earned, through = accrued_since(point.extra_profit_per_hour, point.last_accrued_at, now or datetime.now())
+    point.profit_amount = (point.profit_amount or 0) + earned
+    point.last_accrued_at = through
+    return earned
+
+
+def accrued_sql(dialect_name: str, rate, since, now: datetime):
+    """SQL counterpart of ``accrued_since`` for whole seconds, the points earned at ``rate`` from ``since`` to ``now``"""
+    now = literal(now.replace(microsecond=0), DateTime)
+    if dialect_name == "sqlite":
+        seconds = cast(func.strftime("%s", now), Integer) - cast(func.strftime("%s", since), Integer)
+    else:
+        seconds = func.timestampdiff(literal_column("SECOND"), since, now, type_=Integer)
+    return case(
+        (and_(rate > 0, since.is_not(None), since < now), rate * seconds // SECONDS_PER_HOUR),
+        else_=0,
+    )
@@ -2,17 +2,22 @@
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core import database
+from core import database, singleflight
+from core.pagination import page_response
 from app.point import schemas
 from app.point.api.v1 import service
 
 
 get_db = database.get_db
+get_async_db = database.get_async_db
 
 router = APIRouter(prefix="/api/v1/point", tags=["point"])
 
+ranking_flight = singleflight.group("point_ranking")
+
 @router.post("/create", response_model=schemas.PointCreateResponseSchema)
 def create_point(request: schemas.PointCreateRequestSchema, db: Session = Depends(get_db)):
     """Create Point"""
@@ -20,15 +25,27 @@ def create_point(request: schemas.PointCreateRequestSchema, db: Session = Depend
 
 
 @router.get("/detail", response_model=schemas.PointRetrievalResponseSchema)
-def get_point_detail(id: Optional[int] = None, user_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_point_detail(id: Optional[int] = None, user_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """Retrieve Point Details from Single User"""
-    return service.retrieve_point(id, user_id, db)
+    return await service.retrieve_point_async(id, user_id, db)
+
+
+@router.get("/balance", response_model=schemas.PointBalanceResponseSchema)
+async def get_point_balance(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Point Balance of a User, including the passive income earned so far"""
+    return await service.retrieve_balance_async(user_id, db)
+
+
+@router.post("/claim-profit", response_model=schemas.PointBalanceResponseSchema)
+def claim_profit(request: schemas.PointClaimProfitRequestSchema, db: Session = Depends(get_db)):
+    """Claim the passive income earned so far into the user's points"""
+    return service.claim_profit(request, db)
 
 
 @router.get("/details", response_model=List[schemas.PointRetrievalResponseSchema])
-def get_details(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, db: Session = Depends(get_db)):
+def get_details(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """Retrieve Points by List from Multiple Users"""
-    return service.retrieve_point_list(db, user_ids, skip, limit)
+    return page_response(service.retrieve_point_list(db, user_ids, skip, limit, cursor))
 
 
 @router.put("/update", response_model=schemas.PointUpdateResponseSchema)
@@ -36,7 +53,17 @@ def update_point(request: schemas.PointUpdateByIdRequestSchema, db: Session = De
     """Update Point"""
     return service.update_point(request, db)
 
+@router.post("/batch-update", response_model=schemas.PointBatchUpdateResponseSchema)
+def batch_update_point(request: schemas.PointBatchUpdateRequestSchema, db: Session = Depends(get_db)):
+    """Credit or debit many users at once, e.g. a tournament payout"""
+    return service.batch_update_point(request, db)
+
+@router.get('/ledger/compact')
+def compact_ledger(db: Session = Depends(get_db)):
+    """Fold the pending point ledger entries into the point rows"""
+    return service.compact_ledger(db)
+
 @router.get('/ranking', response_model=schemas.PointRankingResponse)
 def get_point_ranking(user_id: int, db: Session = Depends(get_db)):
     """Get Point Ranking"""
-    return service.get_point_ranking(user_id, db)
\ No newline at end of file
+    return ranking_flight.do(user_id, lambda: service.get_point_ranking(user_id, db))
\ No newline at end of file
@@ -1,17 +1,23 @@
 """Point App Business Logics"""
 
 import logging
-import pytz
-from typing import List, Optional
-from sqlalchemy import desc, func
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import case, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
-from sqlalchemy import func, desc
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.point import schemas
+from app.point import accrual, leaderboard, ledger
 from app.point.models import PointModel
 from app.user.models import UserModel
+from app.user import cache as user_cache
+from core.constants import Constants
+from core.pagination import Page, decode_cursor, page_of, paginate
+from core.serialization import to_sgt
+from core.upsert import upsert
 
 def create_point(request: schemas.PointCreateRequestSchema, db: Session) -> schemas.PointCreateResponseSchema:
     """Create Point"""
@@ -22,125 +28,157 @@ def create_point(request: schemas.PointCreateRequestSchema, db: Session) -> sche
     #     raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Amount and extra profit per hour are required")
     
     try:
-        point = db.query(PointModel).filter(PointModel.user_id == request.user_id).first()
-
-        if point:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Point already exists")
-
-        new_point = PointModel(
-            user_id=request.user_id,
-            login_amount=request.point_details.login_amount,
-            referral_amount=request.point_details.referral_amount,
-            extra_profit_per_hour=request.point_details.extra_profit_per_hour,
-            custom_logs=request.point_details.custom_logs,
+        # A second create for the user gets the existing row back
+        new_point = upsert(
+            db,
+            PointModel,
+            dict(
+                user_id=request.user_id,
+                login_amount=request.point_details.login_amount,
+                referral_amount=request.point_details.referral_amount,
+                extra_profit_per_hour=request.point_details.extra_profit_per_hour,
+                custom_logs=request.point_details.custom_logs,
+            ),
+            ["user_id"],
         )
+        leaderboard.refresh_point_totals(db, [new_point.user_id])
 
-        db.add(new_point)
-        db.commit()
-        db.refresh(new_point)
-
-        return schemas.PointCreateResponseSchema(
+        response = schemas.PointCreateResponseSchema(
             point_base=schemas.PointDetailsSchema(
-                point=schemas.PointSchema(
-                    id=new_point.id,
-                    login_amount=new_point.login_amount,
-                    referral_amount=new_point.referral_amount,
-                    extra_profit_per_hour=new_point.extra_profit_per_hour,
-                    created_at=new_point.created_at.astimezone(pytz.timezone('Asia/Singapore')) if new_point.created_at else None, 
-                    updated_at=new_point.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if new_point.updated_at else None, 
-                    custom_logs=new_point.custom_logs,
-                )
+                point=schemas.PointSchema.model_validate(new_point)
             )
         )
+        user_id = new_point.user_id
+        db.commit()
+        user_cache.invalidate_user(user_id)
+        return response
         
     except Exception as e:
         logging.error(f"An error occured: {e}")
 
 
-def retrieve_point(id: Optional[int], user_id: Optional[int], db: Session) -> schemas.PointRetrievalResponseSchema:
-    """Retrieve Point Details from Single User"""
+def _point_filters(id: Optional[int], user_id: Optional[int]):
+    """Build the filters of a single point lookup"""
     if not id and not user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="Missing id or user_id")
-    
-    try:
-        base_query = db.query(PointModel)
-        filters = []
-    
-        if id is not None: 
-            filters.append(PointModel.id == id)
 
-        if user_id is not None:
-            filters.append(PointModel.user_id == user_id)
+    filters = []
+    if id is not None: 
+        filters.append(PointModel.id == id)
+
+    if user_id is not None:
+        filters.append(PointModel.user_id == user_id)
+    return filters
 
-        if filters: 
-            existing_point = base_query.filter(*filters).first()
+
+def _point_retrieval_response(existing_point: PointModel) -> schemas.PointRetrievalResponseSchema:
+    """Build the point detail response from a loaded point"""
+    return schemas.PointRetrievalResponseSchema(
+        point_base=schemas.PointDetailsSchema(
+            user_id=existing_point.user_id,
+            point=schemas.PointSchema.model_validate(existing_point),
+        )
+    )
+
+
+def retrieve_point(id: Optional[int], user_id: Optional[int], db: Session) -> schemas.PointRetrievalResponseSchema:
+    """Retrieve Point Details from Single User"""
+    filters = _point_filters(id, user_id)
+    
+    try:
+        existing_point = db.query(PointModel).filter(*filters).first()
             
-            if not existing_point:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Point not found")
+        if not existing_point:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Point not found")
             
-            return schemas.PointRetrievalResponseSchema(
-                point_base=schemas.PointDetailsSchema(
-                    user_id=existing_point.user_id,
-                    point=schemas.PointSchema(
-                        id=existing_point.id,
-                        login_amount=existing_point.login_amount,
-                        referral_amount=existing_point.referral_amount,
-                        extra_profit_per_hour=existing_point.extra_profit_per_hour,
-                        created_at=existing_point.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.created_at else None, 
-                        updated_at=existing_point.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.updated_at else None, 
-                        custom_logs=existing_point.custom_logs,
-                    ),
-                )
-            )
+        return _point_retrieval_response(existing_point)
     except Exception as e:
         logging.error(f"An error occurred: {e}")  
 
+
+async def retrieve_point_async(id: Optional[int], user_id: Optional[int], db: AsyncSession) -> schemas.PointRetrievalResponseSchema:
+    """Async variant of retrieve_point"""
+    filters = _point_filters(id, user_id)
+
+    try:
+        result = await db.execute(select(PointModel).where(*filters).limit(1))
+        existing_point = result.scalars().first()
+
+        if not existing_point:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="Point not found")
+
+        return _point_retrieval_response(existing_point)
+    except Exception as e:
+        logging.error(f"An error occurred: {e}")
+
+
+async def retrieve_balance_async(user_id: int, db: AsyncSession) -> schemas.PointBalanceResponseSchema:
+    """Point balance of a user, including the passive income earned so far"""
+    result = await db.execute(select(PointModel).where(PointModel.user_id == user_id).limit(1))
+    existing_point = result.scalars().first()
+
+    if not existing_point:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Point with user id {user_id} not found")
+
+    return _balance_response(existing_point)
+
+
+def _balance_response(existing_point: PointModel) -> schemas.PointBalanceResponseSchema:
+    balance = ledger.balance(existing_point)
+    return schemas.PointBalanceResponseSchema(
+        user_id=existing_point.user_id,
+        login_amount=balance.login_amount,
+        referral_amount=balance.referral_amount,
+        extra_profit_per_hour=balance.extra_profit_per_hour,
+        profit_amount=balance.profit_amount,
+        total_points=balance.total_points,
+        last_accrued_at=to_sgt(existing_point.last_accrued_at),
+    )
+
+
+def claim_profit(request: schemas.PointClaimProfitRequestSchema, db: Session) -> schemas.PointBalanceResponseSchema:
+    """Materialize the passive income of a user into its point row and leaderboard total"""
+    try:
+        existing_point = (
+            db.query(PointModel)
+            .filter(PointModel.user_id == request.user_id)
+            .with_for_update()
+            .first()
+        )
+        if not existing_point:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Point with user id {request.user_id} not found")
+
+        accrual.materialize(existing_point)
+        db.flush()
+        leaderboard.refresh_point_totals(db, [existing_point.user_id])
+
+        response = _balance_response(existing_point)
+        db.commit()
+        user_cache.invalidate_user(request.user_id)
+        return response
+
+    except HTTPException:
+        raise
+
+    except SQLAlchemyError as e:
+        db.rollback()
+        logging.error(f"Database error occurred: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error occurred")
+
+
 def get_point_ranking(user_id: int, db: Session) -> schemas.PointRankingResponse:
     """Get point ranking"""
     logging.info(f"get_point_ranking called with user_id={user_id}")
     try:
-        # Query to rank users based on total points from login amaunt and referral amount
-        point_subquery = db.query(
-            PointModel.user_id,
-            (PointModel.login_amount + PointModel.referral_amount).label('total_points'),
-        ).subquery()
-        
-        ranking_query = db.query(
-            UserModel.id,
-            UserModel.username,
-            UserModel.telegram_id,
-            point_subquery.c.total_points,
-            func.rank().over(order_by=desc(point_subquery.c.total_points)).label('rank'),
-        ).join(point_subquery, UserModel.id == point_subquery.c.user_id)
-
-        # Get all rankings
-        all_rankings = ranking_query.all()
-        
-        # Get the top 10 users  
-        top_10 = all_rankings[:10]
-        
-        # Create the ranking list with rank, total points, user_id, username, and telegram_id
-        ranking_list = [
-            {
-                "rank": record.rank,
-                "total_points": record.total_points,
-                "user_id": record.id,
-                "telegram_id": record.telegram_id,
-                "username": record.username, 
-            } for record in top_10
-        ]
-        
-        user_info = next((record for record in all_rankings if record.id == user_id), None)
-
-        if user_info:
-            user_rank_info = {
-                "rank": user_info.rank,
-                "total_points": user_info.total_points,
-                "user_id": user_info.id,
-                "telegram_id": user_info.telegram_id,
-                "username": user_info.username,
-            }
-        user_in_top_10 = any(record.id == user_id for record in top_10)
+        # Both rank the accrued income up to the same moment
+        now = datetime.now()
+        user_rank_info = leaderboard.get_user_rank(db, user_id, now)
+
+        if not user_rank_info:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Point with user id {user_id} not found")
+
+        ranking_list = leaderboard.get_top_users(db, 10, now)
+        user_in_top_10 = any(record["user_id"] == user_id for record in ranking_list)
         
         return {
             "top_10": ranking_list,
@@ -148,6 +186,9 @@ def get_point_ranking(user_id: int, db: Session) -> schemas.PointRankingResponse
             "user_in_top_10": user_in_top_10
         }
     
+    except HTTPException:
+        raise
+
     except SQLAlchemyError as e:
         logging.error(f"Database error occurred: {e}")
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Database error occurred: {str(e)}")
@@ -167,50 +208,31 @@ def retrieve_point_by_user_id(user_id: int, db: Session) -> schemas.PointRetriev
         if not existing_point:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Point with user id {user_id} not found")
     
-        return schemas.PointRetrievalResponseSchema(
-            point_base=schemas.PointDetailsSchema(
-                user_id=existing_point.user_id,
-                point=schemas.PointSchema(
-                    id=existing_point.id,
-                    login_amount=existing_point.login_amount,
-                    referral_amount=existing_point.referral_amount,
-                    extra_profit_per_hour=existing_point.extra_profit_per_hour,
-                    created_at=existing_point.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.created_at else None, 
-                    updated_at=existing_point.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.updated_at else None, 
-                    custom_logs=existing_point.custom_logs,
-                ),
-            )
-        )
+        return _point_retrieval_response(existing_point)
 
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
 
-def retrieve_point_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15) -> List[schemas.PointRetrievalResponseSchema]:
+def retrieve_point_list(db: Session, user_ids: List[int], skip: int = 0, limit: int = 15, cursor: Optional[str] = None) -> Page:
     """Retrieve Points by List from Multiple Users"""
+    after_id = decode_cursor(cursor)
+
     try:
+        query = db.query(PointModel)
         if user_ids:
-            existing_points = db.query(PointModel).filter(PointModel.user_id.in_(user_ids)).offset(skip).limit(limit).all()
-        else:
-            existing_points = db.query(PointModel).offset(skip).limit(limit).all()
+            query = query.filter(PointModel.user_id.in_(user_ids))
+        existing_points, next_cursor = page_of(paginate(query, PointModel.id, skip, limit, after_id).all(), limit)
         
-        return [
+        return Page([
             schemas.PointRetrievalResponseSchema(
                 point_base=schemas.PointDetailsSchema(
                     user_id=ex.user_id,
-                    point=schemas.PointSchema(
-                        id=ex.id,
-                        login_amount=ex.login_amount,
-                        referral_amount=ex.referral_amount,
-                        extra_profit_per_hour=ex.extra_profit_per_hour,
-                        created_at=ex.created_at,
-                        updated_at=ex.updated_at,
-                        custom_logs=ex.custom_logs,
-                    ),
+                    point=schemas.PointSchema.model_validate(ex),
                 )
             )
             for ex in existing_points
-        ]
+        ], next_cursor)
         
     except Exception as e:
             logging.error(f"An error occurred: {e}")
@@ -222,52 +244,153 @@ def update_point(request: schemas.PointUpdateByIdRequestSchema, db: Session) ->
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Type and request are required")
     
     try:
-        existing_point = db.query(PointModel).filter(PointModel.id == request.id).first()
+        payload = request.point_payload or schemas.PointCreateDetailsSchema()
+        # Only a rate change locks and writes the row, amounts are appended for compaction
+        changes_rate = bool(payload.extra_profit_per_hour)
+        query = db.query(PointModel).filter(PointModel.id == request.id)
+        if changes_rate:
+            query = query.with_for_update()
+        existing_point = query.first()
 
         if not existing_point:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Point with user_id {request.id} not found")
 
         if request.type == "add":
-            if request.point_payload.login_amount:
-                existing_point.login_amount += request.point_payload.login_amount
-            if request.point_payload.referral_amount:
-                existing_point.referral_amount += request.point_payload.referral_amount
-            if request.point_payload.extra_profit_per_hour: # can be add or minus for that
-                existing_point.extra_profit_per_hour += request.point_payload.extra_profit_per_hour
-
+            sign = 1
         elif request.type == "minus":
-            if request.point_payload.login_amount:
-                existing_point.login_amount -= request.point_payload.login_amount
-            if request.point_payload.login_amount:
-                existing_point.referral_amount -= request.point_payload.referral_amount
-            if request.point_payload.extra_profit_per_hour: # can be add or minus for that
-                existing_point.extra_profit_per_hour -= request.point_payload.extra_profit_per_hour
+            sign = -1
         else:
             raise HTTPException(status_code=status.HTTP_405_METHOD_NOT_ALLOWED, detail=f"Method not allowed")    
 
-    
-        db.commit()
-        db.refresh(existing_point)
-        
-        return schemas.PointUpdateResponseSchema(
+        if changes_rate:
+            ledger.apply(
+                db,
+                existing_point,
+                f"update_{request.type}",
+                login_amount=sign * (payload.login_amount or 0),
+                referral_amount=sign * (payload.referral_amount or 0),
+                extra_profit_per_hour=sign * payload.extra_profit_per_hour, # can be add or minus for that
+                custom_logs=payload.custom_logs,
+            )
+            db.flush()
+            leaderboard.refresh_point_totals(db, [existing_point.user_id])
+        else:
+            ledger.append_pending(
+                db,
+                existing_point,
+                f"update_{request.type}",
+                login_amount=sign * (payload.login_amount or 0),
+                referral_amount=sign * (payload.referral_amount or 0),
+                custom_logs=payload.custom_logs,
+            )
+
+        response = schemas.PointUpdateResponseSchema(
             point_base=schemas.PointDetailsSchema(
-                point=schemas.PointSchema(
-                    id=existing_point.id,
-                    login_amount=existing_point.login_amount,
-                    referral_amount=existing_point.referral_amount,
-                    extra_profit_per_hour=existing_point.extra_profit_per_hour,
-                    created_at=existing_point.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.created_at else None, 
-                    updated_at=existing_point.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_point.updated_at else None, 
-                    custom_logs=existing_point.custom_logs,
-                ),
+                point=schemas.PointSchema.model_validate(existing_point),
             user_id=existing_point.user_id
             )
         )
+        user_id = existing_point.user_id
+        db.commit()
+        user_cache.invalidate_user(user_id)
+        return response
         
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
 
+def _batch_update_chunk(db: Session, deltas: Dict[int, Dict[str, int]], user_ids: List[int], request: schemas.PointBatchUpdateRequestSchema, now: datetime) -> List[int]:
+    """Apply the summed deltas of a chunk of users in one grouped UPDATE, return the users owning a point row"""
+    rows = db.execute(
+        select(PointModel.user_id, PointModel.extra_profit_per_hour, PointModel.last_accrued_at)
+        .where(PointModel.user_id.in_(user_ids))
+        .with_for_update()
+    ).all()
+    found_user_ids = [row.user_id for row in rows]
+    if not found_user_ids:
+        return found_user_ids
+
+    # UPDATE point SET <field> = <field> + CASE user_id WHEN ... END per field with a delta
+    values = ledger.added_amounts(deltas, found_user_ids)
+
+    # The old rate's income is materialized before a rate changes
+    accrued = {
+        row.user_id: accrual.accrued_since(row.extra_profit_per_hour, row.last_accrued_at, now)
+        for row in rows
+        if deltas[row.user_id]["extra_profit_per_hour"]
+    }
+    if accrued:
+        values["profit_amount"] = PointModel.profit_amount + case(
+            {user_id: earned for user_id, (earned, _) in accrued.items()}, value=PointModel.user_id, else_=0
+        )
+        values["last_accrued_at"] = case(
+            {user_id: through for user_id, (_, through) in accrued.items()},
+            value=PointModel.user_id,
+            else_=PointModel.last_accrued_at,
+        )
+
+    db.execute(
+        update(PointModel)
+        .where(PointModel.user_id.in_(found_user_ids))
+        .values(updated_at=now, **values)
+        .execution_options(synchronize_session=False)
+    )
+    ledger.append_many(db, [
+        dict(user_id=user_id, reason=request.reason, custom_logs=request.custom_logs, compacted=True, **deltas[user_id])
+        for user_id in found_user_ids
+    ])
+    leaderboard.refresh_point_totals(db, found_user_ids)
+    return found_user_ids
+
+
+def batch_update_point(request: schemas.PointBatchUpdateRequestSchema, db: Session) -> schemas.PointBatchUpdateResponseSchema:
+    """Credit or debit many users in one transaction, one grouped UPDATE per chunk of users"""
+    if not request.entries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Entries are required")
+    if len(request.entries) > Constants.point_batch_max_entries:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {Constants.point_batch_max_entries} entries per batch")
+    if not request.reason or len(request.reason) > 50:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Reason of 1 to 50 characters is required")
+
+    # The deltas of a user are summed per field, one ledger entry records them
+    deltas: Dict[int, Dict[str, int]] = {}
+    for entry in request.entries:
+        if entry.field in ledger.AMOUNT_FIELDS:
+            user_deltas = deltas.setdefault(entry.user_id, dict.fromkeys(ledger.AMOUNT_FIELDS, 0))
+            user_deltas[entry.field] += entry.delta
+
+    user_ids = sorted(deltas)
+    found_user_ids = set()
+    now = datetime.now()
+    try:
+        for start in range(0, len(user_ids), Constants.point_batch_chunk_size):
+            chunk = user_ids[start:start + Constants.point_batch_chunk_size]
+            found_user_ids.update(_batch_update_chunk(db, deltas, chunk, request, now))
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        logging.error(f"Database error occurred: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error occurred, no entry was applied")
+    user_cache.invalidate_users(found_user_ids)
+
+    results = []
+    for entry in request.entries:
+        if entry.field not in ledger.AMOUNT_FIELDS:
+            entry_status = "invalid_field"
+        elif entry.user_id not in found_user_ids:
+            entry_status = "not_found"
+        else:
+            entry_status = "applied"
+        results.append(schemas.PointDeltaResultSchema(user_id=entry.user_id, field=entry.field, delta=entry.delta, status=entry_status))
+    applied = sum(result.status == "applied" for result in results)
+    return schemas.PointBatchUpdateResponseSchema(applied=applied, failed=len(results) - applied, results=results)
+
+
+def compact_ledger(db: Session) -> dict:
+    """Point ledger compaction, stops before the function timeout and the next call carries on"""
+    return ledger.compact(db, max_seconds=Constants.job_max_seconds)
+
+
 def delete_point(id: int, db:Session):
     """Delete Point"""
     try:
@@ -275,7 +398,10 @@ def delete_point(id: int, db:Session):
         
         if db_point:
             db.delete(db_point)
+            db.flush()
+            leaderboard.refresh_point_totals(db, [db_point.user_id])
             db.commit()
+            user_cache.invalidate_user(db_point.user_id)
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Point {id} not found")
         
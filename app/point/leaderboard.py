@@ -0,0 +1,169 @@
+"""Point Leaderboard
+
+Keeps one ``point_leaderboard`` row per user holding ``login_amount +
+referral_amount + profit_amount`` and the accrual rate and clock of the point
+row, so the point ranking reads one narrow row per user instead of a window
+function over the whole point table.
+
+The stored totals are refreshed when a point row changes. The ranking orders
+everyone on their current total: the stored total, the point ledger entries
+not compacted into the rows yet (app.point.ledger) and the passive income
+accrued since ``last_accrued_at`` at one ``now`` (app.point.accrual), so it
+agrees with the balances. Ordering on that sum scans the leaderboard instead
+of walking its index, one row per user plus the few pending entries a
+compaction run leaves behind.
+
+Rebuild from the point table after drift:
+
+    python -m app.point.leaderboard rebuild
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import false, func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.point import accrual
+from app.point.models import PointLeaderboardModel, PointLedgerModel, PointModel
+from app.user.models import UserModel
+from core import leaderboard
+
+
+def total_query(user_ids: Optional[List[int]] = None):
+    """Total points per user straight from the point table"""
+    query = select(
+        PointModel.user_id,
+        func.sum(
+            func.coalesce(PointModel.login_amount, 0)
+            + func.coalesce(PointModel.referral_amount, 0)
+            + PointModel.profit_amount
+        ),
+        # One point row per user (ux_point_user_id)
+        func.max(PointModel.extra_profit_per_hour),
+        func.max(PointModel.last_accrued_at),
+        literal(datetime.now()),
+    ).where(PointModel.user_id.is_not(None)).group_by(PointModel.user_id)
+    if user_ids is not None:
+        query = query.where(PointModel.user_id.in_(user_ids))
+    return query
+
+
+POINT_TOTALS = leaderboard.Aggregate(
+    model=PointLeaderboardModel,
+    columns=["user_id", "total_points", "extra_profit_per_hour", "last_accrued_at", "updated_at"],
+    query=total_query,
+    source_key=PointModel.user_id,
+)
+
+
+def refresh_point_totals(db: Session, user_ids: Iterable[int]) -> None:
+    """Recompute the totals of the given users (caller commits)"""
+    leaderboard.refresh(db, POINT_TOTALS, user_ids)
+
+
+async def refresh_point_totals_async(db: AsyncSession, user_ids: Iterable[int]) -> None:
+    """Async variant of refresh_point_totals (caller commits)"""
+    await leaderboard.refresh_async(db, POINT_TOTALS, user_ids)
+
+
+def rebuild_point_totals(db: Session) -> int:
+    """Rebuild the whole point_leaderboard table from the point table"""
+    return leaderboard.rebuild(db, POINT_TOTALS)
+
+
+def _pending_totals():
+    """Ledger amounts per user not compacted into the point rows yet"""
+    return (
+        select(
+            PointLedgerModel.user_id,
+            func.sum(PointLedgerModel.login_amount + PointLedgerModel.referral_amount).label("amount"),
+        )
+        .where(PointLedgerModel.compacted == false())
+        .group_by(PointLedgerModel.user_id)
+        .subquery()
+    )
+
+
+def _with_current_total(query, pending):
+    """Join the pending amounts of the leaderboard users to a query"""
+    return query.outerjoin(pending, pending.c.user_id == PointLeaderboardModel.user_id)
+
+
+def _current_total(db: Session, pending, now: datetime):
+    accrued = accrual.accrued_sql(
+        db.get_bind().dialect.name,
+        PointLeaderboardModel.extra_profit_per_hour,
+        PointLeaderboardModel.last_accrued_at,
+        now,
+    )
+    return PointLeaderboardModel.total_points + func.coalesce(pending.c.amount, 0) + accrued
+
+
+def _ranked_user_query(db: Session, pending, now: datetime):
+    query = (
+        db.query(
+            UserModel.id,
+            UserModel.telegram_id,
+            UserModel.username,
+            _current_total(db, pending, now).label("total_points"),
+        )
+        .join(PointLeaderboardModel, PointLeaderboardModel.user_id == UserModel.id)
+    )
+    return _with_current_total(query, pending)
+
+
+def get_top_users(db: Session, limit: int = 10, now: Optional[datetime] = None) -> List[dict]:
+    """Top users by current total points, tied users share the same rank"""
+    now = now or datetime.now()
+    pending = _pending_totals()
+    top = (
+        _ranked_user_query(db, pending, now)
+        .order_by(_current_total(db, pending, now).desc(), PointLeaderboardModel.user_id)
+        .limit(limit)
+        .all()
+    )
+
+    ranking_list = []
+    for position, row in enumerate(top, start=1):
+        # Same as rank(): a tie keeps the rank of the first user with that total
+        if ranking_list and ranking_list[-1]["total_points"] == row.total_points:
+            rank = ranking_list[-1]["rank"]
+        else:
+            rank = position
+        ranking_list.append({
+            "rank": rank,
+            "total_points": row.total_points,
+            "user_id": row.id,
+            "telegram_id": row.telegram_id,
+            "username": row.username,
+        })
+    return ranking_list
+
+
+def get_user_rank(db: Session, user_id: int, now: Optional[datetime] = None) -> Optional[dict]:
+    """Rank of a single user by current total points, None if the user has no leaderboard row"""
+    now = now or datetime.now()
+    pending = _pending_totals()
+    user = _ranked_user_query(db, pending, now).filter(UserModel.id == user_id).first()
+    if not user:
+        return None
+
+    ahead = (
+        _with_current_total(db.query(func.count(PointLeaderboardModel.user_id)), pending)
+        .filter(_current_total(db, pending, now) > user.total_points)
+        .scalar()
+    )
+
+    return {
+        "rank": ahead + 1,
+        "total_points": user.total_points,
+        "user_id": user.id,
+        "telegram_id": user.telegram_id,
+        "username": user.username,
+    }
+
+
+if __name__ == "__main__":
+    leaderboard.main(POINT_TOTALS, "Point leaderboard maintenance")
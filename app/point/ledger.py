@@ -0,0 +1,235 @@
+"""Point Ledger
+
+Credits and debits of ``login_amount`` and ``referral_amount`` are appended to
+``point_ledger`` instead of being written into the user's point row, so a burst
+of updates for one user is a burst of inserts rather than a queue on one row
+lock, and every change is kept. The balance of a user is the point row plus
+its pending (not compacted) entries, which every point read loads in the same
+SELECT as the row (``PointModel.pending_*``) and goes through ``balance``.
+
+Compaction adds the pending entries to the point rows in chunks and refreshes
+the leaderboard of the users it touched, run by the Vercel cron through
+``GET /api/v1/point/ledger/compact`` or by hand:
+
+    python -m app.point.ledger compact
+
+Entries are marked compacted one by one rather than up to an id, so an insert
+that commits after a higher id was compacted is still picked up. Rate changes
+(``apply``) and the other writers that lock the row anyway change it directly
+and record their entry as compacted, the old rate's income has to be
+materialized under that lock.
+"""
+
+import argparse
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import case, false, func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.point import accrual, leaderboard
+from app.point.models import PointLedgerModel, PointModel
+from core.constants import Constants
+
+AMOUNT_FIELDS = ("login_amount", "referral_amount", "extra_profit_per_hour")
+# Appended without touching the row, the rate needs the row lock
+PENDING_FIELDS = ("login_amount", "referral_amount")
+
+
+class Balance(NamedTuple):
+    """Point row amounts with the pending ledger entries and the accrued income"""
+
+    login_amount: int
+    referral_amount: int
+    extra_profit_per_hour: int
+    profit_amount: int
+
+    @property
+    def total_points(self) -> int:
+        return self.login_amount + self.referral_amount + self.profit_amount
+
+
+def balance(point: PointModel, now: Optional[datetime] = None) -> Balance:
+    """Balance of a loaded point row"""
+    return Balance(
+        login_amount=(point.login_amount or 0) + (point.pending_login_amount or 0),
+        referral_amount=(point.referral_amount or 0) + (point.pending_referral_amount or 0),
+        extra_profit_per_hour=point.extra_profit_per_hour or 0,
+        profit_amount=accrual.profit(point, now),
+    )
+
+
+def no_pending(point: PointModel) -> None:
+    """Mark a point row created in this transaction as having no pending entries, skips loading them"""
+    for field in PENDING_FIELDS:
+        set_committed_value(point, f"pending_{field}", 0)
+
+
+def append(
+    db: Session,
+    user_id: int,
+    reason: str,
+    login_amount: int = 0,
+    referral_amount: int = 0,
+    extra_profit_per_hour: int = 0,
+    custom_logs: Optional[dict] = None,
+    compacted: bool = False,
+) -> PointLedgerModel:
+    """Record a point change of a user (caller commits)"""
+    entry = PointLedgerModel(
+        user_id=user_id,
+        reason=reason,
+        login_amount=login_amount,
+        referral_amount=referral_amount,
+        extra_profit_per_hour=extra_profit_per_hour,
+        custom_logs=custom_logs,
+        compacted=compacted,
+    )
+    db.add(entry)
+    return entry
+
+
+def append_pending(
+    db: Session,
+    point: PointModel,
+    reason: str,
+    login_amount: int = 0,
+    referral_amount: int = 0,
+    custom_logs: Optional[dict] = None,
+) -> PointLedgerModel:
+    """Append a change of a loaded point row for compaction, the row itself is not written (caller commits)
+
+    The pending amounts loaded with the row take the change, so its balance
+    includes it without reading the row again.
+    """
+    entry = append(db, point.user_id, reason, login_amount=login_amount, referral_amount=referral_amount, custom_logs=custom_logs)
+    set_committed_value(point, "pending_login_amount", (point.pending_login_amount or 0) + login_amount)
+    set_committed_value(point, "pending_referral_amount", (point.pending_referral_amount or 0) + referral_amount)
+    return entry
+
+
+def append_many(db: Session, entries: List[dict]) -> None:
+    """Record many point changes in one multi-row INSERT (caller commits)"""
+    if entries:
+        db.execute(PointLedgerModel.__table__.insert(), entries)
+
+
+def apply(
+    db: Session,
+    point: PointModel,
+    reason: str,
+    login_amount: int = 0,
+    referral_amount: int = 0,
+    extra_profit_per_hour: int = 0,
+    custom_logs: Optional[dict] = None,
+    now: Optional[datetime] = None,
+) -> PointLedgerModel:
+    """Change a point row and record the change as compacted (caller holds the row lock, refreshes the leaderboard and commits)"""
+    if extra_profit_per_hour:
+        # The old rate's income is materialized before the rate changes
+        accrual.materialize(point, now)
+    point.login_amount = (point.login_amount or 0) + login_amount
+    point.referral_amount = (point.referral_amount or 0) + referral_amount
+    point.extra_profit_per_hour = (point.extra_profit_per_hour or 0) + extra_profit_per_hour
+    return append(
+        db,
+        point.user_id,
+        reason,
+        login_amount=login_amount,
+        referral_amount=referral_amount,
+        extra_profit_per_hour=extra_profit_per_hour,
+        custom_logs=custom_logs,
+        compacted=True,
+    )
+
+
+def added_amounts(deltas: Dict[int, Dict[str, int]], user_ids: Iterable[int], fields: Iterable[str] = AMOUNT_FIELDS) -> dict:
+    """SET values adding the deltas of the given users to their point rows, one CASE on user_id per field"""
+    values = {}
+    for field in fields:
+        field_deltas = {user_id: deltas[user_id][field] for user_id in user_ids if deltas[user_id].get(field)}
+        if field_deltas:
+            values[field] = func.coalesce(getattr(PointModel, field), 0) + case(field_deltas, value=PointModel.user_id, else_=0)
+    return values
+
+
+def _compact_chunk(db: Session, chunk_size: int) -> int:
+    """Add one chunk of pending entries to the point rows and mark them compacted, return the entries"""
+    # Locked, a concurrent compaction waits and then no longer sees them as pending
+    pending = db.execute(
+        select(PointLedgerModel.id, PointLedgerModel.user_id, PointLedgerModel.login_amount, PointLedgerModel.referral_amount)
+        .where(PointLedgerModel.compacted == false())
+        .order_by(PointLedgerModel.user_id, PointLedgerModel.id)
+        .limit(chunk_size)
+        .with_for_update()
+    ).all()
+    if not pending:
+        return 0
+
+    deltas: Dict[int, Dict[str, int]] = {}
+    for entry in pending:
+        user_deltas = deltas.setdefault(entry.user_id, dict.fromkeys(PENDING_FIELDS, 0))
+        user_deltas["login_amount"] += entry.login_amount
+        user_deltas["referral_amount"] += entry.referral_amount
+
+    user_ids = sorted(deltas)
+    values = added_amounts(deltas, user_ids, PENDING_FIELDS)
+    if values:
+        db.execute(
+            update(PointModel)
+            .where(PointModel.user_id.in_(user_ids))
+            .values(updated_at=datetime.now(), **values)
+            .execution_options(synchronize_session=False)
+        )
+    db.execute(
+        update(PointLedgerModel)
+        .where(PointLedgerModel.id.in_([entry.id for entry in pending]))
+        .values(compacted=True)
+        .execution_options(synchronize_session=False)
+    )
+    leaderboard.refresh_point_totals(db, user_ids)
+    return len(pending)
+
+
+def compact(db: Session, chunk_size: int = Constants.job_chunk_size, max_seconds: Optional[float] = None) -> dict:
+    """Compact the pending entries chunk by chunk until none are left or the time is up
+
+    Each chunk is committed on its own. Balances do not change, the cached
+    user responses stay valid.
+    """
+    started = time.perf_counter()
+    entries = 0
+    finished = False
+    while max_seconds is None or time.perf_counter() - started < max_seconds:
+        compacted = _compact_chunk(db, chunk_size)
+        db.commit()
+        entries += compacted
+        if compacted < chunk_size:
+            finished = True
+            break
+    return {"entries": entries, "seconds": round(time.perf_counter() - started, 3), "finished": finished}
+
+
+def main():
+    """Point ledger maintenance command"""
+    from core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Point ledger maintenance")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--chunk-size", type=int, default=Constants.job_chunk_size)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        progress = compact(db, args.chunk_size)
+        print(progress)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 """Point app DB models"""
 
 from datetime import datetime
-from sqlalchemy import Integer, ForeignKey, DateTime, JSON
-from sqlalchemy.orm import mapped_column, Mapped, relationship
+from sqlalchemy import Integer, ForeignKey, DateTime, JSON, Index, String, false, func, select
+from sqlalchemy.orm import column_property, mapped_column, Mapped, relationship
 from core.database import Base
 from typing import Optional
 
@@ -11,8 +11,6 @@ class PointModel(Base):
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
-        unique=True,
-        index=True,
         nullable=False,
         autoincrement=True,
     )
@@ -23,12 +21,88 @@ class PointModel(Base):
     referral_amount: Mapped[int] = mapped_column(Integer, default=0)
     
     extra_profit_per_hour: Mapped[int] = mapped_column(Integer, default=0)
-    
+    # Passive income earned up to last_accrued_at, see app.point.accrual
+    profit_amount: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_accrued_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.now)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
     custom_logs: Mapped[Optional[dict]] = mapped_column(JSON)
 
     user = relationship("UserModel", back_populates="point")
 
+    # One point row per user, the key create_point upserts on
+    __table_args__ = (Index("ux_point_user_id", "user_id", unique=True),)
+
     def __repr__(self) -> str:
         return f"<PointModel by {self.id} owned by={self.user_id}>"
+
+
+class PointLeaderboardModel(Base):
+    """Denormalized total points per user, maintained by the point writers"""
+
+    __tablename__ = "point_leaderboard"
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id"), primary_key=True, autoincrement=False
+    )
+    total_points: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # Copied from the point row, the ranking adds the income accrued since then
+    extra_profit_per_hour: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    last_accrued_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.now, onupdate=datetime.now
+    )
+
+    __table_args__ = (
+        Index("ix_point_leaderboard_rank", "total_points", "user_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PointLeaderboardModel user_id={self.user_id} total_points={self.total_points}>"
+
+
+class PointLedgerModel(Base):
+    """Append-only point changes, pending ones are compacted into the point rows (app.point.ledger)"""
+
+    __tablename__ = "point_ledger"
+    id: Mapped[int] = mapped_column(
+        Integer,
+        primary_key=True,
+        nullable=False,
+        autoincrement=True,
+    )
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), nullable=False)
+    login_amount: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    referral_amount: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    extra_profit_per_hour: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    reason: Mapped[str] = mapped_column(String(50), nullable=False)
+    # Already added to the point row, by compaction or by a writer that changed the row itself
+    compacted: Mapped[bool] = mapped_column(default=False, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    custom_logs: Mapped[Optional[dict]] = mapped_column(JSON)
+
+    # History of a user, newest entries last; the pending entries of a user and
+    # per user for compaction and the ranking
+    __table_args__ = (
+        Index("ix_point_ledger_user_id", "user_id", "id"),
+        Index("ix_point_ledger_pending", "compacted", "user_id"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<PointLedgerModel id={self.id} user_id={self.user_id} reason={self.reason}>"
+
+
+def _pending_amount(amount):
+    return column_property(
+        select(func.coalesce(func.sum(amount), 0))
+        .where(PointLedgerModel.user_id == PointModel.user_id, PointLedgerModel.compacted == false())
+        .correlate_except(PointLedgerModel)
+        .scalar_subquery(),
+        # Writing the row never changes its pending entries, no reload after a flush
+        expire_on_flush=False,
+    )
+
+
+# Ledger amounts not compacted into the row yet, loaded in the same SELECT as the row
+PointModel.pending_login_amount = _pending_amount(PointLedgerModel.login_amount)
+PointModel.pending_referral_amount = _pending_amount(PointLedgerModel.referral_amount)
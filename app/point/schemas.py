@@ -2,7 +2,10 @@
 
 from typing import Optional, List
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
+from app.point import ledger
+from app.point.models import PointModel
+from core.serialization import SGTDateTime
 
 class PointSchema(BaseModel):  # defaulf = false
     """Point Schema"""
@@ -11,10 +14,24 @@ class PointSchema(BaseModel):  # defaulf = false
     login_amount: int  
     referral_amount: int  
     extra_profit_per_hour: int
-    created_at: datetime
-    updated_at: datetime
+    profit_amount: int = 0  # passive income earned so far
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
+    @model_validator(mode="before")
+    @classmethod
+    def _balance(cls, data):
+        # A point row reports its balance: pending ledger entries and the passive income earned up to now
+        if isinstance(data, PointModel):
+            return {**{field: getattr(data, field) for field in cls.model_fields}, **ledger.balance(data)._asdict()}
+        return data
+
 
 class PointDetailsSchema(BaseModel):
     point: PointSchema
@@ -66,6 +83,53 @@ class PointUpdateResponseSchema(BaseModel):
     point_base: PointDetailsSchema
 
 
+class PointClaimProfitRequestSchema(BaseModel):
+    user_id: int
+    access_token: str
+
+
+class PointDeltaSchema(BaseModel):
+    """One credit or debit of a batch update"""
+
+    user_id: int
+    field: str  # login_amount, referral_amount or extra_profit_per_hour
+    delta: int
+
+
+class PointBatchUpdateRequestSchema(BaseModel):
+    access_token: str
+    reason: str = "batch"
+    entries: List[PointDeltaSchema]
+    custom_logs: Optional[dict] = None
+
+
+class PointDeltaResultSchema(BaseModel):
+    """Outcome of one batch entry: applied, not_found or invalid_field"""
+
+    user_id: int
+    field: str
+    delta: int
+    status: str
+
+
+class PointBatchUpdateResponseSchema(BaseModel):
+    applied: int
+    failed: int
+    results: List[PointDeltaResultSchema]
+
+
+class PointBalanceResponseSchema(BaseModel):
+    """Point Balance, the point row plus the passive income earned so far"""
+
+    user_id: int
+    login_amount: int
+    referral_amount: int
+    extra_profit_per_hour: int
+    profit_amount: int
+    total_points: int
+    last_accrued_at: Optional[SGTDateTime] = None
+
+
 class PointRankingList(BaseModel):
     """Point Ranking List"""
 
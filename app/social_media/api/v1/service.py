@@ -1,12 +1,24 @@
 """Social Media App Business Logics"""
 
 import logging
+from datetime import datetime
 from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 
 from app.social_media.models import SocialMediaModel
 from app.social_media import schemas
+from app.user import cache as user_cache
+from core.pagination import Page, decode_cursor, page_of, paginate
+from core.upsert import upsert
+
+def _upsert_social_media(db: Session, user_id: int, **columns) -> SocialMediaModel:
+    """Create the social media row of a user, or fill one platform's columns into the existing row"""
+    columns["updated_at"] = datetime.now()
+    return upsert(db, SocialMediaModel, dict(user_id=user_id, **columns), ["user_id"], update_columns=list(columns))
+
 
 def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Session) -> schemas.SocialMediaCreateResponseSchema:
     """Create Social Media"""
@@ -14,24 +26,17 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User ID, type and social media are required")
 
     try:
-        social_media = db.query(SocialMediaModel).filter(SocialMediaModel.user_id == request.user_id).first()
-    
-        if social_media:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Social Media already exists")
-        
         if request.type == "youtube":
-            new_social_media = SocialMediaModel(
-                user_id=request.user_id,
+            new_social_media = _upsert_social_media(
+                db,
+                request.user_id,
                 youtube_id=request.social_media.youtube.youtube_id,
                 youtube_following=request.social_media.youtube.youtube_following,
                 youtube_viewed=request.social_media.youtube.youtube_viewed,
                 youtube_view_date=request.social_media.youtube.youtube_view_date,
                 custom_logs=request.social_media.custom_logs,
             )
-            db.add(new_social_media)
-            db.commit()
-            db.refresh(new_social_media)
-            return schemas.SocialMediaCreateResponseSchema(
+            response = schemas.SocialMediaCreateResponseSchema(
                 user_id=new_social_media.user_id,
                 social_media=schemas.SocialMediaBaseSchema(
                     id=new_social_media.id,
@@ -46,19 +51,20 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
                     custom_logs=new_social_media.custom_logs,
                 ),
             )
+            db.commit()
+            user_cache.invalidate_user(request.user_id)
+            return response
 
         if request.type == "facebook":
-            new_social_media = SocialMediaModel(
-                user_id=request.user_id,
+            new_social_media = _upsert_social_media(
+                db,
+                request.user_id,
                 facebook_id=request.social_media.facebook.facebook_id,
                 facebook_following=request.social_media.facebook.facebook_following,
                 facebook_followed_date=request.social_media.facebook.facebook_followed_date,
                 custom_logs=request.social_media.custom_logs,
             )
-            db.add(new_social_media)
-            db.commit()
-            db.refresh(new_social_media)
-            return schemas.SocialMediaCreateResponseSchema(
+            response = schemas.SocialMediaCreateResponseSchema(
                 user_id=new_social_media.user_id,
                 social_media=schemas.SocialMediaBaseSchema(
                     id=new_social_media.id,
@@ -72,10 +78,14 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
                     custom_logs=new_social_media.custom_logs,
                 ),
             )
+            db.commit()
+            user_cache.invalidate_user(request.user_id)
+            return response
 
         if request.type == "instagram":
-            new_social_media = SocialMediaModel(
-                user_id=request.user_id,
+            new_social_media = _upsert_social_media(
+                db,
+                request.user_id,
                 instagram_id=request.social_media.instagram.instagram_id,
                 instagram_following=request.social_media.instagram.instagram_following,
                 instagram_follow_trigger_verify_date=request.social_media.instagram.instagram_follow_trigger_verify_date,
@@ -86,10 +96,7 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
                 instagram_reposted_date=request.social_media.instagram.instagram_reposted_date,
                 custom_logs=request.social_media.custom_logs,
             )
-            db.add(new_social_media)
-            db.commit()
-            db.refresh(new_social_media)
-            return schemas.SocialMediaCreateResponseSchema(
+            response = schemas.SocialMediaCreateResponseSchema(
                 user_id=new_social_media.user_id,
                 social_media=schemas.SocialMediaBaseSchema(
                     id=new_social_media.id,
@@ -108,19 +115,20 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
                     custom_logs=new_social_media.custom_logs,
                 ),
             )
+            db.commit()
+            user_cache.invalidate_user(request.user_id)
+            return response
             
         if request.type == "telegram":
-            new_social_media = SocialMediaModel(
-                user_id=request.user_id,
+            new_social_media = _upsert_social_media(
+                db,
+                request.user_id,
                 telegram_id=request.social_media.telegram.telegram_id,
                 telegram_following=request.social_media.telegram.telegram_following,
                 telegram_followed_date=request.social_media.telegram.telegram_followed_date,
                 custom_logs=request.social_media.custom_logs,
             )
-            db.add(new_social_media)
-            db.commit()
-            db.refresh(new_social_media)
-            return schemas.SocialMediaCreateResponseSchema(
+            response = schemas.SocialMediaCreateResponseSchema(
                 user_id=new_social_media.user_id,
                 social_media=schemas.SocialMediaBaseSchema(
                     id=new_social_media.id,
@@ -134,19 +142,20 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
                     custom_logs=new_social_media.custom_logs,
                 ),
             )
+            db.commit()
+            user_cache.invalidate_user(request.user_id)
+            return response
             
         if request.type == "x":
-            new_social_media = SocialMediaModel(
-                user_id=request.user_id,
+            new_social_media = _upsert_social_media(
+                db,
+                request.user_id,
                 x_id=request.social_media.x.x_id,
                 x_following=request.social_media.x.x_following,
                 x_followed_date=request.social_media.x.x_followed_date,
                 custom_logs=request.social_media.custom_logs,
             )
-            db.add(new_social_media)
-            db.commit()
-            db.refresh(new_social_media)
-            return schemas.SocialMediaCreateResponseSchema(
+            response = schemas.SocialMediaCreateResponseSchema(
                 user_id=new_social_media.user_id,
                 social_media=schemas.SocialMediaBaseSchema(
                     id=new_social_media.id,
@@ -160,19 +169,20 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
                     custom_logs=new_social_media.custom_logs,
                 ),
             )
+            db.commit()
+            user_cache.invalidate_user(request.user_id)
+            return response
 
         if request.type == "discord":
-            new_social_media = SocialMediaModel(
-                user_id=request.user_id,
+            new_social_media = _upsert_social_media(
+                db,
+                request.user_id,
                 discord_id=request.social_media.discord.discord_id,
                 discord_following=request.social_media.discord.discord_following,
                 discord_followed_date=request.social_media.discord.discord_followed_date,
                 custom_logs=request.social_media.custom_logs,
             )
-            db.add(new_social_media)
-            db.commit()
-            db.refresh(new_social_media)
-            return schemas.SocialMediaCreateResponseSchema(
+            response = schemas.SocialMediaCreateResponseSchema(
                 user_id=new_social_media.user_id,
                 social_media=schemas.SocialMediaBaseSchema(
                     id=new_social_media.id,
@@ -186,113 +196,88 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
                     custom_logs=new_social_media.custom_logs,
                 ),
             )
+            db.commit()
+            user_cache.invalidate_user(request.user_id)
+            return response
     except Exception as e:
         logging.error(f"An error occured: {e}")
 
 
 
-def retrieve_social_media(id: Optional[int], user_id: Optional[int], db: Session) -> schemas.SocialMediaRetrievalResponseSchema:
-    """Retrieve Social Media Details from Single User"""
+def _social_media_filters(id: Optional[int], user_id: Optional[int]):
+    """Build the filters of a single social media lookup"""
     if not id and not user_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing id or user_id")
-    
-    try:
-        base_query = db.query(SocialMediaModel)
-        filters = []
 
-        if id is not None:
-            filters.append(SocialMediaModel.id == id)
+    filters = []
+    if id is not None:
+        filters.append(SocialMediaModel.id == id)
+
+    if user_id is not None:
+        filters.append(SocialMediaModel.user_id == user_id)
+    return filters
 
-        if user_id is not None:
-            filters.append(SocialMediaModel.user_id == user_id)
 
-        if filters:
-            existing_social_media = base_query.filter(*filters).first()
+def _social_media_base(existing_social_media: SocialMediaModel) -> schemas.SocialMediaBaseSchema:
+    """Build the social media payload from a loaded social media row"""
+    return schemas.SocialMediaBaseSchema.model_validate(existing_social_media)
 
-            if not existing_social_media:
-                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Social media not found")
+
+def retrieve_social_media(id: Optional[int], user_id: Optional[int], db: Session) -> schemas.SocialMediaRetrievalResponseSchema:
+    """Retrieve Social Media Details from Single User"""
+    filters = _social_media_filters(id, user_id)
+    
+    try:
+        existing_social_media = db.query(SocialMediaModel).filter(*filters).first()
+
+        if not existing_social_media:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Social media not found")
             
-            return schemas.SocialMediaRetrievalResponseSchema(
-                user_id=existing_social_media.user_id,
-                social_media=schemas.SocialMediaBaseSchema(
-                    id=existing_social_media.id,
-                    youtube_id=existing_social_media.youtube_id,
-                    youtube_following=existing_social_media.youtube_following,
-                    youtube_viewed=existing_social_media.youtube_viewed,
-                    youtube_view_date=existing_social_media.youtube_view_date,
-                    facebook_id=existing_social_media.facebook_id,
-                    facebook_following=existing_social_media.facebook_following,
-                    facebook_followed_date=existing_social_media.facebook_followed_date,
-                    instagram_id=existing_social_media.instagram_id,
-                    instagram_following=existing_social_media.instagram_following,
-                    instagram_follow_trigger_verify_date=existing_social_media.instagram_follow_trigger_verify_date,
-                    instagram_followed_date=existing_social_media.instagram_followed_date,
-                    instagram_tagged=existing_social_media.instagram_tagged,
-                    instagram_tagged_date=existing_social_media.instagram_tagged_date,
-                    instagram_reposted=existing_social_media.instagram_reposted,
-                    instagram_reposted_date=existing_social_media.instagram_reposted_date,
-                    telegram_id=existing_social_media.telegram_id,
-                    telegram_following=existing_social_media.telegram_following,
-                    telegram_followed_date=existing_social_media.telegram_followed_date,
-                    x_id=existing_social_media.x_id,
-                    x_following=existing_social_media.x_following,
-                    x_followed_date=existing_social_media.x_followed_date,
-                    discord_id=existing_social_media.discord_id,
-                    discord_following=existing_social_media.discord_following,
-                    discord_followed_date=existing_social_media.discord_followed_date,
-                    custom_logs=existing_social_media.custom_logs,
-                    updated_at=existing_social_media.updated_at,
-                    created_at=existing_social_media.created_at,
-                )
-            )
+        return schemas.SocialMediaRetrievalResponseSchema(
+            user_id=existing_social_media.user_id,
+            social_media=_social_media_base(existing_social_media)
+        )
             
     except Exception as e:
         logging.error(f"An error occurred: {e}")
 
-def retrieve_social_media_list(db: Session, user_ids: List[int], skip: int, limit: int) -> List[schemas.SocialMediaRetrievalResponseSchema]:
+
+async def retrieve_social_media_async(id: Optional[int], user_id: Optional[int], db: AsyncSession) -> schemas.SocialMediaRetrievalResponseSchema:
+    """Async variant of retrieve_social_media"""
+    filters = _social_media_filters(id, user_id)
+
+    try:
+        result = await db.execute(select(SocialMediaModel).where(*filters).limit(1))
+        existing_social_media = result.scalars().first()
+
+        if not existing_social_media:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Social media not found")
+
+        return schemas.SocialMediaRetrievalResponseSchema(
+            user_id=existing_social_media.user_id,
+            social_media=_social_media_base(existing_social_media)
+        )
+
+    except Exception as e:
+        logging.error(f"An error occurred: {e}")
+
+def retrieve_social_media_list(db: Session, user_ids: List[int], skip: int, limit: int, cursor: Optional[str] = None) -> Page:
     """Retrieve Social Media by List from Single User"""
+    after_id = decode_cursor(cursor)
+
     try:
+        query = db.query(SocialMediaModel)
         if user_ids:
-            existing_social_media = db.query(SocialMediaModel).filter(SocialMediaModel.user_id.in_(user_ids)).offset(skip).limit(limit).all()
-        else:
-            existing_social_media = db.query(SocialMediaModel).offset(skip).limit(limit).all()
+            query = query.filter(SocialMediaModel.user_id.in_(user_ids))
+        existing_social_media, next_cursor = page_of(paginate(query, SocialMediaModel.id, skip, limit, after_id).all(), limit)
     
-        return [
+        return Page([
             schemas.SocialMediaRetrievalResponseSchema(
                 user_id=so.user_id,
-                social_media=schemas.SocialMediaBaseSchema(
-                    id=so.id,
-                    youtube_id=so.youtube_id,
-                    youtube_following=so.youtube_following,
-                    youtube_viewed=so.youtube_viewed,
-                    youtube_view_date=so.youtube_view_date,
-                    facebook_id=so.facebook_id,
-                    facebook_following=so.facebook_following,
-                    facebook_followed_date=so.facebook_followed_date,
-                    instagram_id=so.instagram_id,
-                    instagram_following=so.instagram_following,
-                    instagram_follow_trigger_verify_date=so.instagram_follow_trigger_verify_date,
-                    instagram_followed_date=so.instagram_followed_date,
-                    instagram_tagged=so.instagram_tagged,
-                    instagram_tagged_date=so.instagram_tagged_date,
-                    instagram_reposted=so.instagram_reposted,
-                    instagram_reposted_date=so.instagram_reposted_date,
-                    telegram_id=so.telegram_id,
-                    telegram_following=so.telegram_following,
-                    telegram_followed_date=so.telegram_followed_date,
-                    x_id=so.x_id,
-                    x_following=so.x_following,
-                    x_followed_date=so.x_followed_date,
-                    discord_id=so.discord_id,
-                    discord_following=so.discord_following,
-                    discord_followed_date=so.discord_followed_date,
-                    custom_logs=so.custom_logs,
-                    updated_at=so.updated_at,
-                    created_at=so.created_at,
-                ),
+                social_media=_social_media_base(so),
             )
             for so in existing_social_media
-        ]
+        ], next_cursor)
     
     except Exception as e:
         logging.error(f"An error occurred: {e}")
@@ -317,6 +302,7 @@ def update_social_media(request: schemas.SocialMediaUpdateRequestSchema, db: Ses
                 existing_social_media.youtube_view_date = request.social_media.youtube.youtube_view_date
                 existing_social_media.custom_logs = request.social_media.custom_logs
                 db.commit()
+                user_cache.invalidate_user(existing_social_media.user_id)
                 db.refresh(existing_social_media)
                 return schemas.SocialMediaUpdateResponseSchema(
                     user_id=existing_social_media.user_id,
@@ -341,6 +327,7 @@ def update_social_media(request: schemas.SocialMediaUpdateRequestSchema, db: Ses
                 existing_social_media.facebook_followed_date = request.social_media.facebook.facebook_followed_date
                 existing_social_media.custom_logs = request.social_media.custom_logs
                 db.commit()
+                user_cache.invalidate_user(existing_social_media.user_id)
                 db.refresh(existing_social_media)
                 return schemas.SocialMediaUpdateResponseSchema(
                     user_id=existing_social_media.user_id,
@@ -369,6 +356,7 @@ def update_social_media(request: schemas.SocialMediaUpdateRequestSchema, db: Ses
                 existing_social_media.instagram_reposted_date = request.social_media.instagram.instagram_reposted_date
                 existing_social_media.custom_logs = request.social_media.custom_logs
                 db.commit()
+                user_cache.invalidate_user(existing_social_media.user_id)
                 db.refresh(existing_social_media)
                 return schemas.SocialMediaUpdateResponseSchema(
                     user_id=existing_social_media.user_id,
@@ -397,6 +385,7 @@ def update_social_media(request: schemas.SocialMediaUpdateRequestSchema, db: Ses
                 existing_social_media.telegram_followed_date = request.social_media.telegram.telegram_followed_date
                 existing_social_media.custom_logs = request.social_media.custom_logs
                 db.commit()
+                user_cache.invalidate_user(existing_social_media.user_id)
                 db.refresh(existing_social_media)
                 return schemas.SocialMediaUpdateResponseSchema(
                     user_id=existing_social_media.user_id,
@@ -420,6 +409,7 @@ def update_social_media(request: schemas.SocialMediaUpdateRequestSchema, db: Ses
                 existing_social_media.x_followed_date = request.social_media.x.x_followed_date
                 existing_social_media.custom_logs = request.social_media.custom_logs
                 db.commit()
+                user_cache.invalidate_user(existing_social_media.user_id)
                 db.refresh(existing_social_media)
                 return schemas.SocialMediaUpdateResponseSchema(
                     user_id=existing_social_media.user_id,
@@ -443,6 +433,7 @@ def update_social_media(request: schemas.SocialMediaUpdateRequestSchema, db: Ses
                 existing_social_media.discord_followed_date = request.social_media.discord.discord_followed_date
                 existing_social_media.custom_logs = request.social_media.custom_logs
                 db.commit()
+                user_cache.invalidate_user(existing_social_media.user_id)
                 db.refresh(existing_social_media)
                 return schemas.SocialMediaUpdateResponseSchema(
                     user_id=existing_social_media.user_id,
@@ -470,6 +461,7 @@ def delete_social_media(id: int, db: Session):
         if db_social_media:
             db.delete(db_social_media)
             db.commit()
+            user_cache.invalidate_user(db_social_media.user_id)
         else:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Social Media {id} not found")
         
@@ -2,14 +2,17 @@
 
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from core import database
+from core.pagination import page_response
 from app.social_media import schemas
 from app.social_media.api.v1 import service
 
 
 get_db = database.get_db
+get_async_db = database.get_async_db
 
 router = APIRouter(prefix="/api/v1/social_media", tags=["social_media"])
 
@@ -21,15 +24,15 @@ def create_social_media(request: schemas.SocialMediaCreateRequestSchema, db: Ses
 
 
 @router.get("/detail", response_model=schemas.SocialMediaRetrievalResponseSchema)
-def get_social_media(id: Optional[int] = None, user_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_social_media(id: Optional[int] = None, user_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """Retrieve Social Media Details from Single User"""
-    return service.retrieve_social_media(id, user_id, db)
+    return await service.retrieve_social_media_async(id, user_id, db)
 
 
 @router.get("/details", response_model=List[schemas.SocialMediaRetrievalResponseSchema])
-def get_details(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, db: Session = Depends(get_db)):
+def get_details(user_ids: List[int] = Query(default=None), skip: int = 0, limit: int = 15, cursor: Optional[str] = None, db: Session = Depends(get_db)):
     """Retrieve Social Media by List from Multiple Users"""
-    return service.retrieve_social_media_list(db, user_ids, skip, limit)
+    return page_response(service.retrieve_social_media_list(db, user_ids, skip, limit, cursor))
 
 
 @router.put("/update", response_model=schemas.SocialMediaUpdateResponseSchema)
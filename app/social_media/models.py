@@ -11,8 +11,6 @@ class SocialMediaModel(Base):
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
-        unique=True,
-        index=True,
         nullable=False,
         autoincrement=True
     )
@@ -56,4 +54,4 @@ class SocialMediaModel(Base):
     user = relationship("UserModel", back_populates = "social_media")
 
     def __repr__(self) -> str:
-        return f"<SocialMediaModel by {self.id} from user {self.user.id}>"
+        return f"<SocialMediaModel by {self.id} from user {self.user_id}>"
@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
+from core.serialization import SGTDateTime
 
 
 class YoutubeSocialMediaSchema(BaseModel):
@@ -69,37 +70,42 @@ class SocialMediaBaseSchema(BaseModel):
     youtube_id: Optional[str] = None
     youtube_following: Optional[bool] = None
     youtube_viewed: Optional[bool] = None
-    youtube_view_date: Optional[datetime] = None
+    youtube_view_date: Optional[SGTDateTime] = None
 
     facebook_id: Optional[str] = None
     facebook_following: Optional[bool] = None
-    facebook_followed_date: Optional[datetime] = None
+    facebook_followed_date: Optional[SGTDateTime] = None
 
     instagram_id: Optional[str] = None
     instagram_following: Optional[bool] = None
-    instagram_follow_trigger_verify_date: Optional[datetime] = None
-    instagram_followed_date: Optional[datetime] = None
+    instagram_follow_trigger_verify_date: Optional[SGTDateTime] = None
+    instagram_followed_date: Optional[SGTDateTime] = None
     instagram_tagged: Optional[bool] = None
-    instagram_tagged_date: Optional[datetime] = None
+    instagram_tagged_date: Optional[SGTDateTime] = None
     instagram_reposted: Optional[bool] = None
-    instagram_reposted_date: Optional[datetime] = None
+    instagram_reposted_date: Optional[SGTDateTime] = None
 
     telegram_id: Optional[str] = None
     telegram_following: Optional[bool] = None
-    telegram_followed_date: Optional[datetime] = None
+    telegram_followed_date: Optional[SGTDateTime] = None
 
     x_id: Optional[str] = None
     x_following: Optional[bool] = None
-    x_followed_date: Optional[datetime] = None
+    x_followed_date: Optional[SGTDateTime] = None
 
     discord_id: Optional[str] = None
     discord_following: Optional[bool] = None
-    discord_followed_date: Optional[datetime] = None
+    discord_followed_date: Optional[SGTDateTime] = None
 
-    created_at: datetime
-    updated_at: datetime
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
 
 class SocialMediaCreateDetailSchema(BaseModel):  # without id
     youtube: Optional[YoutubeSocialMediaSchema] = None
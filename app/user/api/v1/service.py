@@ -1,13 +1,14 @@
 """User App Business Logics"""
+import logging
 from fastapi import HTTPException, status
-import pytz
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
+from typing import Iterator, List, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from app.user.models import UserModel
 from app.user.schemas import (
-    UserAppInfoSchema,
-    UserPersonalInfoSchema,
-    UserTelegramInfoSchema,
     UserCreateRequestSchema,
     UserCreateResponseSchema,
     UserRetrievalRequestSchema,
@@ -18,13 +19,28 @@ from app.user.schemas import (
     UserDetailsSchema,
     UserSchema,
     UserDetailsResponseSchema,
+    UserBootstrapResponseSchema,
+    UserOnboardRequestSchema,
+    UserOnboardResponseSchema,
     ReferralRankingResponse
 )
 from app.friend.schemas import FriendBaseSchema, FriendIds
 from app.game_character.schemas import GameCharacterBaseSchema
 from app.point.schemas import PointSchema
 from app.social_media.schemas import SocialMediaBaseSchema
+from app.activity.models import ActivityModel
 from app.activity.schemas import ActivityBaseSchema
+from app.friend import leaderboard as referral_leaderboard
+from app.friend import referral
+from app.game_character.api.v1 import service as game_character_service
+from app.game_character.models import GameCharacterModel, GameCharacterStatsModel
+from app.point import leaderboard as point_leaderboard
+from app.point import ledger as point_ledger
+from app.point.api.v1 import service as point_service
+from app.point.models import PointModel
+from app.social_media.models import SocialMediaModel
+from app.user import cache as user_cache
+from core.pagination import Page, decode_cursor, page_of, paginate
 # from core.utils import UserSchemaFactory
 # from app.record.models import RecordModel
 # from app.record.schemas import RecordSchema 
@@ -36,8 +52,8 @@ def create_user(
     db: Session, 
     #background_tasks: BackgroundTasks
 ):
-    """Create new user account"""
-    print(request)
+    """Create new user account, a repeated signup of the telegram id is a 409"""
+    logging.info(f"create_user called with telegram_id={request.telegram_info.telegram_id}")
     # if not request.telegram_info.username:
     #     raise HTTPException(
     #         status_code=status.HTTP_400_BAD_REQUEST,
@@ -54,39 +70,7 @@ def create_user(
             detail="Location and Nationality are required",
         )
         
-    user = (
-        db.query(UserModel)
-        .filter(UserModel.telegram_id == request.telegram_info.telegram_id)
-        .first()
-    )
-    if user:
-        return HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="User existed"
-        )
-    user_app_info = UserAppInfoSchema(
-        active=request.app_info.active,
-        in_game_items=request.app_info.in_game_items,
-        admin=request.app_info.admin,
-        skin=request.app_info.skin,
-        custom_logs=request.app_info.custom_logs,
-    )
-    user_personal_info = UserPersonalInfoSchema(
-        location=request.personal_info.location,
-        nationality=request.personal_info.nationality,
-        age=request.personal_info.age,
-        gender=request.personal_info.gender,
-        email=request.personal_info.email,
-    )
-    user_telegram_info = UserTelegramInfoSchema(
-        username=request.telegram_info.username,
-        telegram_id=request.telegram_info.telegram_id,
-        token_balance=request.telegram_info.token_balance,
-        premium=request.telegram_info.premium,
-        wallet_address=request.telegram_info.wallet_address,
-        chat_id=request.telegram_info.chat_id,
-        start_param=request.telegram_info.start_param,
-    )
+    # One INSERT, the unique telegram_id and username keys reject a repeated signup
     new_user = UserModel(
         access_token=request.access_token,
         active=request.app_info.active,
@@ -108,9 +92,19 @@ def create_user(
         start_param=request.telegram_info.start_param,
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        # Only a rejected signup looks up which key was taken
+        if db.scalar(select(UserModel.id).where(UserModel.telegram_id == request.telegram_info.telegram_id)):
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User existed")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username taken",
+        )
+    referrer_id = referral.upsert_referral(db, new_user)
+
     # FIXME
     # record_req = RecordCreateRequestSchema(
     #     user_id = new_user.id,
@@ -128,21 +122,107 @@ def create_user(
 
     # new_user_schema_factory = UserSchemaFactory(new_user)
     #print(new_user)
-    return UserCreateResponseSchema(
+    user_response = UserCreateResponseSchema(
         access_token=new_user.access_token,
-        user_details=UserDetailsSchema(
-            user_base=UserSchema(
-                id=new_user.id,
-                app_info=user_app_info,
-                personal_info=user_personal_info,
-                telegram_info=user_telegram_info,
-                created_at=new_user.created_at.astimezone(pytz.timezone('Asia/Singapore')) if new_user.created_at else None, 
-                updated_at=new_user.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if new_user.updated_at else None, 
-                custom_logs=new_user.custom_logs,
-            ),
-        ),
+        user_details=UserDetailsSchema(user_base=_user_base(new_user)),
     )
+    user_id = new_user.id
+    db.commit()
+    user_cache.invalidate_user(user_id, referrer_id)
+    return user_response
+
 
+
+def onboard_user(request: UserOnboardRequestSchema, db: Session) -> UserOnboardResponseSchema:
+    """Create a user with its point, activity, social media and game character rows and its referral in one transaction"""
+    logging.info(f"onboard_user called with telegram_id={request.telegram_info.telegram_id}")
+    if not request.telegram_info.telegram_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Telegram Id is required",
+        )
+    if not request.personal_info.location or not request.personal_info.nationality:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Location and Nationality are required",
+        )
+    character_details = request.character_details
+    if character_details and not (character_details.first_name and character_details.last_name and character_details.title):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="first_name, last_name and title of the game character are required",
+        )
+
+    game_characters = set()
+    if character_details:
+        game_character = GameCharacterModel(
+            first_name=character_details.first_name,
+            last_name=character_details.last_name,
+            gender=character_details.gender,
+            title=character_details.title,
+            custom_logs=character_details.custom_logs,
+        )
+        game_character.stats = [GameCharacterStatsModel()]
+        game_characters.add(game_character)
+
+    # Every collection is assigned up front, so building the response needs no lazy load
+    new_user = UserModel(
+        access_token=request.access_token,
+        active=request.app_info.active,
+        in_game_items=request.app_info.in_game_items,
+        admin=request.app_info.admin,
+        skin=request.app_info.skin,
+        custom_logs=request.app_info.custom_logs,
+        location=request.personal_info.location,
+        nationality=request.personal_info.nationality,
+        age=request.personal_info.age,
+        gender=request.personal_info.gender,
+        email=request.personal_info.email,
+        username=request.telegram_info.username,
+        telegram_id=request.telegram_info.telegram_id,
+        token_balance=request.telegram_info.token_balance,
+        premium=request.telegram_info.premium,
+        wallet_address=request.telegram_info.wallet_address,
+        chat_id=request.telegram_info.chat_id,
+        start_param=request.telegram_info.start_param,
+        point=[PointModel(login_amount=0, referral_amount=0, extra_profit_per_hour=0)],
+        activity=[ActivityModel(logged_in=True, login_streak=0, total_logins=0)],
+        social_media=[SocialMediaModel()],
+        game_characters=game_characters,
+        sender=[],
+        receiver=[],
+    )
+    db.add(new_user)
+    new_referral = referral.attribute_referral(db, new_user)
+    try:
+        # The unique telegram_id and username reject a duplicate signup, no lookup beforehand
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User existed")
+    point_leaderboard.refresh_point_totals(db, [new_user.id])
+    # A new point row has no ledger entries, its balance needs no lookup
+    for point in new_user.point:
+        point_ledger.no_pending(point)
+    if new_referral:
+        referral.count_referral(db, new_referral)
+        # FriendModel.receiver backrefs into user_receive, list the flushed row as the user's receiver side
+        set_committed_value(new_user, "receiver", [new_referral])
+
+    # Built before commit, the flushed rows already hold their ids and defaults
+    response = UserOnboardResponseSchema(
+        access_token=new_user.access_token,
+        user=_user_extra_detail_response(new_user),
+        game_characters=[
+            game_character_service._game_character_retrieval(game_character)
+            for game_character in new_user.game_characters
+        ],
+    )
+    referrer_id = new_referral.sender_id if new_referral else None
+    db.commit()
+    if referrer_id:
+        user_cache.invalidate_user(referrer_id)
+    return response
    
 # def retrieve_user_by_id(id: int, db: Session):
 #     if not id:
@@ -310,21 +390,19 @@ def create_user(
 #     return UserRetrievalResponseSchema(user_details=user_details)
 
 
-def retrieve_user(
+def _user_filters(
     id: Optional[int],
     username: Optional[str],
     telegram_id: Optional[str],
     wallet_address: Optional[str],
-    db: Session,
-    # background_tasks: BackgroundTasks
 ):
+    """Build the inclusive AND filters of a single user lookup"""
     if not id and not username and not telegram_id and not wallet_address:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Missing required parameter",
         )
 
-    base_query = db.query(UserModel)
     filters = []  # inclusive AND case
     if id is not None:
         filters.append(UserModel.id == id)
@@ -334,56 +412,55 @@ def retrieve_user(
         filters.append(UserModel.telegram_id == telegram_id)
     if wallet_address is not None:
         filters.append(UserModel.wallet_address == wallet_address)
+    return filters
 
-    if filters:
-        existing_user = base_query.filter(*filters).first()
-    if not existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"User with {id} not found",
-        )
 
-    user_app_info = UserAppInfoSchema(
-        active=existing_user.active,
-        in_game_items=existing_user.in_game_items,
-        admin=existing_user.admin,
-        skin=existing_user.skin,
-    )
+# Relationships rendered by the extra detail response
+USER_EXTRA_DETAIL_RELATIONSHIPS = (
+    UserModel.point,
+    UserModel.game_characters,
+    UserModel.activity,
+    UserModel.social_media,
+    UserModel.sender,
+    UserModel.receiver,
+)
 
-    user_personal_info = UserPersonalInfoSchema(
-        location=existing_user.location,
-        nationality=existing_user.nationality,
-        age=existing_user.age,
-        gender=existing_user.gender,
-        email=existing_user.email,
-    )
 
-    user_telegram_info = UserTelegramInfoSchema(
-        username=existing_user.username,
-        telegram_id=existing_user.telegram_id,
-        token_balance=existing_user.token_balance,
-        premium=existing_user.premium,
-        wallet_address=existing_user.wallet_address,
-        chat_id=existing_user.chat_id,
-        start_param=existing_user.start_param
-    )
+def _user_base(existing_user: UserModel) -> UserSchema:
+    """Build the user base payload from a loaded user"""
+    return UserSchema.model_validate(existing_user)
 
 
+def _user_details_response(existing_user: UserModel) -> UserDetailsResponseSchema:
+    """Build the user detail response from a loaded user"""
     return UserDetailsResponseSchema(
-        user_details=UserDetailsSchema(
-            user_base=UserSchema(
-                id=existing_user.id,
-                app_info=user_app_info,
-                personal_info=user_personal_info,
-                telegram_info=user_telegram_info,
-                created_at=existing_user.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_user.created_at else None, 
-                updated_at=existing_user.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_user.updated_at else None, 
-                custom_logs=existing_user.custom_logs,
-            )
-        )
+        user_details=UserDetailsSchema(user_base=_user_base(existing_user))
     )
 
-def retrieve_user_extra_detail(
+
+def _user_extra_details(existing_user: UserModel) -> UserDetailsSchema:
+    """Build the user payload with every relationship from a user with its relationships loaded"""
+    # FIXME
+    # new_record = background_tasks.add_task(retrieve_record_by_user_id, existing_user.id, db)
+    # existing_user.record.append(new_record)
+    return UserDetailsSchema(
+        user_base=_user_base(existing_user),
+        game_characters=[GameCharacterBaseSchema.model_validate(c) for c in existing_user.game_characters],
+        point=[PointSchema.model_validate(p) for p in existing_user.point],
+        activity=[ActivityBaseSchema.model_validate(a) for a in existing_user.activity],
+        social_media=[SocialMediaBaseSchema.model_validate(so) for so in existing_user.social_media],
+        # record=new_record, # FIXME
+        sender=[FriendBaseSchema.model_validate(f) for f in existing_user.sender],
+        receiver=[FriendBaseSchema.model_validate(f) for f in existing_user.receiver],
+    )
+
+
+def _user_extra_detail_response(existing_user: UserModel) -> UserDetailsResponseSchema:
+    """Build the user extra detail response from a user with its relationships loaded"""
+    return UserDetailsResponseSchema(user_details=_user_extra_details(existing_user))
+
+
+def retrieve_user(
     id: Optional[int],
     username: Optional[str],
     telegram_id: Optional[str],
@@ -391,377 +468,154 @@ def retrieve_user_extra_detail(
     db: Session,
     # background_tasks: BackgroundTasks
 ):
-    if not id and not username and not telegram_id and not wallet_address:
+    filters = _user_filters(id, username, telegram_id, wallet_address)
+    cached = user_cache.get_user_response(user_cache.DETAIL, id, username, telegram_id, wallet_address)
+    if cached:
+        return cached
+    started = user_cache.read_started()
+
+    existing_user = db.query(UserModel).filter(*filters).first()
+    if not existing_user:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Missing required parameter",
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with {id} not found",
         )
 
-    base_query = db.query(UserModel)
-    filters = []  # inclusive AND case
-    if id is not None:
-        filters.append(UserModel.id == id)
-    if username is not None:
-        filters.append(UserModel.username == username)
-    if telegram_id is not None:
-        filters.append(UserModel.telegram_id == telegram_id)
-    if wallet_address is not None:
-        filters.append(UserModel.wallet_address == wallet_address)
+    response = _user_details_response(existing_user)
+    user_cache.store_user_response(user_cache.DETAIL, response, started)
+    return response
+
 
-    if filters:
-        base_query = base_query.filter(*filters)
-        existing_user = base_query.options(
-            joinedload(UserModel.point),  # Load point with the user
-            joinedload(UserModel.game_characters),  # Load game character with the user
-            joinedload(UserModel.activity),  # Load activity with the user
-            joinedload(UserModel.social_media),  # Load social media with the user
-            joinedload(UserModel.sender),  # Load sender with the user
-            joinedload(UserModel.receiver),  # Load receiver with the user
-            # joinedload(UserModel.record)     # FIXME:
-        ).first()
+async def retrieve_user_async(
+    id: Optional[int],
+    username: Optional[str],
+    telegram_id: Optional[str],
+    wallet_address: Optional[str],
+    db: AsyncSession,
+):
+    """Async variant of retrieve_user"""
+    filters = _user_filters(id, username, telegram_id, wallet_address)
+    cached = await user_cache.get_user_response_async(user_cache.DETAIL, id, username, telegram_id, wallet_address)
+    if cached:
+        return cached
+    started = user_cache.read_started()
+
+    result = await db.execute(select(UserModel).where(*filters).limit(1))
+    existing_user = result.scalars().first()
     if not existing_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"User with {id} not found",
         )
 
-    user_app_info = UserAppInfoSchema(
-        active=existing_user.active,
-        in_game_items=existing_user.in_game_items,
-        admin=existing_user.admin,
-        skin=existing_user.skin,
-    )
+    response = _user_details_response(existing_user)
+    await user_cache.store_user_response_async(user_cache.DETAIL, response, started)
+    return response
 
-    user_personal_info = UserPersonalInfoSchema(
-        location=existing_user.location,
-        nationality=existing_user.nationality,
-        age=existing_user.age,
-        gender=existing_user.gender,
-        email=existing_user.email,
-    )
 
-    user_telegram_info = UserTelegramInfoSchema(
-        username=existing_user.username,
-        telegram_id=existing_user.telegram_id,
-        token_balance=existing_user.token_balance,
-        premium=existing_user.premium,
-        wallet_address=existing_user.wallet_address,
-        chat_id=existing_user.chat_id,
-        start_param=existing_user.start_param
+def retrieve_user_extra_detail(
+    id: Optional[int],
+    username: Optional[str],
+    telegram_id: Optional[str],
+    wallet_address: Optional[str],
+    db: Session,
+    # background_tasks: BackgroundTasks
+):
+    filters = _user_filters(id, username, telegram_id, wallet_address)
+    cached = user_cache.get_user_response(user_cache.EXTRA_DETAIL, id, username, telegram_id, wallet_address)
+    if cached:
+        return cached
+    started = user_cache.read_started()
+
+    # One query per relationship instead of a six way joined cartesian product
+    existing_user = (
+        db.query(UserModel)
+        .filter(*filters)
+        .options(*[selectinload(rel) for rel in USER_EXTRA_DETAIL_RELATIONSHIPS])
+        .first()
     )
-
-    sender_payload = [
-        FriendBaseSchema(
-            id=single_sender.id,
-            sender_id=single_sender.sender_id,
-            receiver_id=single_sender.receiver_id,
-            created_at=single_sender.created_at,
-            updated_at=single_sender.updated_at,
-            status=single_sender.status,
-            has_claimed=single_sender.has_claimed
+    if not existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with {id} not found",
         )
-        for single_sender in existing_user.sender
-    ]
 
-    receiver_payload = [
-        FriendBaseSchema(
-            id=single_receiver.id,
-            sender_id=single_receiver.sender_id,
-            receiver_id=single_receiver.receiver_id,
-            created_at=single_receiver.created_at,
-            updated_at=single_receiver.updated_at,
-            status=single_receiver.status,
-            has_claimed=single_receiver.has_claimed
-        )
-        for single_receiver in existing_user.receiver
-    ]
+    response = _user_extra_detail_response(existing_user)
+    user_cache.store_user_response(user_cache.EXTRA_DETAIL, response, started)
+    return response
 
-    point_payload = [
-        PointSchema(
-            id=p.id,
-            login_amount=p.login_amount,
-            referral_amount=p.referral_amount,
-            extra_profit_per_hour=p.extra_profit_per_hour,
-            created_at=p.created_at,
-            updated_at=p.updated_at,
-            custom_logs=p.custom_logs,
-        )
-        for p in existing_user.point
-    ]
 
-    social_media_payload = [
-        SocialMediaBaseSchema(
-            id=so.id,
-            youtube_id=so.youtube_id,
-            youtube_following=so.youtube_following,
-            youtube_viewed=so.youtube_viewed,
-            youtube_view_date=so.youtube_view_date,
-            facebook_id=so.facebook_id,
-            facebook_following=so.facebook_following,
-            facebook_followed_date=so.facebook_followed_date,
-            instagram_id=so.instagram_id,
-            instagram_following=so.instagram_following,
-            instagram_follow_trigger_verify_date=so.instagram_follow_trigger_verify_date,
-            instagram_followed_date=so.instagram_followed_date,
-            instagram_tagged=so.instagram_tagged,
-            instagram_tagged_date=so.instagram_tagged_date,
-            instagram_reposted=so.instagram_reposted,
-            instagram_reposted_date=so.instagram_reposted_date,
-            telegram_id=so.telegram_id,
-            telegram_following=so.telegram_following,
-            telegram_followed_date=so.telegram_followed_date,
-            x_id=so.x_id,
-            x_following=so.x_following,
-            x_followed_date=so.x_followed_date,
-            discord_id=so.discord_id,
-            discord_following=so.discord_following,
-            discord_followed_date=so.discord_followed_date,
-            custom_logs=so.custom_logs,
-            updated_at=so.updated_at,
-            created_at=so.created_at,
+async def retrieve_user_extra_detail_async(
+    id: Optional[int],
+    username: Optional[str],
+    telegram_id: Optional[str],
+    wallet_address: Optional[str],
+    db: AsyncSession,
+):
+    """Async variant of retrieve_user_extra_detail, relationships are eager loaded up front"""
+    filters = _user_filters(id, username, telegram_id, wallet_address)
+    cached = await user_cache.get_user_response_async(user_cache.EXTRA_DETAIL, id, username, telegram_id, wallet_address)
+    if cached:
+        return cached
+    started = user_cache.read_started()
+
+    result = await db.execute(
+        select(UserModel)
+        .where(*filters)
+        .options(*[selectinload(rel) for rel in USER_EXTRA_DETAIL_RELATIONSHIPS])
+        .limit(1)
+    )
+    existing_user = result.scalars().first()
+    if not existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with {id} not found",
         )
-        for so in existing_user.social_media
-    ]
 
-    activity_payload = [
-        ActivityBaseSchema(
-            id=a.id,
-            logged_in=a.logged_in,
-            login_streak=a.login_streak,
-            total_logins=a.total_logins,
-            last_action_time=a.last_action_time,
-            last_login_time=a.last_login_time,
-            created_at=a.created_at,
-            updated_at=a.updated_at,
-            custom_logs=a.custom_logs,
-        )
-        for a in existing_user.activity
-    ]
-    
-    # FIXME
-    # new_record = background_tasks.add_task(retrieve_record_by_user_id, existing_user.id, db)
-    # print('new_record')
-    # print(new_record)
-    # existing_user.record.append(new_record)
-    
-    # record_payload = [
-    #     RecordSchema(
-    #         id=r.id,
-    #         action=r.action,
-    #         table=r.table,
-    #         table_id=r.table_id,
-    #         created_at=r.created_at,
-    #         updated_at=r.updated_at,
-    #         custom_logs=r.custom_logs,
-    #     )
-    #     for r in new_record
-    # ]
+    response = _user_extra_detail_response(existing_user)
+    await user_cache.store_user_response_async(user_cache.EXTRA_DETAIL, response, started)
+    return response
+
+
+# Users per batch of the list endpoint, each batch costs one IN query per relationship
+USER_LIST_CHUNK_SIZE = 100
 
-    return UserDetailsResponseSchema(
-        user_details=UserDetailsSchema(
-            user_base=UserSchema(
-                id=existing_user.id,
-                app_info=user_app_info,
-                personal_info=user_personal_info,
-                telegram_info=user_telegram_info,
-                created_at=existing_user.created_at,
-                updated_at=existing_user.updated_at,
-                custom_logs=existing_user.custom_logs,
-            ),
-            game_characters=[
-                GameCharacterBaseSchema(
-                    id=single_game_character.id,
-                    first_name=single_game_character.first_name,
-                    last_name=single_game_character.last_name,
-                    gender=single_game_character.gender,
-                    title=single_game_character.title,
-                    created_at=single_game_character.created_at,
-                    updated_at=single_game_character.updated_at,
-                    custom_logs=single_game_character.custom_logs,
-                )
-                for single_game_character in existing_user.game_characters
-            ],
-            point=point_payload,
-            activity=activity_payload,
-            social_media=social_media_payload,
-            # record=new_record, # FIXME
-            sender=sender_payload,
-            receiver=receiver_payload,
-        )
-    )
+
+def iter_user_responses(
+    db: Session,
+    user_ids: List[int],
+    chunk_size: int = USER_LIST_CHUNK_SIZE,
+) -> Iterator[UserDetailsResponseSchema]:
+    """Yield the entries of the given users batch by batch instead of materializing a joined result"""
+    for start in range(0, len(user_ids), chunk_size):
+        # A fully fetched query per batch, the relationship loads reuse the connection after it
+        existing_users = db.scalars(
+            select(UserModel)
+            .where(UserModel.id.in_(user_ids[start:start + chunk_size]))
+            .options(*[selectinload(rel) for rel in USER_EXTRA_DETAIL_RELATIONSHIPS])
+            .order_by(UserModel.id)
+        ).all()
+        # FIXME
+        # for existing_user in existing_users:
+        #     new_record = RecordModel(action="LIST", table="USER",table_id=existing_user.id)
+        #     db.add(new_record)
+        #     db.commit()
+        #     db.refresh(new_record)
+        for existing_user in existing_users:
+            yield _user_extra_detail_response(existing_user)
 
 
 def retrieve_users(
-    db: Session, skip: int, limit: int
-) -> List[UserDetailsResponseSchema]:  # no filter
-    existing_users = (
-        db.query(UserModel)
-        .options(
-            joinedload(UserModel.point),  # Load point with the user
-            joinedload(UserModel.game_characters),  # Load game character with the user
-            joinedload(UserModel.activity),  # Load activity with the user
-            joinedload(UserModel.social_media),  # Load social media with the user
-            joinedload(UserModel.sender),  # Load sender with the user
-            joinedload(UserModel.receiver),  # Load receiver with the user
-            # joinedload(UserModel.record) # FIXME
-        )
-        .offset(skip)
-        .limit(limit)
-        .all()
+    db: Session, skip: int, limit: int, cursor: Optional[str] = None
+) -> Page:  # no filter
+    after_id = decode_cursor(cursor)
+    # The page is cut on ids alone, the users are then loaded in bounded batches
+    user_ids, next_cursor = page_of(
+        db.scalars(paginate(select(UserModel.id), UserModel.id, skip, limit, after_id)).all(),
+        limit,
+        id_of=lambda user_id: user_id,
     )
-    
-    # FIXME
-    # for existing_user in existing_users:
-    #     new_record = RecordModel(action="LIST", table="USER",table_id=existing_user.id)
-    #     db.add(new_record)
-    #     db.commit()
-    #     db.refresh(new_record)
-    
-    return [
-        UserDetailsResponseSchema(
-            user_details=UserDetailsSchema(
-                user_base=UserSchema(
-                    id=existing_user.id,
-                    app_info=UserAppInfoSchema(
-                        active=existing_user.active,
-                        in_game_items=existing_user.in_game_items,
-                        admin=existing_user.admin,
-                        skin=existing_user.skin,
-                    ),
-                    personal_info=UserPersonalInfoSchema(
-                        location=existing_user.location,
-                        nationality=existing_user.nationality,
-                        age=existing_user.age,
-                        gender=existing_user.gender,
-                        email=existing_user.email,
-                    ),
-                    telegram_info=UserTelegramInfoSchema(
-                        username=existing_user.username,
-                        telegram_id=existing_user.telegram_id,
-                        token_balance=existing_user.token_balance,
-                        premium=existing_user.premium,
-                        wallet_address=existing_user.wallet_address,
-                        chat_id=existing_user.chat_id,
-                        start_param=existing_user.start_param
-                    ),
-                    created_at=existing_user.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_user.created_at else None, 
-                    updated_at=existing_user.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_user.updated_at else None, 
-                    custom_logs=existing_user.custom_logs,
-                ),
-                game_characters=[
-                    GameCharacterBaseSchema(
-                        id=single_game_character.id,
-                        first_name=single_game_character.first_name,
-                        last_name=single_game_character.last_name,
-                        gender=single_game_character.gender,
-                        title=single_game_character.title,
-                        created_at=single_game_character.created_at.astimezone(pytz.timezone('Asia/Singapore')) if single_game_character.created_at else None, 
-                        updated_at=single_game_character.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if single_game_character.updated_at else None, 
-                        custom_logs=single_game_character.custom_logs,
-                    )
-                    for single_game_character in existing_user.game_characters
-                ],
-                point=[
-                    PointSchema(
-                        id=p.id,
-                        login_amount=p.login_amount,
-                        referral_amount=p.referral_amount,
-                        extra_profit_per_hour=p.extra_profit_per_hour,
-                        created_at=p.created_at.astimezone(pytz.timezone('Asia/Singapore')) if p.created_at else None, 
-                        updated_at=p.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if p.updated_at else None, 
-                        custom_logs=p.custom_logs,
-                    )
-                    for p in existing_user.point
-                ],
-                activity=[
-                    ActivityBaseSchema(
-                        id=a.id,
-                        logged_in=a.logged_in,
-                        login_streak=a.login_streak,
-                        total_logins=a.total_logins,
-                        last_action_time=a.last_action_time.astimezone(pytz.timezone('Asia/Singapore')) if a.last_action_time else None, 
-                        last_login_time=a.last_login_time.astimezone(pytz.timezone('Asia/Singapore')) if a.last_login_time else None, 
-                        created_at=a.created_at.astimezone(pytz.timezone('Asia/Singapore')) if a.created_at else None, 
-                        updated_at=a.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if a.updated_at else None, 
-                        custom_logs=a.custom_logs,
-                    )
-                    for a in existing_user.activity
-                ],
-                social_media=[
-                    SocialMediaBaseSchema(
-                        id=so.id,
-                        youtube_id=so.youtube_id,
-                        youtube_following=so.youtube_following,
-                        youtube_viewed=so.youtube_viewed,
-                        youtube_view_date=so.youtube_view_date.astimezone(pytz.timezone('Asia/Singapore')) if so.youtube_view_date else None, 
-                        facebook_id=so.facebook_id,
-                        facebook_following=so.facebook_following,
-                        facebook_followed_date=so.facebook_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.facebook_followed_date else None, 
-                        instagram_id=so.instagram_id,
-                        instagram_following=so.instagram_following,
-                        instagram_follow_trigger_verify_date=so.instagram_follow_trigger_verify_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_follow_trigger_verify_date else None, 
-                        instagram_followed_date=so.instagram_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_followed_date else None, 
-                        instagram_tagged=so.instagram_tagged,
-                        instagram_tagged_date=so.instagram_tagged_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_tagged_date else None, 
-                        instagram_reposted=so.instagram_reposted,
-                        instagram_reposted_date=so.instagram_reposted_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_reposted_date else None, 
-                        telegram_id=so.telegram_id,
-                        telegram_following=so.telegram_following,
-                        telegram_followed_date=so.telegram_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.telegram_followed_date else None, 
-                        x_id=so.x_id,
-                        x_following=so.x_following,
-                        x_followed_date=so.x_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.x_followed_date else None, 
-                        discord_id=so.discord_id,
-                        discord_following=so.discord_following,
-                        discord_followed_date=so.discord_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.discord_followed_date else None, 
-                        custom_logs=so.custom_logs,
-                        updated_at=so.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if so.updated_at else None, 
-                        created_at=so.created_at.astimezone(pytz.timezone('Asia/Singapore')) if so.created_at else None,
-                    )
-                    for so in existing_user.social_media
-                ],
-                sender=[
-                    FriendBaseSchema(
-                        id=single_sender.id,
-                        sender_id=single_sender.sender_id,
-                        receiver_id=single_sender.receiver_id,
-                        created_at=single_sender.created_at.astimezone(pytz.timezone('Asia/Singapore')) if single_sender.created_at else None,
-                        updated_at=single_sender.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if single_sender.updated_at else None,
-                        status=single_sender.status,
-                        has_claimed=single_sender.has_claimed
-                    )
-                    for single_sender in existing_user.sender
-                ],
-                receiver=[
-                    FriendBaseSchema(
-                        id=single_receiver.id,
-                        sender_id=single_receiver.sender_id,
-                        receiver_id=single_receiver.receiver_id,
-                        created_at=single_receiver.created_at.astimezone(pytz.timezone('Asia/Singapore')) if single_receiver.created_at else None,
-                        updated_at=single_receiver.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if single_receiver.updated_at else None,
-                        status=single_receiver.status,
-                        has_claimed=single_receiver.has_claimed
-                    )
-                    for single_receiver in existing_user.receiver
-                ],
-                # FIXME
-                # record_payload = [
-                #     RecordSchema(
-                #         id=r.id,
-                #         action=r.action,
-                #         table=r.table,
-                #         table_id=r.table_id,
-                #         created_at=r.created_at,
-                #         updated_at=r.updated_at,
-                #         custom_logs=r.custom_logs,
-                #     )
-                #     for r in existing_user.record
-                # ]
-
-            )
-        )
-        for existing_user in existing_users
-    ]
+    return Page(list(iter_user_responses(db, user_ids, USER_LIST_CHUNK_SIZE)), next_cursor)
 
 
 def update_user(
@@ -806,154 +660,10 @@ def update_user(
                 existing_user.custom_logs = request.user_payload.custom_logs
             
             db.commit()
+            user_cache.invalidate_user(existing_user.id)
             db.refresh(existing_user)
 
-            user_app_info = UserAppInfoSchema(
-                active=existing_user.active,
-                in_game_items=existing_user.in_game_items,
-                admin=existing_user.admin,
-                skin=existing_user.skin,
-            )
-
-            user_personal_info = UserPersonalInfoSchema(
-                location=existing_user.location,
-                nationality=existing_user.nationality,
-                age=existing_user.age,
-                gender=existing_user.gender,
-                email=existing_user.email,
-            )
-
-            user_telegram_info = UserTelegramInfoSchema(
-                username=existing_user.username,
-                telegram_id=existing_user.telegram_id,
-                token_balance=existing_user.token_balance,
-                premium=existing_user.premium,
-                wallet_address=existing_user.wallet_address,
-                chat_id=existing_user.chat_id,
-                start_param=existing_user.start_param
-            )
-
-            sender_payload = [
-                FriendBaseSchema(
-                    id=single_sender.id,
-                    sender_id=single_sender.sender_id,
-                    receiver_id=single_sender.receiver_id,
-                    created_at=single_sender.created_at.astimezone(pytz.timezone('Asia/Singapore')) if single_sender.created_at else None,
-                    updated_at=single_sender.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if single_sender.updated_at else None,
-                    status=single_sender.status,
-                    has_claimed=single_sender.has_claimed
-                )
-                for single_sender in existing_user.sender
-            ]
-
-            receiver_payload = [
-                FriendBaseSchema(
-                    id=single_receiver.id,
-                    sender_id=single_receiver.sender_id,
-                    receiver_id=single_receiver.receiver_id,
-                    created_at=single_receiver.created_at.astimezone(pytz.timezone('Asia/Singapore')) if single_receiver.created_at else None,
-                    updated_at=single_receiver.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if single_receiver.updated_at else None,
-                    status=single_receiver.status,
-                    has_claimed=single_receiver.has_claimed
-                )
-                for single_receiver in existing_user.receiver
-            ]
-
-            game_character_payload = [
-                GameCharacterBaseSchema(
-                    id=single_game_character.id,
-                    first_name=single_game_character.first_name,
-                    last_name=single_game_character.last_name,
-                    gender=single_game_character.gender,
-                    title=single_game_character.title,
-                    created_at=single_game_character.created_at.astimezone(pytz.timezone('Asia/Singapore')) if single_game_character.created_at else None,
-                    updated_at=single_game_character.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if single_game_character.updated_at else None,
-                    custom_logs=single_game_character.custom_logs,
-                )
-                for single_game_character in existing_user.game_characters
-            ]
-
-            point_payload = [
-                PointSchema(
-                    id=p.id,
-                    login_amount=p.login_amount,
-                    referral_amount=p.referral_amount,
-                    extra_profit_per_hour=p.extra_profit_per_hour,
-                    created_at=p.created_at.astimezone(pytz.timezone('Asia/Singapore')) if p.created_at else None,
-                    updated_at=p.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if p.updated_at else None,
-                    custom_logs=p.custom_logs,
-                )
-                for p in existing_user.point
-            ]
-
-            social_media_payload = [
-                SocialMediaBaseSchema(
-                    id=so.id,
-                    youtube_id=so.youtube_id,
-                    youtube_following=so.youtube_following,
-                    youtube_viewed=so.youtube_viewed,
-                    youtube_view_date=so.youtube_view_date.astimezone(pytz.timezone('Asia/Singapore')) if so.youtube_view_date else None,
-                    facebook_id=so.facebook_id,
-                    facebook_following=so.facebook_following,
-                    facebook_followed_date=so.facebook_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.facebook_followed_date else None,
-                    instagram_id=so.instagram_id,
-                    instagram_following=so.instagram_following,
-                    instagram_follow_trigger_verify_date=so.instagram_follow_trigger_verify_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_follow_trigger_verify_date else None,
-                    instagram_followed_date=so.instagram_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_followed_date else None,
-                    instagram_tagged=so.instagram_tagged,
-                    instagram_tagged_date=so.instagram_tagged_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_tagged_date else None,
-                    instagram_reposted=so.instagram_reposted,
-                    instagram_reposted_date=so.instagram_reposted_date.astimezone(pytz.timezone('Asia/Singapore')) if so.instagram_reposted_date else None,
-                    telegram_id=so.telegram_id,
-                    telegram_following=so.telegram_following,
-                    telegram_followed_date=so.telegram_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.telegram_followed_date else None,
-                    x_id=so.x_id,
-                    x_following=so.x_following,
-                    x_followed_date=so.x_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.x_followed_date else None,
-                    discord_id=so.discord_id,
-                    discord_following=so.discord_following,
-                    discord_followed_date=so.discord_followed_date.astimezone(pytz.timezone('Asia/Singapore')) if so.discord_followed_date else None,
-                    custom_logs=so.custom_logs,
-                    created_at=so.created_at.astimezone(pytz.timezone('Asia/Singapore')) if so.created_at else None,
-                    updated_at=so.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if so.updated_at else None,
-                )
-                for so in existing_user.social_media
-            ]
-
-            activity_payload = [
-                ActivityBaseSchema(
-                    id=a.id,
-                    logged_in=a.logged_in,
-                    login_streak=a.login_streak,
-                    total_logins=a.total_logins,
-                    last_action_time=a.last_action_time.astimezone(pytz.timezone('Asia/Singapore')) if a.last_action_time else None,
-                    last_login_time=a.last_login_time.astimezone(pytz.timezone('Asia/Singapore')) if a.last_login_time else None,
-                    created_at=a.created_at.astimezone(pytz.timezone('Asia/Singapore')) if a.created_at else None,
-                    updated_at=a.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if a.updated_at else None,
-                    custom_logs=a.custom_logs,
-                )
-                for a in existing_user.activity
-            ]
-
-        return UserUpdateResponseSchema(
-            user_details=UserDetailsSchema(
-                user_base=UserSchema(
-                    id=existing_user.id,
-                    app_info=user_app_info,
-                    personal_info=user_personal_info,
-                    telegram_info=user_telegram_info,
-                    created_at=existing_user.created_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_user.created_at else None,
-                    updated_at=existing_user.updated_at.astimezone(pytz.timezone('Asia/Singapore')) if existing_user.updated_at else None,
-                    custom_logs=existing_user.custom_logs,
-                ),
-                game_characters=game_character_payload,
-                point=point_payload,
-                activity=activity_payload,
-                social_media=social_media_payload,
-                sender=sender_payload,
-                receiver=receiver_payload,
-            )
-        )
+        return UserUpdateResponseSchema(user_details=_user_extra_details(existing_user))
 
 
 def delete_user(id: int, db: Session):
@@ -961,6 +671,7 @@ def delete_user(id: int, db: Session):
     if db_user:
         db.delete(db_user)
         db.commit()
+        user_cache.invalidate_user(id)
     else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=f"User {id} not found"
@@ -988,63 +699,71 @@ def delete_user(id: int, db: Session):
 #     return result
 
 def get_referral_ranking(sender_id: int, db: Session) -> ReferralRankingResponse:  # no filter
-    """Get referral ranking"""
-    existing_users = (
-        db.query(UserModel)
-        .options(
-            joinedload(UserModel.sender),  # Load sender with the user
-            joinedload(UserModel.receiver),  # Load receiver with the user
+    """Get referral ranking, 404 for an unknown sender
+
+    An unknown sender used to come back as ``sender_info=None``, which the
+    required ``sender_info`` of ``ReferralRankingResponse`` rejected with a 500.
+    """
+    sender_info = referral_leaderboard.get_referrer_rank(db, sender_id)
+    if not sender_info:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"User {sender_id} not found"
         )
-        .all()
-    )
-    
-    # FIXME
-    # for existing_user in existing_users:
-    #     new_record = RecordModel(action="LIST", table="USER",table_id=existing_user.id)
-    #     db.add(new_record)
-    #     db.commit()
-    #     db.refresh(new_record)
-    
-    user_referrals = [(user.id, len(user.sender)) for user in existing_users]
-    
-    # Sort the list by sender_list_length in descending order
-    sorted_referrals = sorted(user_referrals, key=lambda x: x[1], reverse=True)
-    
-    # Get the top 10 users
-    top_10 = sorted_referrals[:10]
-    
-    # Create the ranking list with rank, sender list length, user_id, and username
-    ranking_list = []
-    for rank, (user_id, sender_count) in enumerate(top_10, start=1):
-        user = next(user for user in existing_users if user.id == user_id)
-        ranking_list.append({
-            "rank": rank,
-            "sender_count": sender_count,
-            "user_id": user_id,
-            "telegram_id": user.telegram_id,
-            "username": user.username
-        })
-    
-    # Find the rank of the given sender_id
-    sender_rank = next((rank for rank, (user_id, _) in enumerate(sorted_referrals, start=1) if user_id == sender_id), None)
-    
-    # Get the sender's record
-    sender_record = next((user for user in existing_users if user.id == sender_id), None)
-    sender_info = None
-    if sender_record:
-        sender_info = {
-            "rank": sender_rank,
-            "sender_count": len(sender_record.sender),
-            "user_id": sender_id,
-            "telegram_id": sender_record.telegram_id,
-            "username": sender_record.username
-        }
-    
+
+    ranking_list = referral_leaderboard.get_top_referrers(db, 10)
+
     # Determine if the sender is in the top 10
     sender_in_top_10 = any(record["user_id"] == sender_id for record in ranking_list)
-    
+
     return {
         "top_10": ranking_list,
         "sender_info": sender_info,
         "sender_in_top_10": sender_in_top_10
-    }
\ No newline at end of file
+    }
+
+
+def bootstrap_user(telegram_id: str, db: Session) -> UserBootstrapResponseSchema:
+    """Load the user, its relationships, character stats and both rankings on one session"""
+    if not telegram_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="telegram_id is required")
+
+    started = user_cache.read_started()
+    # One IN query per relationship, character stats included
+    existing_user = (
+        db.query(UserModel)
+        .filter(UserModel.telegram_id == telegram_id)
+        .options(
+            *[selectinload(rel) for rel in USER_EXTRA_DETAIL_RELATIONSHIPS],
+            selectinload(UserModel.game_characters).selectinload(GameCharacterModel.stats),
+        )
+        .first()
+    )
+    if not existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with telegram id {telegram_id} not found",
+        )
+
+    # Built up front, the rankings below only need the id
+    user_id = existing_user.id
+    user_response = _user_extra_detail_response(existing_user)
+    game_characters = [
+        game_character_service._game_character_retrieval(game_character)
+        for game_character in existing_user.game_characters
+    ]
+    user_cache.store_user_response(user_cache.EXTRA_DETAIL, user_response, started)
+
+    try:
+        point_ranking = point_service.get_point_ranking(user_id, db)
+    except HTTPException as e:
+        # A user without any point row has no rank yet
+        if e.status_code != status.HTTP_404_NOT_FOUND:
+            raise
+        point_ranking = None
+
+    return UserBootstrapResponseSchema(
+        user=user_response,
+        game_characters=game_characters,
+        point_ranking=point_ranking,
+        referral_ranking=get_referral_ranking(user_id, db),
+    )
@@ -6,9 +6,11 @@ from fastapi import (
     HTTPException,
     status
 )
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from core import database
+from core import database, singleflight
+from core.pagination import page_response
 from app.user import schemas
 from app.user.api.v1 import service
 
@@ -17,15 +19,25 @@ from app.user.api.v1 import service
 
 router = APIRouter(prefix="/api/v1/user", tags=["user"])
 get_db = database.get_db
+get_async_db = database.get_async_db
 
+detail_flight = singleflight.async_group("user_detail")
+referral_ranking_flight = singleflight.group("referral_ranking")
 
-@router.post("/create", response_model=schemas.UserCreateResponseSchema)# dependencies=[Depends(auth)],
+
+@router.post("/create", response_model=schemas.UserCreateResponseSchema, status_code=status.HTTP_201_CREATED)# dependencies=[Depends(auth)],
 # def create_user(request: schemas.UserCreateRequestSchema, background_tasks: BackgroundTasks, db: Session = Depends(get_db),):
 def create_user(request: schemas.UserCreateRequestSchema, db: Session = Depends(get_db)):
-    """Login with existing account"""
+    """Create an account, 409 if the telegram id signed up before"""
     return service.create_user(request, db)
 
 
+@router.post("/onboard", response_model=schemas.UserOnboardResponseSchema)
+def onboard_user(request: schemas.UserOnboardRequestSchema, db: Session = Depends(get_db)):
+    """Sign up a new user with all of its starting rows in one call"""
+    return service.onboard_user(request, db)
+
+
 # @router.get("/detail/{id}")
 # def get_detail_by_user_id(
 #     id: int,
@@ -37,14 +49,23 @@ def create_user(request: schemas.UserCreateRequestSchema, db: Session = Depends(
 
     # background_tasks: BackgroundTasks, # FIXME
 @router.get("/detail")
-def get_user(id: Optional[int] = None, username: Optional[str] = None, telegram_id: Optional[str] = None, wallet_address: Optional[str] = None, db: Session = Depends(get_db)):
+async def get_user(id: Optional[int] = None, username: Optional[str] = None, telegram_id: Optional[str] = None, wallet_address: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
     """Get User details of single user"""
-    return service.retrieve_user(id, username, telegram_id, wallet_address, db)
+    return await detail_flight.do(
+        (id, username, telegram_id, wallet_address),
+        lambda: service.retrieve_user_async(id, username, telegram_id, wallet_address, db),
+    )
 
 @router.get("/extra-detail")
-def get_user_extra_detail(id: Optional[int] = None, username: Optional[str] = None, telegram_id: Optional[str] = None, wallet_address: Optional[str] = None, db: Session = Depends(get_db)):
+async def get_user_extra_detail(id: Optional[int] = None, username: Optional[str] = None, telegram_id: Optional[str] = None, wallet_address: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
     """Get User details of single user including information from other tables"""
-    return service.retrieve_user_extra_detail(id, username, telegram_id, wallet_address, db)
+    return await service.retrieve_user_extra_detail_async(id, username, telegram_id, wallet_address, db)
+
+
+@router.get("/bootstrap", response_model=schemas.UserBootstrapResponseSchema)
+def get_user_bootstrap(telegram_id: str, db: Session = Depends(get_db)):
+    """Get everything the mini app needs on launch in a single call"""
+    return service.bootstrap_user(telegram_id, db)
 
 
 @router.get("/details", response_model=List[schemas.UserDetailsResponseSchema])# dependencies=[Depends(auth)],
@@ -52,11 +73,12 @@ def get_user_list(
     # user: schemas.UserSchema,
     skip: int = 0,
     limit: int = 15,
+    cursor: Optional[str] = None,
     # user: schemas.UserSchema = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """Get Users if it is admin"""
-    return service.retrieve_users(db, skip, limit)
+    return page_response(service.retrieve_users(db, skip, limit, cursor))
 
 
 @router.put("/update", response_model=schemas.UserUpdateResponseSchema)# dependencies=[Depends(auth)],
@@ -68,5 +90,5 @@ def update_user(request: schemas.UserUpdateRequestSchema, db: Session = Depends(
 @router.get("/referral-ranking", response_model=schemas.ReferralRankingResponse)
 def get_referral_ranking(sender_id: int, db: Session = Depends(get_db)):
     """Get referral ranking"""
-    return service.get_referral_ranking(sender_id, db)
+    return referral_ranking_flight.do(sender_id, lambda: service.get_referral_ranking(sender_id, db))
 
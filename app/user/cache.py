@@ -0,0 +1,163 @@
+"""User Detail Cache
+
+Read-through cache of the ``/detail`` and ``/extra-detail`` responses. Each
+response is stored once under the user id, username, telegram_id and wallet
+address are alias keys pointing at that id. A cached entry is only served if
+it still matches every lookup parameter, so an alias left behind by a rename
+falls back to the database instead of returning the wrong user.
+
+A read that started before an invalidation must not store what it loaded
+after it. Invalidating a user leaves an ``invalidated`` marker holding the
+time, and a response is only stored when no marker is newer than the start of
+its read (``read_started``). Between that check and the write, a concurrent
+invalidation can still slip in; the TTL bounds how long such an entry lives.
+
+The async services use the ``*_async`` variants, which run the calls of a
+blocking backend (Redis) in the thread pool.
+"""
+
+import logging
+import time
+from typing import Iterable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.user.schemas import UserDetailsResponseSchema
+from core.cache import get_cache
+
+DETAIL = "detail"
+EXTRA_DETAIL = "extra"
+VIEWS = (DETAIL, EXTRA_DETAIL)
+
+ALIAS_FIELDS = ("username", "telegram_id", "wallet_address")
+
+
+def _entry_key(view: str, user_id: int) -> str:
+    return f"user:{view}:{user_id}"
+
+
+def _alias_key(field: str, value: str) -> str:
+    return f"user:alias:{field}:{value}"
+
+
+def _invalidated_key(user_id: int) -> str:
+    return f"user:invalidated:{user_id}"
+
+
+def read_started() -> float:
+    """Taken before the database read whose response goes to store_user_response"""
+    return time.time()
+
+
+def _matches(response: UserDetailsResponseSchema, id, username, telegram_id, wallet_address) -> bool:
+    user_base = response.user_details.user_base
+    telegram_info = user_base.telegram_info
+    return (
+        (id is None or user_base.id == id)
+        and (username is None or telegram_info.username == username)
+        and (telegram_id is None or telegram_info.telegram_id == telegram_id)
+        and (wallet_address is None or telegram_info.wallet_address == wallet_address)
+    )
+
+
+def get_user_response(
+    view: str,
+    id: Optional[int],
+    username: Optional[str],
+    telegram_id: Optional[str],
+    wallet_address: Optional[str],
+) -> Optional[UserDetailsResponseSchema]:
+    """Cached response for the lookup, None on a miss"""
+    cache = get_cache()
+    try:
+        user_id = id
+        if user_id is None:
+            lookups = zip(ALIAS_FIELDS, (username, telegram_id, wallet_address))
+            for field, value in lookups:
+                if value is not None:
+                    user_id = cache.get(_alias_key(field, value))
+                    break
+        if user_id is None:
+            return None
+
+        payload = cache.get(_entry_key(view, user_id))
+        if payload is None:
+            return None
+
+        response = UserDetailsResponseSchema.model_validate(payload)
+        if not _matches(response, id, username, telegram_id, wallet_address):
+            return None
+        return response
+    except Exception as e:
+        # The cache is an optimization, never fail a read because of it
+        logging.error(f"User cache read failed: {e}")
+        return None
+
+
+def store_user_response(view: str, response: UserDetailsResponseSchema, started: float) -> None:
+    """Cache a response under its user id and register the alias keys
+
+    Skipped when the user was invalidated after ``started`` (``read_started``),
+    the response may predate that write.
+    """
+    cache = get_cache()
+    try:
+        user_base = response.user_details.user_base
+        invalidated = cache.get(_invalidated_key(user_base.id))
+        if invalidated is not None and invalidated >= started:
+            return
+        telegram_info = user_base.telegram_info
+        cache.set(_entry_key(view, user_base.id), response.model_dump(mode="json"))
+        for field in ALIAS_FIELDS:
+            value = getattr(telegram_info, field)
+            if value is not None:
+                cache.set(_alias_key(field, value), user_base.id)
+    except Exception as e:
+        logging.error(f"User cache write failed: {e}")
+
+
+def invalidate_user(*user_ids: int) -> None:
+    """Drop every cached response of the given users"""
+    invalidate_users(user_ids)
+
+
+def invalidate_users(user_ids: Iterable[int]) -> None:
+    """Drop every cached response of the given users"""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    try:
+        cache = get_cache()
+        now = time.time()
+        for user_id in user_ids:
+            cache.set(_invalidated_key(user_id), now)
+        cache.delete(*[_entry_key(view, user_id) for user_id in user_ids for view in VIEWS])
+    except Exception as e:
+        logging.error(f"User cache invalidation failed: {e}")
+
+
+async def _off_loop(fn, *args):
+    if get_cache().blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+async def get_user_response_async(
+    view: str,
+    id: Optional[int],
+    username: Optional[str],
+    telegram_id: Optional[str],
+    wallet_address: Optional[str],
+) -> Optional[UserDetailsResponseSchema]:
+    """Async variant of get_user_response"""
+    return await _off_loop(get_user_response, view, id, username, telegram_id, wallet_address)
+
+
+async def store_user_response_async(view: str, response: UserDetailsResponseSchema, started: float) -> None:
+    """Async variant of store_user_response"""
+    await _off_loop(store_user_response, view, response, started)
+
+
+async def invalidate_user_async(*user_ids: int) -> None:
+    """Async variant of invalidate_user"""
+    await _off_loop(invalidate_users, user_ids)
@@ -18,8 +18,6 @@ class UserModel(Base):
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
-        unique=True,
-        index=True,
         nullable=False,
         autoincrement=True,
     )
@@ -30,7 +28,7 @@ class UserModel(Base):
     premium: Mapped[bool] = mapped_column(default=False, nullable=False)
     
     wallet_address: Mapped[Optional[str]] = mapped_column(
-        String(100), nullable=True
+        String(100), nullable=True, index=True
     )  # REVIEW: allow mutliple?
     in_game_items: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
     access_token: Mapped[Optional[str]] = mapped_column(String(2000), nullable=True)
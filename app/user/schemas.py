@@ -1,13 +1,18 @@
 """Users Pydantic Schemas"""
 
 from typing import Optional, List
-from pydantic import BaseModel
+from pydantic import BaseModel, model_validator
 from datetime import datetime
-from app.game_character.schemas import GameCharacterBaseSchema
-from app.point.schemas import PointSchema
+from app.game_character.schemas import (
+    GameCharacterBaseSchema,
+    GameCharacterCreateDetailsSchema,
+    GameCharacterRetrievalResponseSchema,
+)
+from app.point.schemas import PointRankingResponse, PointSchema
 from app.activity.schemas import ActivityBaseSchema
 from app.social_media.schemas import SocialMediaBaseSchema
 from app.friend.schemas import FriendBaseSchema, FriendIds
+from core.serialization import SGTDateTime
 
 
 class UserBaseSchema(BaseModel):  # default = False
@@ -29,6 +34,11 @@ class UserPersonalInfoSchema(BaseModel):
     gender: Optional[str] = None
     email: Optional[str] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
 
 class UserTelegramInfoSchema(BaseModel):
     username: str
@@ -39,6 +49,11 @@ class UserTelegramInfoSchema(BaseModel):
     chat_id: str
     start_param: Optional[str] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
 
 class UserAppInfoSchema(BaseModel):
     active: bool
@@ -47,6 +62,11 @@ class UserAppInfoSchema(BaseModel):
     skin: List[str]
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
 
 class UserUpdateDetailsSchema(BaseModel):
     """User Update Detail Schema"""
@@ -67,10 +87,31 @@ class UserSchema(BaseModel):
     app_info: UserAppInfoSchema
     personal_info: UserPersonalInfoSchema
     telegram_info: UserTelegramInfoSchema
-    created_at: datetime
-    updated_at: datetime
+    created_at: SGTDateTime
+    updated_at: SGTDateTime
     custom_logs: Optional[dict] = None
 
+    class Config:
+        """Pydantic Model Config"""
+
+        from_attributes = True
+
+    @model_validator(mode="before")
+    @classmethod
+    def _group_columns(cls, data):
+        # The user row is flat, each info group reads its own columns from it
+        if isinstance(data, (dict, BaseModel)):
+            return data
+        return {
+            "id": data.id,
+            "app_info": data,
+            "personal_info": data,
+            "telegram_info": data,
+            "created_at": data.created_at,
+            "updated_at": data.updated_at,
+            "custom_logs": data.custom_logs,
+        }
+
 
 class UserDetailsSchema(BaseModel):  # show the based + relationship
     """User Display Schema"""
@@ -164,3 +205,30 @@ class ReferralRankingResponse(BaseModel):
     top_10: List[ReferralRankingList]
     sender_info: ReferralRankingList
     sender_in_top_10: bool
+
+
+class UserBootstrapResponseSchema(BaseModel):
+    """Everything the mini app loads on launch, in one payload"""
+
+    user: UserDetailsResponseSchema
+    game_characters: List[GameCharacterRetrievalResponseSchema] = []
+    point_ranking: Optional[PointRankingResponse] = None
+    referral_ranking: ReferralRankingResponse
+
+
+class UserOnboardRequestSchema(BaseModel):
+    """User Onboard Request Schema, the new user and its first game character"""
+
+    access_token: Optional[str] = None
+    app_info: UserAppInfoSchema
+    personal_info: UserPersonalInfoSchema
+    telegram_info: UserTelegramInfoSchema
+    character_details: Optional[GameCharacterCreateDetailsSchema] = None
+
+
+class UserOnboardResponseSchema(BaseModel):
+    """The new user with its point, activity, social media and game character rows"""
+
+    access_token: Optional[str] = None
+    user: UserDetailsResponseSchema
+    game_characters: List[GameCharacterRetrievalResponseSchema] = []
@@ -0,0 +1,215 @@
+"""
+Service Benchmarks
+
+Seeds a dataset per size and times the service hot paths against it, reporting
+p50/p99 latency, SQL statements and peak Python memory per call. Each result
+file is keyed by the commit it ran on, compare two of them to spot a
+regression:
+
+    python -m benchmarks.run --sizes 10000 100000 --database sqlite:///./benchmark.db
+    python -m benchmarks.run --sizes 10000 --baseline benchmarks/results/<commit>.json
+
+A MySQL url runs the same suite against a local MySQL/TiDB instead of SQLite.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.activity.api.v1 import service as activity_service
+from app.activity.schemas import DailyCheckInRequestSchema
+from app.friend.api.v1 import service as friend_service
+from app.friend.schemas import FriendCreateRequestSchema
+from app.point.api.v1 import service as point_service
+from app.user.api.v1 import service as user_service
+from benchmarks.seed import seed
+from core import request_stats
+from core.pagination import encode_cursor
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class Case(NamedTuple):
+    name: str
+    call: Callable[[Session, int, int], object]  # (db, user_id, other_user_id)
+
+
+CASES = [
+    Case(
+        "daily_check_in",
+        lambda db, user_id, _: activity_service.daily_check_in(
+            DailyCheckInRequestSchema(user_id=user_id, access_token=""), db
+        ),
+    ),
+    Case("get_point_ranking", lambda db, user_id, _: point_service.get_point_ranking(user_id, db)),
+    Case("get_referral_ranking", lambda db, user_id, _: user_service.get_referral_ranking(user_id, db)),
+    Case(
+        "retrieve_users",
+        lambda db, user_id, _: user_service.retrieve_users(db, 0, 15, encode_cursor(user_id)),
+    ),
+    Case(
+        "create_friend",
+        lambda db, user_id, other_user_id: friend_service.create_friend(
+            FriendCreateRequestSchema(
+                access_token="",
+                sender_id=user_id,
+                receiver_id=other_user_id,
+                status="pending",
+                has_claimed=False,
+            ),
+            db,
+        ),
+    ),
+]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest rank percentile of the values"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def _call(SessionLocal, case: Case, user_id: int, other_user_id: int) -> bool:
+    """Run one call on a fresh session, False if the service rejected it"""
+    db = SessionLocal()
+    try:
+        case.call(db, user_id, other_user_id)
+        return True
+    except HTTPException:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def run_case(SessionLocal, case: Case, users: int, iterations: int, memory_iterations: int, seed_value: int) -> dict:
+    """Latency and statements over ``iterations`` calls, peak memory over a shorter traced run"""
+    rng = random.Random(f"{seed_value}:{case.name}")
+    user_pairs = [(rng.randrange(1, users + 1), rng.randrange(1, users + 1)) for _ in range(iterations + memory_iterations)]
+
+    latencies, statements, errors = [], [], 0
+    for user_id, other_user_id in user_pairs[:iterations]:
+        with request_stats.collecting() as db_stats:
+            started = time.perf_counter()
+            ok = _call(SessionLocal, case, user_id, other_user_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+        statements.append(db_stats.statements)
+        errors += not ok
+
+    # Tracing slows every allocation down, so memory is measured apart from the timings
+    tracemalloc.start()
+    peak = 0
+    try:
+        for user_id, other_user_id in user_pairs[iterations:]:
+            tracemalloc.reset_peak()
+            _call(SessionLocal, case, user_id, other_user_id)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "case": case.name,
+        "users": users,
+        "iterations": iterations,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3),
+        "statements_p50": percentile(statements, 0.50),
+        "statements_max": max(statements),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def _commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results: List[dict], baseline: dict) -> List[str]:
+    """p50/p99 and statement changes against a previous result file"""
+    previous = {(result["case"], result["users"]): result for result in baseline["results"]}
+    lines = []
+    for result in results:
+        before = previous.get((result["case"], result["users"]))
+        if before is None:
+            continue
+        lines.append(
+            f"{result['case']:<24}{result['users']:>9}"
+            f"  p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f} ms"
+            f"  p99 {before['p99_ms']:.2f} -> {result['p99_ms']:.2f} ms"
+            f"  statements {before['statements_p50']} -> {result['statements_p50']}"
+        )
+    return lines
+
+
+def main():
+    """Benchmark command"""
+    parser = argparse.ArgumentParser(description="Benchmark the service hot paths on seeded datasets")
+    parser.add_argument("--database", default="sqlite:///./benchmark.db", help="database url, recreated per size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000], help="users per dataset, e.g. 10000 100000 1000000")
+    parser.add_argument("--iterations", type=int, default=200, help="timed calls per case")
+    parser.add_argument("--memory-iterations", type=int, default=20, help="traced calls per case")
+    parser.add_argument("--cases", nargs="+", choices=[case.name for case in CASES], help="subset of the cases")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="result file, defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--baseline", help="previous result file to compare against")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database)
+    request_stats.instrument_engine(engine)
+    SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    cases = [case for case in CASES if not args.cases or case.name in args.cases]
+
+    results = []
+    for users in args.sizes:
+        started = time.perf_counter()
+        counts = seed(engine, users, args.seed)
+        logging.info(f"Seeded {counts} in {time.perf_counter() - started:.1f}s")
+        print(f"seeded {users} users in {time.perf_counter() - started:.1f}s")
+        for case in cases:
+            result = run_case(SessionLocal, case, users, args.iterations, args.memory_iterations, args.seed)
+            results.append(result)
+            print(
+                f"{case.name:<24}{users:>9}  p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms"
+                f"  statements {result['statements_p50']}  peak {result['peak_memory_kib']} KiB"
+            )
+
+    commit = _commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "dialect": engine.dialect.name,
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"compared to {baseline.get('commit')}")
+        for line in compare(results, baseline):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
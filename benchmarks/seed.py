@@ -0,0 +1,285 @@
+"""
+Synthetic Dataset Seeder
+
+Deterministic synthetic users with their point, activity, game character and
+referral rows. Referrers are drawn towards the earliest users so a few senders
+own most referrals, like the real referral graph, and every claimed referral
+is already credited to the sender's ``referral_amount``. The same ``users``
+and ``seed`` always produce the same rows.
+
+Rows are generated as tuples and written with chunked driver level
+``executemany`` (multi-row INSERTs on pymysql), with the secondary indexes
+dropped during the load and built once at the end:
+
+    python -m benchmarks.seed --users 1000000 --database sqlite:///./benchmark.db
+
+The target database is dropped and recreated.
+"""
+import argparse
+import logging
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import Table, create_engine
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.activity.models import ActivityModel
+from app.friend.leaderboard import rebuild_referral_counts
+from app.friend.models import FriendModel
+from app.game_character.models import GameCharacterModel, GameCharacterStatsModel
+from app.point.leaderboard import rebuild_point_totals
+from app.point.models import PointModel
+from app.user.models import UserModel
+from core.constants import Constants
+from core.database import Base
+
+CHUNK_SIZE = 10000
+
+# Share of users that joined through a referral link
+REFERRED_SHARE = 0.6
+# Higher values concentrate the referrals on fewer senders
+REFERRAL_SKEW = 3
+# Share of referrals whose reward was already claimed
+CLAIMED_SHARE = 0.5
+
+
+class Referral(NamedTuple):
+    sender_id: int
+    receiver_id: int
+    has_claimed: bool
+
+
+class TableRows(NamedTuple):
+    table: Table
+    columns: Sequence[str]
+    rows: Iterable[tuple]
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def referrer_of(user_id: int, rng: random.Random) -> Optional[int]:
+    """Sender that referred the user, None for users that joined on their own"""
+    if user_id == 1 or rng.random() >= REFERRED_SHARE:
+        return None
+    return 1 + int((user_id - 1) * rng.random() ** REFERRAL_SKEW)
+
+
+def referral_graph(users: int, seed: int = 0) -> List[Referral]:
+    """Who referred whom, one referral per referred user"""
+    rng = random.Random(seed + 1)
+    referrals = []
+    for user_id in range(2, users + 1):
+        sender_id = referrer_of(user_id, rng)
+        if sender_id is not None:
+            referrals.append(Referral(sender_id, user_id, rng.random() < CLAIMED_SHARE))
+    return referrals
+
+
+def dataset_rows(users: int, seed: int = 0, now: Optional[datetime] = None) -> List[TableRows]:
+    """Row generators per table, in foreign key order"""
+    now = now or datetime(2024, 6, 1, 12)
+    rng = random.Random(seed)
+    referrals = referral_graph(users, seed)
+
+    claimed = [0] * (users + 1)
+    for referral in referrals:
+        if referral.has_claimed:
+            claimed[referral.sender_id] += 1
+
+    def user_rows():
+        for user_id in range(1, users + 1):
+            telegram_id = str(1_000_000_000 + user_id)
+            yield (
+                user_id, f"user{user_id}", telegram_id, 0, True, user_id % 10 == 0, False,
+                ["Default"], "SG", "SG", telegram_id, now - timedelta(days=user_id % 90), now,
+            )
+
+    def point_rows():
+        for user_id in range(1, users + 1):
+            referral_amount = claimed[user_id] * Constants.referral_reward_points
+            yield (user_id, user_id, rng.randrange(0, 500), referral_amount, 0, 0, now, now, now)
+
+    def activity_rows():
+        for user_id in range(1, users + 1):
+            # Most users last checked in yesterday, so the check in benchmark does the full write
+            last_login = now - timedelta(days=1 + (user_id % 7 == 0))
+            yield (
+                user_id, user_id, False, rng.randrange(0, 7), rng.randrange(1, 100),
+                last_login, last_login, now, now,
+            )
+
+    def game_character_rows():
+        for user_id in range(1, users + 1):
+            yield (user_id, user_id, f"first{user_id}", f"last{user_id}", user_id % 2, "Rookie", now, now)
+
+    def game_character_stats_rows():
+        for user_id in range(1, users + 1):
+            yield (
+                user_id, user_id, rng.randrange(1, 50), rng.randrange(0, 10000),
+                rng.randrange(0, 100), rng.randrange(0, 100), rng.randrange(0, 100), now, now,
+            )
+
+    def friend_rows():
+        for friend_id, referral in enumerate(referrals, start=1):
+            yield (friend_id, referral.sender_id, referral.receiver_id, "active", referral.has_claimed, now, now)
+
+    return [
+        TableRows(
+            UserModel.__table__,
+            ("id", "username", "telegram_id", "token_balance", "active", "premium", "admin",
+             "skin", "location", "nationality", "chat_id", "created_at", "updated_at"),
+            user_rows(),
+        ),
+        TableRows(
+            PointModel.__table__,
+            ("id", "user_id", "login_amount", "referral_amount", "extra_profit_per_hour", "profit_amount",
+             "last_accrued_at", "created_at", "updated_at"),
+            point_rows(),
+        ),
+        TableRows(
+            ActivityModel.__table__,
+            ("id", "user_id", "logged_in", "login_streak", "total_logins",
+             "last_action_time", "last_login_time", "created_at", "updated_at"),
+            activity_rows(),
+        ),
+        TableRows(
+            GameCharacterModel.__table__,
+            ("id", "user_id", "first_name", "last_name", "gender", "title", "created_at", "updated_at"),
+            game_character_rows(),
+        ),
+        TableRows(
+            GameCharacterStatsModel.__table__,
+            ("id", "game_character_id", "level", "exp_points", "stamina", "recovery", "condition",
+             "created_at", "updated_at"),
+            game_character_stats_rows(),
+        ),
+        TableRows(
+            FriendModel.__table__,
+            ("id", "sender_id", "receiver_id", "status", "has_claimed", "created_at", "updated_at"),
+            friend_rows(),
+        ),
+    ]
+
+
+def _insert_sql(conn: Connection, table: Table, columns: Sequence[str]) -> str:
+    """Driver level INSERT, pymysql folds its executemany into multi-row INSERTs"""
+    quote = conn.dialect.identifier_preparer.quote
+    placeholder = "?" if conn.dialect.paramstyle == "qmark" else "%s"
+    return (
+        f"INSERT INTO {quote(table.name)} ({', '.join(quote(column) for column in columns)}) "
+        f"VALUES ({', '.join([placeholder] * len(columns))})"
+    )
+
+
+def _bind_rows(conn: Connection, table: Table, columns: Sequence[str], rows: Iterable[tuple]) -> Iterator[tuple]:
+    """Apply the column types' bind processing (JSON, datetimes on SQLite) the ORM would do"""
+    processors = [table.c[column].type.bind_processor(conn.dialect) for column in columns]
+    if not any(processors):
+        yield from rows
+        return
+    processors = [processor or (lambda value: value) for processor in processors]
+    for row in rows:
+        yield tuple(processor(value) for processor, value in zip(processors, row))
+
+
+def load_table(conn: Connection, table_rows: TableRows, chunk_size: int = CHUNK_SIZE) -> int:
+    """Insert the rows chunk by chunk, committing each chunk"""
+    sql = _insert_sql(conn, table_rows.table, table_rows.columns)
+    count = 0
+    for chunk in _chunks(_bind_rows(conn, table_rows.table, table_rows.columns, table_rows.rows), chunk_size):
+        conn.exec_driver_sql(sql, chunk)
+        conn.commit()
+        count += len(chunk)
+    return count
+
+
+@contextmanager
+def deferred_indexes(conn: Connection, tables: Iterable[Table]):
+    """Drop the secondary indexes for the load and build each once afterwards"""
+    # Unique indexes stay, they are what keeps the generated rows honest
+    indexes = [index for table in tables for index in table.indexes if not index.unique]
+    for index in indexes:
+        index.drop(conn)
+    conn.commit()
+    try:
+        yield
+    finally:
+        for index in indexes:
+            index.create(conn)
+        conn.commit()
+
+
+@contextmanager
+def bulk_load_session(conn: Connection):
+    """Relax per-row durability and checks on the loading connection"""
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        conn.exec_driver_sql("PRAGMA journal_mode = MEMORY")
+        try:
+            yield
+        finally:
+            conn.exec_driver_sql("PRAGMA synchronous = FULL")
+            conn.exec_driver_sql("PRAGMA journal_mode = DELETE")
+        return
+
+    conn.exec_driver_sql("SET foreign_key_checks = 0, unique_checks = 0")
+    try:
+        yield
+    finally:
+        conn.exec_driver_sql("SET foreign_key_checks = 1, unique_checks = 1")
+
+
+def seed(engine: Engine, users: int, seed: int = 0, chunk_size: int = CHUNK_SIZE) -> Dict[str, int]:
+    """Recreate the schema, load the dataset and rebuild both leaderboards"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    dataset = dataset_rows(users, seed)
+    counts = {}
+    with engine.connect() as conn, bulk_load_session(conn):
+        with deferred_indexes(conn, [table_rows.table for table_rows in dataset]):
+            for table_rows in dataset:
+                started = time.perf_counter()
+                counts[table_rows.table.name] = load_table(conn, table_rows, chunk_size)
+                logging.info(f"Loaded {counts[table_rows.table.name]} {table_rows.table.name} rows in {time.perf_counter() - started:.1f}s")
+
+    db = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        counts["point_leaderboard"] = rebuild_point_totals(db)
+        counts["referral_count"] = rebuild_referral_counts(db)
+    finally:
+        db.close()
+    return counts
+
+
+def main():
+    """Seeding command"""
+    parser = argparse.ArgumentParser(description="Load a deterministic synthetic dataset (drops the existing tables)")
+    parser.add_argument("--database", required=True, help="database url, its tables are dropped and recreated")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per executemany and commit")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(create_engine(args.database), args.users, args.seed, args.chunk_size)
+    for table_name, count in counts.items():
+        print(f"{table_name:<24}{count:>10}")
+    print(f"seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Pluggable Key-Value Cache
+
+Values are JSON-compatible python objects. The in-process TTL/LRU backend is
+the default, the Redis backend accepts any client exposing ``get``, ``set``
+(with ``ex``), ``delete`` and ``scan_iter`` so a local fake can stand in for
+Redis. A backend doing network I/O is ``blocking``, async callers run its
+calls in the thread pool instead of on the event loop.
+
+The memory backend is per process: an invalidation only reaches the worker
+that served the write, every other worker keeps serving its copy until the TTL
+(``CACHE_TTL_SECONDS``) drops it. Run with ``CACHE_BACKEND=redis`` as soon as
+there is more than one worker.
+"""
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+from core.constants import Constants
+
+
+class CacheBackend(ABC):
+    """Interface shared by every cache backend"""
+
+    # Calls wait on network I/O, keep them off the event loop
+    blocking = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Any]:
+        """Value under the key, None on a miss"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any) -> None:
+        """Store a value for the backend's TTL"""
+
+    @abstractmethod
+    def delete(self, *keys: str) -> None:
+        """Drop the keys, missing ones are ignored"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Drop every key of this cache"""
+
+
+class MemoryCache(CacheBackend):
+    """Per process TTL/LRU cache, not shared between workers"""
+
+    def __init__(self, maxsize: int, ttl: int):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._cache.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._cache[key] = value
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+class RedisCache(CacheBackend):
+    """Cache stored in Redis, values are JSON encoded"""
+
+    blocking = True
+
+    def __init__(self, client, ttl: int, prefix: str = "golfin:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+def build_cache() -> CacheBackend:
+    """Cache backend configured in Constants"""
+    if Constants.cache_backend == "redis":
+        import redis
+
+        client = redis.Redis.from_url(Constants.redis_url)
+        return RedisCache(client, ttl=Constants.cache_ttl_seconds)
+
+    if Constants.cache_backend != "memory":
+        logging.warning(f"Unknown CACHE_BACKEND {Constants.cache_backend}, using memory")
+    return MemoryCache(maxsize=Constants.cache_maxsize, ttl=Constants.cache_ttl_seconds)
+
+
+_cache: Optional[CacheBackend] = None
+
+
+def get_cache() -> CacheBackend:
+    """Process wide cache backend, built on first use"""
+    global _cache
+    if _cache is None:
+        _cache = build_cache()
+    return _cache
+
+
+def set_cache(backend: CacheBackend) -> None:
+    """Replace the process wide cache backend (e.g. with a fake Redis client)"""
+    global _cache
+    _cache = backend
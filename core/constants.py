@@ -18,6 +18,38 @@ class Constants:
     dbName = os.environ.get("DB_NAME") if os.environ.get("PROJECT_ENV") == 'dev' else os.environ.get("TIDB_HOST")
     dbHost = os.environ.get("DB_HOST") if os.environ.get("PROJECT_ENV") == 'dev' else os.environ.get("TIDB_DATABASE")
     dburl = f"mysql+pymysql://{username}:{password}@{dbHost}:{port}/{dbName}" if os.environ.get("PROJECT_ENV") == 'dev' else os.environ.get("TIDB_SQLALCHAMY_DEV_DATABASE_URL")
+
+    # Connection pool, applied to both the sync and the async engine
+    db_pool_size = int(os.environ.get("DB_POOL_SIZE", 5))
+    db_max_overflow = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    db_pool_timeout = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+    db_pool_recycle = int(os.environ.get("DB_POOL_RECYCLE", 300))  # seconds, below the TiDB Serverless idle cutoff
+    db_pool_pre_ping = os.environ.get("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+    # Read-through cache, "memory" (per process TTL/LRU) or "redis"
+    cache_backend = os.environ.get("CACHE_BACKEND", "memory")
+    cache_ttl_seconds = int(os.environ.get("CACHE_TTL_SECONDS", 60))
+    cache_maxsize = int(os.environ.get("CACHE_MAXSIZE", 10000))
+    redis_url = os.environ.get("REDIS_URL")
+
+    # Points credited to referral_amount per claimed referral
+    referral_reward_points = int(os.environ.get("REFERRAL_REWARD_POINTS", 1))
+
+    # Longest a coalesced request waits on the in-flight call before running its own
+    singleflight_wait_seconds = float(os.environ.get("SINGLEFLIGHT_WAIT_SECONDS", 2))
+
+    # Query profiler: slow statement log with EXPLAIN, and repeats per request flagged as N+1
+    slow_query_ms = float(os.environ.get("SLOW_QUERY_MS", 200))
+    n_plus_one_threshold = int(os.environ.get("N_PLUS_ONE_THRESHOLD", 10))
+    profiler_strict = os.environ.get("PROFILER_STRICT", "false").lower() in ("1", "true", "yes")  # raise on N+1, for tests
+
+    # Maintenance jobs: ids per committed range, and the time a cron triggered run may take before it yields
+    job_chunk_size = int(os.environ.get("JOB_CHUNK_SIZE", 5000))
+    job_max_seconds = float(os.environ.get("JOB_MAX_SECONDS", 8))  # below the serverless function timeout
+
+    # Batch point updates: entries accepted per request, and users looked up and written per statement
+    point_batch_max_entries = int(os.environ.get("POINT_BATCH_MAX_ENTRIES", 20000))
+    point_batch_chunk_size = int(os.environ.get("POINT_BATCH_CHUNK_SIZE", 1000))
     
     # tidb_username= os.environ.get("TIDB_USER")
     # tidb_password= os.environ.get("TIDB_PASSWORD")
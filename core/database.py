@@ -2,7 +2,12 @@
 Database Connection & Engine Creation
 """
 import os
-from sqlalchemy import create_engine, URL
+import threading
+import time
+from sqlalchemy import create_engine, URL, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import sessionmaker
 from core.constants import Constants
@@ -25,9 +30,94 @@ from core.constants import Constants
 
 # engine_sql = Constants.SQLALCHAMY_DATABASE_URL if os.environ.get("PROJECT_ENV") else Constants.TIDB_SQLALCHAMY_DATABASE_URL
 # print(engine_sql)
+class PoolWaitStats:
+    """Counters of how long checkouts waited on a pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            self.wait_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - start)
+        return conn
+
+
+class TimedAsyncAdaptedQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    """Async engine flavour of TimedQueuePool"""
+
+
+def pool_options(poolclass) -> dict:
+    """Engine keyword arguments for the pool configured in Constants"""
+    return dict(
+        poolclass=poolclass,
+        pool_size=Constants.db_pool_size,
+        max_overflow=Constants.db_max_overflow,
+        pool_timeout=Constants.db_pool_timeout,
+        pool_recycle=Constants.db_pool_recycle,
+        pool_pre_ping=Constants.db_pool_pre_ping,
+    )
+
+
+def pool_status(pool) -> dict:
+    """Current occupancy and wait counters of an engine pool
+
+    Only queue pools keep occupancy counters, any other pool (``NullPool``,
+    ``StaticPool``) reports just its class.
+    """
+    status = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=getattr(pool, "_max_overflow", None),
+        )
+    wait_stats = getattr(pool, "wait_stats", None)
+    if wait_stats:
+        status.update(wait_stats.snapshot())
+    return status
+
+
 engine = create_engine(
     Constants.dburl, 
-    connect_args={"init_command": "SET SESSION time_zone='-01:00'"} # set UTC+8 timezone with Asia/Singapore
+    connect_args={"init_command": "SET SESSION time_zone='-01:00'"}, # set UTC+8 timezone with Asia/Singapore
+    **pool_options(TimedQueuePool),
 )
 
 
@@ -38,6 +128,34 @@ SessionLocal = sessionmaker(
 )
 
 
+# Async drivers for the same database, sync and async engines share Constants.dburl
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url):
+    """Swap the sync driver of a database url for its async counterpart"""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+async_engine = create_async_engine(
+    async_url(Constants.dburl),
+    connect_args={"init_command": "SET SESSION time_zone='-01:00'"},
+    **pool_options(TimedAsyncAdaptedQueuePool),
+)
+
+
+# expire_on_commit is off so committed objects can still be read without lazy IO
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
 
 class Base(DeclarativeBase):
     pass
@@ -53,3 +171,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Get Async Database Instance"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,137 @@
+"""
+Query Plan Audit
+
+Runs EXPLAIN on the lookups the services issue and flags the ones the database
+answers with a full table scan. Point it at a database that has the current
+schema and some data:
+
+    python -m core.explain
+
+Exits with status 1 when a full scan is found so it can gate a deploy.
+"""
+import argparse
+import logging
+import sys
+from typing import Dict, List, NamedTuple
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.engine import Connection
+
+
+class PlanReport(NamedTuple):
+    name: str
+    plan: List[str]
+    full_scan: bool
+
+
+def explain(conn: Connection, stmt) -> List[str]:
+    """Plan lines of a statement on the connection's dialect"""
+    compiled = stmt.compile(
+        dialect=conn.dialect,
+        compile_kwargs={"literal_binds": True, "render_postcompile": True},
+    )
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}").all()
+        return [row[-1] for row in rows]
+
+    result = conn.exec_driver_sql(f"EXPLAIN {compiled}")
+    keys = list(result.keys())
+    return [" ".join(f"{key}={value}" for key, value in zip(keys, row)) for row in result.all()]
+
+
+def is_full_scan(dialect_name: str, plan: List[str]) -> bool:
+    """Whether any step of the plan reads a whole table"""
+    if dialect_name == "sqlite":
+        # "SCAN friend" reads the table, "SCAN friend USING INDEX ..." walks an index
+        return any(line.startswith("SCAN ") and " USING " not in line for line in plan)
+    # TiDB reports TableFullScan operators, MySQL an access type of ALL
+    return any("TableFullScan" in line or "type=ALL" in line for line in plan)
+
+
+def audited_queries() -> Dict[str, object]:
+    """The filtered lookups of the services, with placeholder values"""
+    from app.activity.api.v1.service import _activity_filters
+    from app.activity.check_in import locked_check_in_rows
+    from app.activity.models import ActivityModel
+    from app.friend.api.v1.service import _friend_lookup_filters
+    from app.friend.models import FriendModel, ReferralCountModel
+    from app.game_character.api.v1.service import _game_character_filters
+    from app.game_character.models import GameCharacterModel, GameCharacterStatsModel
+    from app.point.api.v1.service import _point_filters
+    from app.point.models import PointLeaderboardModel, PointModel
+    from app.social_media.api.v1.service import _social_media_filters
+    from app.social_media.models import SocialMediaModel
+    from app.user.api.v1.service import _user_filters
+    from app.user.models import UserModel
+
+    sender_filters, receiver_filters = _friend_lookup_filters(None, 1)
+    return {
+        "user by telegram_id": select(UserModel).where(*_user_filters(None, None, "1", None)),
+        "user by username": select(UserModel).where(*_user_filters(None, "user", None, None)),
+        "user by wallet_address": select(UserModel).where(*_user_filters(None, None, None, "0x0")),
+        "friend pair": select(FriendModel).where(
+            or_(
+                and_(FriendModel.sender_id == 1, FriendModel.receiver_id == 2),
+                and_(FriendModel.sender_id == 2, FriendModel.receiver_id == 1),
+            )
+        ),
+        "friend as sender": select(FriendModel).where(*sender_filters),
+        "friend as receiver": select(FriendModel).where(*receiver_filters),
+        "friend unclaimed rewards": select(FriendModel).where(
+            FriendModel.sender_id == 1, FriendModel.has_claimed.is_(False)
+        ),
+        "friend pending requests": select(FriendModel).where(
+            FriendModel.receiver_id == 1, FriendModel.status == "pending"
+        ),
+        "point by user_id": select(PointModel).where(*_point_filters(None, 1)),
+        "point list by user_ids": select(PointModel).where(PointModel.user_id.in_([1, 2])),
+        "activity by user_id": select(ActivityModel).where(*_activity_filters(None, 1)),
+        "daily check in rows": locked_check_in_rows(1),
+        "social media by user_id": select(SocialMediaModel).where(*_social_media_filters(None, 1)),
+        "game character by user_id": select(GameCharacterModel).where(*_game_character_filters(None, 1)),
+        "game character stats": select(GameCharacterStatsModel).where(
+            GameCharacterStatsModel.game_character_id.in_([1, 2])
+        ),
+        "point ranking top": select(PointLeaderboardModel)
+        .order_by(PointLeaderboardModel.total_points.desc(), PointLeaderboardModel.user_id)
+        .limit(10),
+        "referral ranking top": select(ReferralCountModel)
+        .order_by(ReferralCountModel.referral_count.desc(), ReferralCountModel.sender_id)
+        .limit(10),
+    }
+
+
+def audit(conn: Connection) -> List[PlanReport]:
+    """EXPLAIN every audited query"""
+    reports = []
+    for name, stmt in audited_queries().items():
+        plan = explain(conn, stmt)
+        reports.append(PlanReport(name, plan, is_full_scan(conn.dialect.name, plan)))
+    return reports
+
+
+def main():
+    """Query plan audit command"""
+    from core.database import engine
+
+    parser = argparse.ArgumentParser(description="EXPLAIN the service queries and flag full scans")
+    parser.add_argument("--verbose", action="store_true", help="print the plan of every query")
+    args = parser.parse_args()
+
+    with engine.connect() as conn:
+        reports = audit(conn)
+
+    for report in reports:
+        print(f"{'FULL SCAN' if report.full_scan else 'ok':<10}{report.name}")
+        if args.verbose or report.full_scan:
+            for line in report.plan:
+                print(f"{'':<10}  {line}")
+
+    full_scans = [report.name for report in reports if report.full_scan]
+    if full_scans:
+        logging.warning(f"Full scans in {', '.join(full_scans)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
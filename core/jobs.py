@@ -0,0 +1,149 @@
+"""
+Maintenance Jobs
+
+Runs a set-based statement over a table in primary key ranges, committing each
+range together with a checkpoint row. An interrupted run (timeout, deploy,
+crash) resumes after the last committed range on its next call with the same
+run key, and a finished run is a no-op until the run key changes:
+
+    progress = run_in_pk_ranges(db, "activity_reset", "2024-06-01", ActivityModel.id, reset_range)
+
+Jobs keyed by date look up ``unfinished_run_key`` first, so a run that needs
+more calls than its day allows still finishes instead of starting over.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy import DateTime, Integer, String, func, select
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+from core.constants import Constants
+from core.database import Base
+
+
+class JobCheckpointModel(Base):
+    """How far the current run of a job got"""
+
+    __tablename__ = "job_checkpoint"
+    name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    run_key: Mapped[str] = mapped_column(String(100), nullable=False)
+    last_id: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, onupdate=datetime.now)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<JobCheckpointModel name={self.name} run_key={self.run_key} last_id={self.last_id}>"
+
+
+class JobProgress:
+    """Where a run stands after a call, returned to the caller and logged per range"""
+
+    def __init__(self, checkpoint: JobCheckpointModel, max_id: int, rows: int, seconds: float):
+        self.name = checkpoint.name
+        self.run_key = checkpoint.run_key
+        self.last_id = checkpoint.last_id
+        self.max_id = max_id
+        self.total_rows = checkpoint.rows
+        self.rows = rows
+        self.seconds = seconds
+        self.finished = checkpoint.finished_at is not None
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "run_key": self.run_key,
+            "last_id": self.last_id,
+            "max_id": self.max_id,
+            "rows": self.rows,
+            "total_rows": self.total_rows,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1),
+            "finished": self.finished,
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name} [{self.run_key}] id {self.last_id}/{self.max_id}, {self.rows} rows "
+            f"in {self.seconds:.1f}s ({self.rows_per_second:.0f} rows/s), {self.total_rows} rows this run"
+            f"{', finished' if self.finished else ''}"
+        )
+
+
+def _checkpoint(db: Session, name: str, run_key: str) -> JobCheckpointModel:
+    """Checkpoint of the run, a new run key starts over from the first id"""
+    checkpoint = db.get(JobCheckpointModel, name, with_for_update=True)
+    if checkpoint is None:
+        checkpoint = JobCheckpointModel(name=name, run_key=run_key, last_id=0, rows=0)
+        db.add(checkpoint)
+    elif checkpoint.run_key != run_key:
+        checkpoint.run_key = run_key
+        checkpoint.last_id = 0
+        checkpoint.rows = 0
+        checkpoint.started_at = datetime.now()
+        checkpoint.finished_at = None
+    return checkpoint
+
+
+def unfinished_run_key(db: Session, name: str) -> Optional[str]:
+    """Run key of the job's current run if it has not finished yet"""
+    checkpoint = db.get(JobCheckpointModel, name)
+    if checkpoint is None or checkpoint.finished_at is not None:
+        return None
+    return checkpoint.run_key
+
+
+def run_in_pk_ranges(
+    db: Session,
+    name: str,
+    run_key: str,
+    pk_column,
+    apply_range: Callable[[Session, int, int], int],
+    chunk_size: int = Constants.job_chunk_size,
+    max_seconds: Optional[float] = None,
+    report: Callable[[JobProgress], None] = lambda progress: logging.info(str(progress)),
+) -> JobProgress:
+    """Call ``apply_range(db, after_id, up_to_id)`` per range until done or out of time
+
+    Each range is committed with the checkpoint, so a range is applied exactly
+    once per run key. ``apply_range`` returns the rows it changed.
+    """
+    started = time.perf_counter()
+    checkpoint = _checkpoint(db, name, run_key)
+    max_id = db.scalar(select(func.max(pk_column))) or 0
+    db.commit()
+
+    rows = 0
+    while True:
+        # Re-read under lock, a concurrent run of the same job waits here and continues after our range
+        db.refresh(checkpoint, with_for_update=True)
+        if checkpoint.finished_at is not None:
+            break
+        after_id = checkpoint.last_id
+        if after_id >= max_id:
+            checkpoint.finished_at = datetime.now()
+            db.flush()
+            break
+
+        up_to_id = min(after_id + chunk_size, max_id)
+        changed = apply_range(db, after_id, up_to_id)
+        checkpoint.last_id = up_to_id
+        checkpoint.rows += changed
+        rows += changed
+        progress = JobProgress(checkpoint, max_id, rows, time.perf_counter() - started)
+        db.commit()
+        report(progress)
+
+        if max_seconds is not None and time.perf_counter() - started >= max_seconds:
+            break
+
+    progress = JobProgress(checkpoint, max_id, rows, time.perf_counter() - started)
+    db.commit()
+    return progress
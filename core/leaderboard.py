@@ -0,0 +1,108 @@
+"""
+Leaderboard Tables
+
+The rankings read denormalized tables holding one aggregated row per ranked
+key (``point_leaderboard`` per user, ``referral_count`` per sender) instead of
+aggregating the source table on every request. All of them are kept the same
+way, described by an ``Aggregate``:
+
+- writers re-aggregate the keys they touched from the source table with one
+  ``INSERT ... SELECT`` upsert (``refresh``) before they commit
+- keys without any source row left lose their row
+- ``rebuild`` recomputes the whole table after drift, ``main`` runs it from the
+  command line
+"""
+
+import argparse
+import logging
+from typing import Callable, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from core.upsert import overwrite, upsert_statement
+
+
+class Aggregate(NamedTuple):
+    """A leaderboard table and the source it is aggregated from"""
+
+    model: type
+    # Insert columns of ``model``, the key column first
+    columns: List[str]
+    # Aggregated rows in ``columns`` order, only for the given keys unless None
+    query: Callable
+    # Key column of the source table
+    source_key: object
+
+    @property
+    def key(self):
+        return getattr(self.model, self.columns[0])
+
+
+def _keys(keys: Iterable[int]) -> List[int]:
+    return sorted({key for key in keys if key})
+
+
+def upsert_rows(dialect_name: str, aggregate: Aggregate, keys: Optional[List[int]] = None):
+    """INSERT ... SELECT of the aggregated rows, overwriting existing ones"""
+    return upsert_statement(
+        dialect_name,
+        aggregate.model,
+        aggregate.columns[:1],
+        overwrite(*aggregate.columns[1:]),
+        source=aggregate.query(keys),
+        columns=aggregate.columns,
+    )
+
+
+def stale_rows_delete(aggregate: Aggregate, keys: List[int]):
+    """Drop the rows of keys that no longer have any source row"""
+    return (
+        delete(aggregate.model)
+        .where(aggregate.key.in_(keys))
+        .where(aggregate.key.not_in(select(aggregate.source_key).where(aggregate.source_key.in_(keys))))
+    )
+
+
+def refresh(db: Session, aggregate: Aggregate, keys: Iterable[int]) -> None:
+    """Re-aggregate the given keys (caller commits)"""
+    keys = _keys(keys)
+    if not keys:
+        return
+    db.execute(upsert_rows(db.get_bind().dialect.name, aggregate, keys))
+    db.execute(stale_rows_delete(aggregate, keys))
+
+
+async def refresh_async(db: AsyncSession, aggregate: Aggregate, keys: Iterable[int]) -> None:
+    """Async variant of refresh (caller commits)"""
+    keys = _keys(keys)
+    if not keys:
+        return
+    await db.execute(upsert_rows(db.get_bind().dialect.name, aggregate, keys))
+    await db.execute(stale_rows_delete(aggregate, keys))
+
+
+def rebuild(db: Session, aggregate: Aggregate) -> int:
+    """Rebuild the whole table from the source table, return its row count"""
+    db.execute(delete(aggregate.model))
+    db.execute(upsert_rows(db.get_bind().dialect.name, aggregate))
+    db.commit()
+    return db.scalar(select(func.count()).select_from(aggregate.model))
+
+
+def main(aggregate: Aggregate, description: str):
+    """Leaderboard maintenance command"""
+    from core.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, aggregate)
+        logging.info(f"Rebuilt {aggregate.model.__tablename__} with {rows} rows")
+    finally:
+        db.close()
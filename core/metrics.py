@@ -0,0 +1,53 @@
+"""
+Operational Metrics Routes
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core import database, request_stats, singleflight
+
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _pool_lines() -> str:
+    lines = [
+        "# HELP db_pool_connections Connections of the engine pools by state.",
+        "# TYPE db_pool_connections gauge",
+    ]
+    pools = {
+        "sync": database.engine.pool,
+        "async": database.async_engine.sync_engine.pool,
+    }
+    for name, pool in pools.items():
+        status = database.pool_status(pool)
+        for state in ("checked_in", "checked_out", "overflow"):
+            if state not in status:
+                continue
+            lines.append(f'db_pool_connections{{pool="{name}",state="{state}"}} {status[state]}')
+    return "\n".join(lines) + "\n"
+
+
+@router.get("", response_class=PlainTextResponse)
+def get_prometheus_metrics():
+    """Per-route latency and DB usage, plus pool occupancy, in the Prometheus text format"""
+    return PlainTextResponse(
+        request_stats.metrics.render() + _pool_lines(), media_type=PROMETHEUS_CONTENT_TYPE
+    )
+
+
+@router.get("/pool")
+def get_pool_metrics():
+    """Connection pool occupancy and checkout wait counters"""
+    return {
+        "sync": database.pool_status(database.engine.pool),
+        "async": database.pool_status(database.async_engine.sync_engine.pool),
+    }
+
+
+@router.get("/singleflight")
+def get_singleflight_metrics():
+    """Calls run and requests deduplicated per coalescing group"""
+    return singleflight.stats()
@@ -0,0 +1,75 @@
+"""
+Keyset Pagination
+
+List endpoints seek on the primary key (``WHERE id > :last_id ORDER BY id``)
+so every page costs the same as the first one. The cursor handed to clients
+is opaque, the next one is returned in the ``X-Next-Cursor`` response header
+so the list response bodies keep their shape.
+
+Every list endpoint pages the same way: without a cursor (or with an empty
+one) the page starts ``skip`` rows in, with a cursor it starts right after the
+cursor's id and ``skip`` is ignored. Whenever more rows follow, the response
+carries the cursor of the next page, whether or not the request had one.
+"""
+import base64
+import binascii
+import json
+from operator import attrgetter
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from fastapi import HTTPException, status
+
+from core.serialization import ORJSONResponse
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Page(NamedTuple):
+    items: List[Any]
+    next_cursor: Optional[str]
+
+
+def encode_cursor(last_id: int) -> str:
+    """Opaque cursor pointing right after the given id"""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Id encoded in a cursor, 400 if the cursor was not issued by encode_cursor"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+        if not isinstance(last_id, int):
+            raise ValueError(last_id)
+        return last_id
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def paginate(query, id_column, skip: int, limit: int, after_id: Optional[int] = None):
+    """Order by id and seek past after_id (or skip rows without it), fetching one extra row"""
+    query = query.order_by(id_column)
+    if after_id is not None:
+        query = query.where(id_column > after_id)
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit + 1)
+
+
+def page_of(rows: List[Any], limit: int, id_of: Callable[[Any], int] = attrgetter("id")) -> Page:
+    """Trim the extra row fetched by paginate and derive the next cursor"""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return Page(rows, encode_cursor(id_of(rows[-1])))
+    return Page(rows, None)
+
+
+def page_response(page: Optional[Page]) -> ORJSONResponse:
+    """Render the page items with the next cursor header, skipping response_model re-validation"""
+    if page is None:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to load page")
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+    return ORJSONResponse(page.items, headers=headers)
@@ -0,0 +1,107 @@
+"""
+Query Profiler
+
+Engine event hooks that catch the two ways a route quietly gets expensive:
+
+* slow statements, logged with their EXPLAIN plan once they take longer than
+  ``SLOW_QUERY_MS``. The plan costs one more round trip on the same connection,
+  only paid by statements that were already slow. Streamed results
+  (``stream_results``, an unbuffered server side cursor) still hold the
+  connection, so they are logged without a plan.
+* N+1 loads, the same statement text run more than ``N_PLUS_ONE_THRESHOLD``
+  times inside one request (lazy loads in a loop)
+
+With ``PROFILER_STRICT`` set (tests, local dev) an N+1 raises ``NPlusOneError``
+instead of only being logged. Statements outside a request, e.g. CLI jobs, are
+only checked for slowness.
+"""
+import logging
+import time
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from core.constants import Constants
+from core.explain import is_full_scan
+from core.request_stats import current_db_stats
+
+
+class NPlusOneError(RuntimeError):
+    """A statement repeated past the N+1 threshold within one request"""
+
+
+def _explain(conn, statement: str, parameters) -> Optional[List[str]]:
+    """Plan of an already executed SELECT, on a separate cursor of the same connection"""
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        if conn.dialect.name == "sqlite":
+            return [str(row[-1]) for row in cursor.fetchall()]
+        columns = [column[0] for column in cursor.description]
+        return [" ".join(f"{key}={value}" for key, value in zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class QueryProfiler:
+    """Slow query and N+1 detection for an engine"""
+
+    def __init__(self, slow_query_ms: float, n_plus_one_threshold: int, strict: bool = False):
+        self.slow_query_ms = slow_query_ms
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.strict = strict
+
+    def attach(self, engine: Engine) -> None:
+        if event.contains(engine, "before_cursor_execute", self._before_cursor_execute):
+            return
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def detach(self, engine: Engine) -> None:
+        event.remove(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.remove(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_start_time", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed_ms = (time.perf_counter() - conn.info["profiler_start_time"].pop()) * 1000
+
+        if elapsed_ms >= self.slow_query_ms:
+            streamed = context is not None and context.execution_options.get("stream_results", False)
+            self._log_slow_query(conn, statement, parameters, elapsed_ms, executemany or streamed)
+
+        db_stats = current_db_stats()
+        if db_stats is None:
+            return
+        count = db_stats.statement_counts.get(statement, 0) + 1
+        db_stats.statement_counts[statement] = count
+        # Reported once per statement and request, on the first execution past the threshold
+        if count == self.n_plus_one_threshold + 1:
+            message = f"N+1 suspected, statement ran {count} times in one request: {statement}"
+            if self.strict:
+                raise NPlusOneError(message)
+            logging.warning(message)
+
+    def _log_slow_query(self, conn, statement, parameters, elapsed_ms, skip_plan):
+        plan = None
+        if not skip_plan and statement.lstrip().upper().startswith("SELECT"):
+            try:
+                plan = _explain(conn, statement, parameters)
+            except Exception as e:
+                logging.error(f"EXPLAIN of slow query failed: {e}")
+
+        full_scan = bool(plan) and is_full_scan(conn.dialect.name, plan)
+        logging.warning(
+            f"Slow query {elapsed_ms:.1f}ms{' (full scan)' if full_scan else ''}: {statement} "
+            f"params={parameters!r}" + ("".join(f"\n    {line}" for line in plan) if plan else "")
+        )
+
+
+profiler = QueryProfiler(
+    Constants.slow_query_ms,
+    Constants.n_plus_one_threshold,
+    strict=Constants.profiler_strict,
+)
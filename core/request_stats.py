@@ -0,0 +1,210 @@
+"""
+Request Statistics
+
+Per-route latency histograms plus the SQL statements, DB time and rows each
+request spent, collected through engine cursor events into a context variable
+that follows the request into FastAPI's worker threads. Rendered in the
+Prometheus text format by ``GET /metrics``.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+
+class DBStats:
+    """SQL work of one request"""
+
+    __slots__ = ("statements", "db_seconds", "rows", "statement_counts")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        # Executions per statement text, read by the N+1 detector
+        self.statement_counts: Dict[str, int] = {}
+
+
+_current: ContextVar[Optional[DBStats]] = ContextVar("request_db_stats", default=None)
+
+
+def current_db_stats() -> Optional[DBStats]:
+    """Stats of the request being served, None outside of a request"""
+    return _current.get()
+
+
+@contextmanager
+def collecting() -> Iterator[DBStats]:
+    """Collect the DB stats of a block as if it was one request (tests, scripts)"""
+    db_stats = DBStats()
+    token = _current.set(db_stats)
+    try:
+        yield db_stats
+    finally:
+        _current.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.db_seconds += time.perf_counter() - started
+    # Buffered drivers (pymysql, aiomysql) report the fetched row count, sqlite reports -1
+    if cursor.rowcount and cursor.rowcount > 0 and cursor.description is not None:
+        stats.rows += cursor.rowcount
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count statements, DB time and rows of every request on this engine"""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+
+class RouteStats:
+    """Everything recorded for one method and route template"""
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.responses: Dict[int, int] = {}
+        self.db_seconds = 0.0
+        self.rows = 0
+
+
+class RequestMetrics:
+    """Thread safe registry of the per-route stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], RouteStats] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float, db_stats: DBStats):
+        with self._lock:
+            stats = self._routes.get((method, route))
+            if stats is None:
+                stats = self._routes[(method, route)] = RouteStats()
+            stats.latency.observe(seconds)
+            stats.statements.observe(db_stats.statements)
+            stats.responses[status] = stats.responses.get(status, 0) + 1
+            stats.db_seconds += db_stats.db_seconds
+            stats.rows += db_stats.rows
+
+    def render(self) -> str:
+        """Prometheus text exposition of every route"""
+        lines: List[str] = []
+        with self._lock:
+            routes = sorted(self._routes.items())
+
+            lines += [
+                "# HELP http_requests_total Requests served, by route and status.",
+                "# TYPE http_requests_total counter",
+            ]
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.responses.items()):
+                    lines.append(f'http_requests_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+            lines += _histogram_lines(
+                "http_request_duration_seconds", "Request latency in seconds.",
+                [(key, stats.latency) for key, stats in routes],
+            )
+            lines += _histogram_lines(
+                "db_statements_per_request", "SQL statements executed per request.",
+                [(key, stats.statements) for key, stats in routes],
+            )
+
+            lines += [
+                "# HELP db_seconds_total Time spent in SQL statements.",
+                "# TYPE db_seconds_total counter",
+            ]
+            for (method, route), stats in routes:
+                lines.append(f'db_seconds_total{{method="{method}",route="{route}"}} {stats.db_seconds:.6f}')
+
+            lines += [
+                "# HELP db_rows_total Rows fetched by SQL statements.",
+                "# TYPE db_rows_total counter",
+            ]
+            for (method, route), stats in routes:
+                lines.append(f'db_rows_total{{method="{method}",route="{route}"}} {stats.rows}')
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, help_text: str, series) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (method, route), histogram in series:
+        labels = f'method="{method}",route="{route}"'
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+metrics = RequestMetrics()
+
+
+class RequestStatsMiddleware:
+    """ASGI middleware timing each request and collecting its DB stats"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with collecting() as db_stats:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                # The router stores the matched route on the scope, keep the template not the raw path
+                route = scope.get("route")
+                metrics.observe(
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    status_code,
+                    time.perf_counter() - started,
+                    db_stats,
+                )
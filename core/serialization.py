@@ -0,0 +1,40 @@
+"""
+Response Serialization
+
+Shared helpers to turn ORM rows into responses cheaply: one Singapore timezone
+object for every timestamp, a datetime type that converts on validation so
+``from_attributes`` schemas can be built with ``model_validate`` straight from
+the rows, and an orjson response class. Routes that return an
+``ORJSONResponse`` themselves skip FastAPI's second ``response_model`` pass.
+"""
+from datetime import datetime
+from typing import Annotated, Any, Optional
+
+import orjson
+import pytz
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+from pydantic import AfterValidator, BaseModel
+
+SGT = pytz.timezone('Asia/Singapore')
+
+
+def to_sgt(value: Optional[datetime]) -> Optional[datetime]:
+    """Singapore time of a stored (server local) timestamp, None stays None"""
+    return value.astimezone(SGT) if value else None
+
+
+# Timestamp rendered in Singapore time, whichever zone the value came in
+SGTDateTime = Annotated[datetime, AfterValidator(to_sgt)]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """orjson response that also renders pydantic models as they are"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,152 @@
+"""
+Request Coalescing
+
+Concurrent identical reads share one in-flight call: the first caller of a key
+runs the service function, the others wait for its result instead of issuing
+the same query. Waiting is bounded; a follower that gives up runs the call
+itself. Routes opt in by wrapping their service call in a named group:
+
+    point_ranking_flight = singleflight.group("point_ranking")
+    return point_ranking_flight.do(user_id, lambda: service.get_point_ranking(user_id, db))
+"""
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Union
+
+from core.constants import Constants
+
+
+class FlightStats:
+    """Counters of a coalescing group"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.deduplicated = 0
+        self.wait_timeouts = 0
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "deduplicated": self.deduplicated,
+                "wait_timeouts": self.wait_timeouts,
+            }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls of sync functions across worker threads"""
+
+    def __init__(self, wait_seconds: float):
+        self.wait_seconds = wait_seconds
+        self.stats = FlightStats()
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(self.wait_seconds):
+                self.stats.count("wait_timeouts")
+                return fn()
+            self.stats.count("deduplicated")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        self.stats.count("leaders")
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """Coalesces concurrent awaits of coroutine functions on the event loop"""
+
+    def __init__(self, wait_seconds: float):
+        self.wait_seconds = wait_seconds
+        self.stats = FlightStats()
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is None:
+            return await self._lead(key, fn)
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.wait_seconds)
+        except asyncio.TimeoutError:
+            self.stats.count("wait_timeouts")
+            return await fn()
+        except asyncio.CancelledError:
+            # The leader's request was cancelled, not ours
+            if not future.cancelled():
+                raise
+            return await fn()
+        self.stats.count("deduplicated")
+        return result
+
+    async def _lead(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.stats.count("leaders")
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark it retrieved, followers re-raise it and nobody else has to
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
+
+
+_groups: Dict[str, Union[SingleFlight, AsyncSingleFlight]] = {}
+
+
+def group(name: str, wait_seconds: float = Constants.singleflight_wait_seconds) -> SingleFlight:
+    """Named coalescing group for sync routes"""
+    _groups[name] = SingleFlight(wait_seconds)
+    return _groups[name]
+
+
+def async_group(name: str, wait_seconds: float = Constants.singleflight_wait_seconds) -> AsyncSingleFlight:
+    """Named coalescing group for async routes"""
+    _groups[name] = AsyncSingleFlight(wait_seconds)
+    return _groups[name]
+
+
+def stats() -> dict:
+    """Counters of every group"""
+    return {name: flight.stats.snapshot() for name, flight in _groups.items()}
@@ -0,0 +1,77 @@
+"""
+Upserts
+
+One INSERT that either creates a row or lands on the row its unique key already
+points at, instead of a SELECT for the key followed by an INSERT that two
+concurrent requests can both get past:
+
+    point = upsert(db, PointModel, values, ["user_id"])
+
+MySQL/TiDB run ``INSERT ... ON DUPLICATE KEY UPDATE``, SQLite (tests)
+``INSERT ... ON CONFLICT DO UPDATE``. Columns listed in ``update_columns`` take
+the new values on conflict, every other column of an existing row is kept.
+"""
+from typing import Callable, List, Optional, Sequence
+
+from sqlalchemy import func, inspect, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import Session
+
+
+def overwrite(*columns: str) -> Callable:
+    """Assignments taking the proposed value of each column on conflict"""
+    return lambda proposed: {column: proposed[column] for column in columns}
+
+
+def upsert_statement(
+    dialect_name: str,
+    target,
+    conflict_columns: Sequence[str],
+    set_: Callable,
+    values: Optional[dict] = None,
+    source=None,
+    columns: Optional[List[str]] = None,
+):
+    """INSERT (of ``values`` or ``columns`` from ``source``) updating the existing row on conflict
+
+    ``set_`` gets the proposed row (``excluded`` / ``VALUES()``) and returns the
+    assignments applied to the existing row. MySQL resolves the conflict on any
+    unique key of the table, ``conflict_columns`` are for SQLite.
+    """
+    insert = sqlite.insert if dialect_name == "sqlite" else mysql.insert
+    stmt = insert(target)
+    stmt = stmt.from_select(columns, source) if source is not None else stmt.values(**values)
+    if dialect_name == "sqlite":
+        return stmt.on_conflict_do_update(index_elements=list(conflict_columns), set_=set_(stmt.excluded))
+    return stmt.on_duplicate_key_update(set_(stmt.inserted))
+
+
+def upsert(db: Session, model, values: dict, conflict_columns: Sequence[str], update_columns: Sequence[str] = ()):
+    """Insert a row or update the one behind ``conflict_columns``, return it loaded (caller commits)
+
+    On MySQL a collision on another unique key of the table lands on that row
+    instead, callers of tables with several unique keys check the returned row.
+    """
+    dialect_name = db.get_bind().dialect.name
+    table = model.__table__
+    pk = inspect(model).primary_key[0]
+
+    def assignments(proposed) -> dict:
+        updates = {column: proposed[column] for column in update_columns}
+        if dialect_name == "sqlite":
+            # DO UPDATE rather than DO NOTHING so RETURNING yields an existing row too
+            return updates or {pk.name: pk}
+        # LAST_INSERT_ID(id) hands the id of an existing row back as lastrowid
+        return {pk.name: func.last_insert_id(pk), **updates}
+
+    stmt = upsert_statement(dialect_name, table, conflict_columns, assignments, values=values)
+    if dialect_name == "sqlite":
+        return db.scalars(
+            select(model)
+            .from_statement(stmt.returning(*table.c))
+            .execution_options(populate_existing=True)
+        ).one()
+
+    # No RETURNING on MySQL/TiDB, the row is read back by primary key
+    row_id = db.execute(stmt).lastrowid
+    return db.get(model, row_id, populate_existing=True)
@@ -13,7 +13,11 @@ from app.social_media.api.v1 import social_media
 from app.game_character.api.v1 import game_character
 from app.record.api.v1 import record # FIXME
 
-from core import config, database
+from core import config, database, metrics, request_stats
+from core.profiler import profiler
+from core.pagination import NEXT_CURSOR_HEADER
+from core.request_stats import RequestStatsMiddleware
+from core.serialization import ORJSONResponse
 
 
 app = FastAPI(
@@ -23,6 +27,7 @@ app = FastAPI(
     docs_url="/docs",
     openapi_url="/openapi.json",
     redoc_url=None,
+    default_response_class=ORJSONResponse,
 )
 
 origins = [
@@ -38,7 +43,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
+app.add_middleware(RequestStatsMiddleware)
+request_stats.instrument_engine(database.engine)
+request_stats.instrument_engine(database.async_engine.sync_engine)
+profiler.attach(database.engine)
+profiler.attach(database.async_engine.sync_engine)
 
 
 # * CORS // FIXME: handle the cors on prod
@@ -74,6 +85,7 @@ app.include_router(friend.router)
 app.include_router(activity.router)
 app.include_router(social_media.router)
 app.include_router(game_character.router)
+app.include_router(metrics.router)
 #app.include_router(record.router) # FIXME
 
 
@@ -15,6 +15,7 @@ from app.friend import models
 from app.point import models
 from app.activity import models
 from app.social_media import models
+from core import jobs
 
 
 load_dotenv()
@@ -0,0 +1,69 @@
+"""lookup indexes
+
+Adds the indexes behind the service lookups and drops the unique indexes that
+duplicated every primary key. Tables created by ``Base.metadata.create_all``
+already match the models, so each step checks the live schema first.
+
+Revision ID: 3607f188e52e
+Revises: 23a0b041f23a
+Create Date: 2026-10-18 10:12:41.507213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3607f188e52e'
+down_revision: Union[str, None] = '23a0b041f23a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LOOKUP_INDEXES = (
+    ("ix_friend_sender_claimed", "friend", ["sender_id", "has_claimed"]),
+    ("ix_friend_receiver_status", "friend", ["receiver_id", "status"]),
+    ("ix_point_user_id", "point", ["user_id"]),
+    ("ix_game_character_user_id", "game_character", ["user_id"]),
+    ("ix_user_wallet_address", "user", ["wallet_address"]),
+)
+
+# Declared through primary_key=True, unique=True, index=True
+REDUNDANT_PK_INDEXES = (
+    ("ix_user_id", "user"),
+    ("ix_friend_id", "friend"),
+    ("ix_point_id", "point"),
+    ("ix_activity_id", "activity"),
+    ("ix_social_media_id", "social_media"),
+    ("ix_game_character_id", "game_character"),
+    ("ix_game_character_stats_id", "game_character_stats"),
+)
+
+
+def _index_names(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table, columns in LOOKUP_INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+
+    for name, table in REDUNDANT_PK_INDEXES:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    for name, table in REDUNDANT_PK_INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, ["id"], unique=True)
+
+    for name, table, columns in LOOKUP_INDEXES:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
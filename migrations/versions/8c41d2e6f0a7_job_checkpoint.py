@@ -0,0 +1,42 @@
+"""job checkpoint
+
+Adds the table the maintenance jobs record their progress in. Skipped when
+``Base.metadata.create_all`` already created it.
+
+Revision ID: 8c41d2e6f0a7
+Revises: 3607f188e52e
+Create Date: 2026-10-18 23:41:07.118302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c41d2e6f0a7'
+down_revision: Union[str, None] = '3607f188e52e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("job_checkpoint"):
+        return
+    op.create_table(
+        "job_checkpoint",
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("run_key", sa.String(length=100), nullable=False),
+        sa.Column("last_id", sa.Integer(), nullable=False),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("job_checkpoint"):
+        op.drop_table("job_checkpoint")
@@ -0,0 +1,56 @@
+"""referral count
+
+Creates ``referral_count`` and fills it from the friend table in one
+``INSERT ... SELECT``, so the referral ranking counts every sender from the
+first request after the deploy. Senders that already hold a row
+(``create_all``, a manual rebuild) keep it.
+
+Revision ID: a4e9c2d7b613
+Revises: f3a8d61c2b70
+Create Date: 2026-10-20 14:02:51.190274
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e9c2d7b613'
+down_revision: Union[str, None] = 'f3a8d61c2b70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("referral_count"):
+        op.create_table(
+            "referral_count",
+            sa.Column("sender_id", sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column("referral_count", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["sender_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("sender_id"),
+        )
+        op.create_index("ix_referral_count_rank", "referral_count", ["referral_count", "sender_id"])
+
+    # Same counts as app.friend.leaderboard._count_query, timestamps in the app's local time
+    op.get_bind().execute(
+        sa.text(
+            "INSERT INTO referral_count (sender_id, referral_count, updated_at) "
+            "SELECT sender_id, COUNT(id), :now "
+            "FROM friend "
+            "WHERE sender_id IS NOT NULL "
+            "AND sender_id NOT IN (SELECT sender_id FROM referral_count) "
+            "GROUP BY sender_id"
+        ),
+        {"now": datetime.now()},
+    )
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("referral_count"):
+        op.drop_table("referral_count")
@@ -0,0 +1,75 @@
+"""upsert unique keys
+
+Adds the unique indexes the create services upsert on. ``ux_point_user_id``
+replaces the plain ``ix_point_user_id`` and ``ux_game_character_user_name``,
+led by ``user_id``, the plain ``ix_game_character_user_id`` (created first,
+the user foreign key needs an index at all times). Tables holding duplicates of a new key stop the
+upgrade, merge those rows before running it again.
+
+Revision ID: b5d93e27c1f4
+Revises: 8c41d2e6f0a7
+Create Date: 2026-10-19 09:27:53.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d93e27c1f4'
+down_revision: Union[str, None] = '8c41d2e6f0a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+UNIQUE_KEYS = (
+    ("ux_point_user_id", "point", ["user_id"]),
+    ("ux_friend_pair", "friend", ["sender_id", "receiver_id"]),
+    ("ux_game_character_user_name", "game_character", ["user_id", "first_name", "last_name"]),
+)
+
+# Plain indexes a unique key makes redundant
+REPLACED_INDEXES = (
+    ("ix_point_user_id", "point", ["user_id"]),
+    ("ix_game_character_user_id", "game_character", ["user_id"]),
+)
+
+
+def _index_names(table: str) -> set:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return set()
+    return {index["name"] for index in inspector.get_indexes(table)}
+
+
+def _duplicate_keys(table: str, columns: list) -> int:
+    key = ", ".join(columns)
+    return op.get_bind().execute(
+        sa.text(f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} GROUP BY {key} HAVING COUNT(*) > 1) duplicates")
+    ).scalar()
+
+
+def upgrade() -> None:
+    for name, table, columns in UNIQUE_KEYS:
+        if name in _index_names(table):
+            continue
+        duplicates = _duplicate_keys(table, columns)
+        if duplicates:
+            raise RuntimeError(f"{table} holds {duplicates} duplicated ({', '.join(columns)}) keys, merge them before adding {name}")
+        op.create_index(name, table, columns, unique=True)
+
+    for name, table, _ in REPLACED_INDEXES:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    for name, table, columns in REPLACED_INDEXES:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+
+    for name, table, _ in UNIQUE_KEYS:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
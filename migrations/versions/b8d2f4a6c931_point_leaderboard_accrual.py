@@ -0,0 +1,56 @@
+"""point leaderboard accrual
+
+Copies ``extra_profit_per_hour`` and ``last_accrued_at`` of the point rows to
+``point_leaderboard``, so the ranking adds the passive income accrued since
+the last materialization to the stored totals. The point writers keep them
+current with the totals from then on.
+
+Revision ID: b8d2f4a6c931
+Revises: e5b7a9c3f182
+Create Date: 2026-10-21 17:48:02.615390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d2f4a6c931'
+down_revision: Union[str, None] = 'e5b7a9c3f182'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _leaderboard_columns() -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("point_leaderboard")}
+
+
+def upgrade() -> None:
+    columns = _leaderboard_columns()
+    if "extra_profit_per_hour" not in columns:
+        op.add_column(
+            "point_leaderboard",
+            sa.Column("extra_profit_per_hour", sa.Integer(), nullable=False, server_default="0"),
+        )
+    if "last_accrued_at" not in columns:
+        op.add_column("point_leaderboard", sa.Column("last_accrued_at", sa.DateTime(), nullable=True))
+
+    # Same values as app.point.leaderboard.total_query
+    op.get_bind().execute(
+        sa.text(
+            "UPDATE point_leaderboard SET "
+            "extra_profit_per_hour = COALESCE((SELECT MAX(extra_profit_per_hour) FROM point "
+            "WHERE point.user_id = point_leaderboard.user_id), 0), "
+            "last_accrued_at = (SELECT MAX(last_accrued_at) FROM point "
+            "WHERE point.user_id = point_leaderboard.user_id)"
+        )
+    )
+
+
+def downgrade() -> None:
+    columns = _leaderboard_columns()
+    for name in ("last_accrued_at", "extra_profit_per_hour"):
+        if name in columns:
+            op.drop_column("point_leaderboard", name)
@@ -0,0 +1,73 @@
+"""friend pair key
+
+Replaces ``ux_friend_pair`` (``sender_id, receiver_id``) with
+``ux_friend_users`` on the pair ordered by id, so a friendship and its reverse
+share one key and ``create_friend`` no longer looks the reverse up first. The
+ordered ids are virtual generated columns, nothing is rewritten. A friend table
+holding both directions of a pair stops the upgrade, merge those rows before
+running it again.
+
+Revision ID: c6f1e8a2d947
+Revises: a4e9c2d7b613
+Create Date: 2026-10-21 10:36:18.524907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f1e8a2d947'
+down_revision: Union[str, None] = 'a4e9c2d7b613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+PAIR_COLUMNS = (
+    ("low_user_id", "CASE WHEN sender_id < receiver_id THEN sender_id ELSE receiver_id END"),
+    ("high_user_id", "CASE WHEN sender_id < receiver_id THEN receiver_id ELSE sender_id END"),
+)
+
+
+def _friend_columns() -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("friend")}
+
+
+def _index_names() -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("friend")}
+
+
+def upgrade() -> None:
+    columns = _friend_columns()
+    for name, expression in PAIR_COLUMNS:
+        if name not in columns:
+            op.add_column("friend", sa.Column(name, sa.Integer(), sa.Computed(expression, persisted=False)))
+
+    indexes = _index_names()
+    if "ux_friend_users" not in indexes:
+        duplicates = op.get_bind().execute(
+            sa.text(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM friend GROUP BY low_user_id, high_user_id "
+                "HAVING COUNT(*) > 1) duplicates"
+            )
+        ).scalar()
+        if duplicates:
+            raise RuntimeError(f"friend holds {duplicates} pairs linked in both directions, merge them before adding ux_friend_users")
+        op.create_index("ux_friend_users", "friend", ["low_user_id", "high_user_id"], unique=True)
+    if "ux_friend_pair" in indexes:
+        op.drop_index("ux_friend_pair", table_name="friend")
+
+
+def downgrade() -> None:
+    indexes = _index_names()
+    if "ux_friend_pair" not in indexes:
+        op.create_index("ux_friend_pair", "friend", ["sender_id", "receiver_id"], unique=True)
+    if "ux_friend_users" in indexes:
+        op.drop_index("ux_friend_users", table_name="friend")
+
+    columns = _friend_columns()
+    for name, _ in reversed(PAIR_COLUMNS):
+        if name in columns:
+            op.drop_column("friend", name)
@@ -0,0 +1,45 @@
+"""point ledger
+
+Adds the append-only ``point_ledger`` table recording every point change.
+Skipped where ``Base.metadata.create_all`` already created it. A downgrade
+drops the recorded history, the point rows keep their amounts.
+
+Revision ID: d1a6f4c83e92
+Revises: b5d93e27c1f4
+Create Date: 2026-10-19 14:05:38.921470
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1a6f4c83e92'
+down_revision: Union[str, None] = 'b5d93e27c1f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table("point_ledger"):
+        op.create_table(
+            "point_ledger",
+            sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("login_amount", sa.Integer(), nullable=False),
+            sa.Column("referral_amount", sa.Integer(), nullable=False),
+            sa.Column("extra_profit_per_hour", sa.Integer(), nullable=False),
+            sa.Column("reason", sa.String(length=50), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.Column("custom_logs", sa.JSON(), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_point_ledger_user_id", "point_ledger", ["user_id", "id"])
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("point_ledger"):
+        op.drop_table("point_ledger")
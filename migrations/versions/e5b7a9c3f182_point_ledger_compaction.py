@@ -0,0 +1,50 @@
+"""point ledger compaction
+
+Adds ``point_ledger.compacted`` and the ``ix_point_ledger_pending`` index for
+the append-only point updates (app.point.ledger). Every existing entry was
+written together with its point row, so all of them are marked compacted. A
+downgrade drops the column, run a compaction first so no pending entry is left
+out of the point rows.
+
+Revision ID: e5b7a9c3f182
+Revises: c6f1e8a2d947
+Create Date: 2026-10-21 15:12:44.306815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b7a9c3f182'
+down_revision: Union[str, None] = 'c6f1e8a2d947'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _ledger_columns() -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("point_ledger")}
+
+
+def _index_names() -> set:
+    return {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("point_ledger")}
+
+
+def upgrade() -> None:
+    if "compacted" not in _ledger_columns():
+        op.add_column(
+            "point_ledger",
+            sa.Column("compacted", sa.Boolean(), nullable=False, server_default=sa.false()),
+        )
+        op.get_bind().execute(sa.text("UPDATE point_ledger SET compacted = :compacted"), {"compacted": True})
+    if "ix_point_ledger_pending" not in _index_names():
+        op.create_index("ix_point_ledger_pending", "point_ledger", ["compacted", "user_id"])
+
+
+def downgrade() -> None:
+    if "ix_point_ledger_pending" in _index_names():
+        op.drop_index("ix_point_ledger_pending", table_name="point_ledger")
+    if "compacted" in _ledger_columns():
+        op.drop_column("point_ledger", "compacted")
@@ -0,0 +1,50 @@
+"""point accrual
+
+Adds ``point.profit_amount`` and ``point.last_accrued_at`` for the lazy
+passive income accrual. Existing rows start accruing at the upgrade, nothing is
+credited for the time before it. Skipped where ``Base.metadata.create_all``
+already created the columns.
+
+Revision ID: e7c20b9a4d15
+Revises: d1a6f4c83e92
+Create Date: 2026-10-19 17:12:44.306851
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c20b9a4d15'
+down_revision: Union[str, None] = 'd1a6f4c83e92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _point_columns() -> set:
+    return {column["name"] for column in sa.inspect(op.get_bind()).get_columns("point")}
+
+
+def upgrade() -> None:
+    columns = _point_columns()
+    if "profit_amount" not in columns:
+        op.add_column("point", sa.Column("profit_amount", sa.Integer(), server_default="0", nullable=False))
+    if "last_accrued_at" not in columns:
+        op.add_column("point", sa.Column("last_accrued_at", sa.DateTime(), nullable=True))
+        # The app reads the column against its own clock (datetime.now()), not the
+        # database session's time zone
+        op.get_bind().execute(
+            sa.text("UPDATE point SET last_accrued_at = :now WHERE last_accrued_at IS NULL"),
+            {"now": datetime.now()},
+        )
+
+
+def downgrade() -> None:
+    columns = _point_columns()
+    if "last_accrued_at" in columns:
+        op.drop_column("point", "last_accrued_at")
+    if "profit_amount" in columns:
+        op.drop_column("point", "profit_amount")
@@ -0,0 +1,56 @@
+"""point leaderboard
+
+Creates ``point_leaderboard`` and fills it from the point table in one
+``INSERT ... SELECT``, so every user ranks from the first request after the
+deploy. Users that already hold a leaderboard row (``create_all``, a manual
+rebuild) keep it.
+
+Revision ID: f3a8d61c2b70
+Revises: e7c20b9a4d15
+Create Date: 2026-10-20 10:31:08.553417
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d61c2b70'
+down_revision: Union[str, None] = 'e7c20b9a4d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table("point_leaderboard"):
+        op.create_table(
+            "point_leaderboard",
+            sa.Column("user_id", sa.Integer(), autoincrement=False, nullable=False),
+            sa.Column("total_points", sa.Integer(), nullable=False),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(["user_id"], ["user.id"]),
+            sa.PrimaryKeyConstraint("user_id"),
+        )
+        op.create_index("ix_point_leaderboard_rank", "point_leaderboard", ["total_points", "user_id"])
+
+    # Same totals as app.point.leaderboard.total_query, timestamps in the app's local time
+    op.get_bind().execute(
+        sa.text(
+            "INSERT INTO point_leaderboard (user_id, total_points, updated_at) "
+            "SELECT user_id, SUM(COALESCE(login_amount, 0) + COALESCE(referral_amount, 0) + profit_amount), :now "
+            "FROM point "
+            "WHERE user_id IS NOT NULL "
+            "AND user_id NOT IN (SELECT user_id FROM point_leaderboard) "
+            "GROUP BY user_id"
+        ),
+        {"now": datetime.now()},
+    )
+
+
+def downgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("point_leaderboard"):
+        op.drop_table("point_leaderboard")
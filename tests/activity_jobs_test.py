@@ -0,0 +1,35 @@
+"""Chunked logged_in reset"""
+from sqlalchemy import func, select, update
+
+from app.activity import jobs
+from app.activity.models import ActivityModel
+from benchmarks.seed import seed
+
+
+def _not_logged_in(db) -> int:
+    return db.scalar(select(func.count()).where(ActivityModel.logged_in.is_(False)))
+
+
+def test_cut_short_run_resumes_on_a_later_day(engine, db):
+    seed(engine, users=30)
+    db.execute(update(ActivityModel).values(logged_in=False))
+    db.commit()
+
+    first = jobs.reset_logged_in(db, run_key="2024-06-01", chunk_size=10, max_seconds=0)
+    assert not first.finished
+    assert _not_logged_in(db) == 20
+
+    # No run key, as the cron calls it after the day has changed
+    resumed = jobs.reset_logged_in(db, chunk_size=10)
+    assert resumed.run_key == "2024-06-01"
+    assert resumed.finished
+    assert _not_logged_in(db) == 0
+
+
+def test_finished_run_starts_a_new_one(engine, db):
+    seed(engine, users=5)
+    jobs.reset_logged_in(db, run_key="2024-06-01")
+
+    progress = jobs.reset_logged_in(db)
+
+    assert progress.run_key != "2024-06-01"
@@ -0,0 +1,42 @@
+"""A pair of users is linked once, whichever of them sends the request"""
+from sqlalchemy import func, select, text
+
+from app.friend.models import FriendModel
+from benchmarks.seed import seed
+
+
+def _friend_count(db):
+    return db.scalar(select(func.count()).select_from(FriendModel))
+
+
+def test_reverse_pair_is_rejected_by_the_key(engine, db, client):
+    seed(engine, users=3)
+    db.execute(FriendModel.__table__.delete())
+    db.commit()
+    request = {"access_token": "", "sender_id": 1, "receiver_id": 2, "status": "pending", "has_claimed": False}
+
+    created = client.post("/api/v1/friend/create", json=request)
+    repeated = client.post("/api/v1/friend/create", json=request)
+    reverse = client.post("/api/v1/friend/create", json={**request, "sender_id": 2, "receiver_id": 1})
+
+    assert created.status_code == 200
+    assert repeated.json() == created.json()
+    assert reverse.status_code == 400
+    assert _friend_count(db) == 1
+
+
+def test_migration_moves_the_key_to_the_ordered_pair(engine, db, migrate):
+    seed(engine, users=3)
+    # The friend table as b5d93e27c1f4 left it
+    db.execute(text("DROP INDEX ux_friend_users"))
+    db.execute(text("ALTER TABLE friend DROP COLUMN low_user_id"))
+    db.execute(text("ALTER TABLE friend DROP COLUMN high_user_id"))
+    db.execute(text("CREATE UNIQUE INDEX ux_friend_pair ON friend (sender_id, receiver_id)"))
+    db.commit()
+
+    migrate("c6f1e8a2d947_friend_pair_key.py")
+
+    indexes = {row.name for row in db.execute(text("PRAGMA index_list(friend)"))}
+    assert "ux_friend_users" in indexes and "ux_friend_pair" not in indexes
+    pairs = db.execute(select(FriendModel.sender_id, FriendModel.receiver_id, FriendModel.low_user_id, FriendModel.high_user_id)).all()
+    assert pairs and all((low, high) == tuple(sorted((sender, receiver))) for sender, receiver, low, high in pairs)
@@ -0,0 +1,38 @@
+"""Pool metrics report what each pool class keeps, without failing on the others"""
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool, StaticPool
+
+from core import database
+
+
+def test_queue_pool_reports_occupancy_and_waits():
+    engine = create_engine("sqlite://", poolclass=database.TimedQueuePool, pool_size=2)
+    with engine.connect():
+        status = database.pool_status(engine.pool)
+    engine.dispose()
+
+    assert status["pool"] == "TimedQueuePool"
+    assert status["size"] == 2
+    assert status["checked_out"] == 1
+    assert status["checkouts"] == 1
+
+
+def test_other_pools_report_their_class_only():
+    for poolclass in (NullPool, StaticPool):
+        engine = create_engine("sqlite://", poolclass=poolclass)
+        status = database.pool_status(engine.pool)
+        engine.dispose()
+
+        assert status == {"pool": poolclass.__name__}
+
+
+def test_metrics_skip_states_of_pools_without_counters(client, monkeypatch):
+    engine = create_engine("sqlite://", poolclass=NullPool)
+    monkeypatch.setattr(database, "engine", engine)
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert 'db_pool_connections{pool="sync"' not in response.text
+    assert 'db_pool_connections{pool="async",state="checked_in"}' in response.text
+    assert client.get("/metrics/pool").json()["sync"] == {"pool": "NullPool"}
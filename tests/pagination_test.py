@@ -0,0 +1,54 @@
+"""Every list endpoint pages the same way"""
+import pytest
+from sqlalchemy import func, select
+
+from app.activity.api.v1.service import retrieve_activity_list
+from app.activity.models import ActivityModel
+from app.friend.api.v1.service import retrieve_friend_list
+from app.friend.models import FriendModel
+from app.game_character.api.v1.service import retrieve_game_character_all_list
+from app.game_character.models import GameCharacterModel
+from app.point.api.v1.service import retrieve_point_list
+from app.point.models import PointModel
+from app.user.api.v1.service import retrieve_users
+from app.user.models import UserModel
+from benchmarks.seed import seed
+
+LISTS = [
+    (lambda db, **kwargs: retrieve_point_list(db, None, **kwargs), PointModel, len),
+    (lambda db, **kwargs: retrieve_activity_list(db, None, **kwargs), ActivityModel, len),
+    (lambda db, **kwargs: retrieve_game_character_all_list(db, None, **kwargs), GameCharacterModel, len),
+    (lambda db, **kwargs: retrieve_users(db, **kwargs), UserModel, len),
+    (
+        lambda db, **kwargs: retrieve_friend_list(db, None, **kwargs),
+        FriendModel,
+        lambda items: len({friend.id for friend in items.sender + items.receiver}),
+    ),
+]
+
+
+@pytest.mark.parametrize("retrieve, model, count", LISTS)
+def test_cursor_walk_visits_every_row_once(engine, db, retrieve, model, count):
+    seed(engine, users=7)
+    rows = db.scalar(select(func.count()).select_from(model))
+    assert rows > 3
+
+    first = retrieve(db, skip=0, limit=3)
+    assert first.next_cursor is not None
+    assert retrieve(db, skip=0, limit=3, cursor="").next_cursor == first.next_cursor
+
+    seen, page = count(first.items), first
+    while page.next_cursor is not None:
+        page = retrieve(db, skip=0, limit=3, cursor=page.next_cursor)
+        seen += count(page.items)
+
+    assert seen == rows
+
+
+@pytest.mark.parametrize("retrieve, model, count", LISTS)
+def test_skip_only_applies_without_a_cursor(engine, db, retrieve, model, count):
+    seed(engine, users=7)
+    second = retrieve(db, skip=0, limit=3).next_cursor
+
+    assert retrieve(db, skip=3, limit=3).next_cursor == retrieve(db, skip=0, limit=3, cursor=second).next_cursor
+    assert retrieve(db, skip=3, limit=3, cursor=second).next_cursor == retrieve(db, skip=0, limit=3, cursor=second).next_cursor
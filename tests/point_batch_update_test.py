@@ -0,0 +1,63 @@
+"""Batch point updates land in the point rows and the leaderboard"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.point import schemas
+from app.point.api.v1 import service
+from app.point.models import PointLeaderboardModel, PointLedgerModel, PointModel
+from benchmarks.seed import seed
+
+
+def _batch(db, entries, **kwargs):
+    request = schemas.PointBatchUpdateRequestSchema(access_token="", entries=entries, **kwargs)
+    return service.batch_update_point(request, db)
+
+
+def _amounts(db):
+    return {
+        point.user_id: (point.login_amount, point.referral_amount, point.extra_profit_per_hour)
+        for point in db.scalars(select(PointModel).execution_options(populate_existing=True))
+    }
+
+
+def test_deltas_are_summed_per_user_and_field(engine, db, monkeypatch):
+    monkeypatch.setattr(service.Constants, "point_batch_chunk_size", 2)
+    seed(engine, users=5)
+    before = _amounts(db)
+
+    response = _batch(db, [
+        dict(user_id=1, field="login_amount", delta=10),
+        dict(user_id=1, field="login_amount", delta=5),
+        dict(user_id=3, field="referral_amount", delta=7),
+        dict(user_id=5, field="login_amount", delta=-2),
+        dict(user_id=99, field="login_amount", delta=1),
+        dict(user_id=2, field="coins", delta=1),
+    ], reason="tournament")
+
+    assert [result.status for result in response.results] == [
+        "applied", "applied", "applied", "applied", "not_found", "invalid_field",
+    ]
+    after = _amounts(db)
+    assert after[1][0] == before[1][0] + 15
+    assert after[3][1] == before[3][1] + 7
+    assert after[5][0] == before[5][0] - 2
+    assert after[2] == before[2] and after[4] == before[4]
+    totals = dict(db.execute(select(PointLeaderboardModel.user_id, PointLeaderboardModel.total_points)).all())
+    assert all(totals[user_id] == login + referral for user_id, (login, referral, _) in after.items())
+    # Written together with the rows, nothing is left for compaction
+    assert db.scalars(select(PointLedgerModel.compacted)).all() == [True, True, True]
+
+
+def test_rate_change_materializes_the_old_rate(engine, db):
+    seed(engine, users=2)
+    for point in db.scalars(select(PointModel)):
+        point.extra_profit_per_hour = 10
+        point.last_accrued_at = datetime.now() - timedelta(hours=2)
+    db.commit()
+
+    _batch(db, [dict(user_id=1, field="extra_profit_per_hour", delta=5)])
+
+    changed, untouched = db.get(PointModel, 1, populate_existing=True), db.get(PointModel, 2, populate_existing=True)
+    assert (changed.extra_profit_per_hour, changed.profit_amount) == (15, 20)
+    assert (untouched.extra_profit_per_hour, untouched.profit_amount) == (10, 0)
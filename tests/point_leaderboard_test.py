@@ -0,0 +1,94 @@
+"""The point ranking reads the leaderboard, the migration fills it"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select, text
+
+from app.point.api.v1 import service
+from app.point.leaderboard import refresh_point_totals
+from app.point.models import PointLeaderboardModel, PointModel
+from benchmarks.seed import seed
+
+
+def test_migration_backfills_missing_totals(engine, db, migrate):
+    seed(engine, users=5)
+    db.execute(delete(PointLeaderboardModel).where(PointLeaderboardModel.user_id != 1))
+    db.get(PointLeaderboardModel, 1).total_points = -1
+    # The point_leaderboard table as f3a8d61c2b70 created it
+    db.execute(text("ALTER TABLE point_leaderboard DROP COLUMN extra_profit_per_hour"))
+    db.execute(text("ALTER TABLE point_leaderboard DROP COLUMN last_accrued_at"))
+    db.commit()
+
+    migrate("f3a8d61c2b70_point_leaderboard.py")
+
+    totals = dict(db.execute(text("SELECT user_id, total_points FROM point_leaderboard")).all())
+    expected = dict(
+        db.execute(
+            select(PointModel.user_id, PointModel.login_amount + PointModel.referral_amount + PointModel.profit_amount)
+        ).all()
+    )
+    assert totals == {**expected, 1: -1}
+
+
+def test_ranking_does_not_write(engine, db):
+    seed(engine, users=3)
+    db.execute(delete(PointLeaderboardModel).where(PointLeaderboardModel.user_id == 2))
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        service.get_point_ranking(2, db)
+
+    assert error.value.status_code == 404
+    assert db.scalar(select(func.count()).select_from(PointLeaderboardModel)) == 2
+    assert service.get_point_ranking(1, db)["user_info"]["user_id"] == 1
+
+
+def test_ranking_counts_the_income_accrued_since_the_last_materialization(engine, db):
+    seed(engine, users=3)
+    for user_id, total in ((1, 300), (2, 200), (3, 100)):
+        db.get(PointLeaderboardModel, user_id).total_points = total
+    # 1000 an hour for an hour, not materialized: user 3 is at 1100
+    point = db.scalar(select(PointModel).where(PointModel.user_id == 3))
+    point.extra_profit_per_hour = 1000
+    point.last_accrued_at = datetime.now() - timedelta(hours=1, seconds=1)
+    db.flush()
+    refresh_point_totals(db, [3])
+    db.get(PointLeaderboardModel, 3).total_points = 100
+    db.commit()
+
+    ranking = service.get_point_ranking(2, db)
+
+    assert [record["user_id"] for record in ranking["top_10"]] == [3, 1, 2]
+    assert ranking["top_10"][0]["total_points"] == 1100
+    assert ranking["user_info"] == ranking["top_10"][2]
+    assert ranking["user_info"]["rank"] == 3
+
+
+def test_leaderboard_accrual_migration_copies_the_rate_and_clock(engine, db, migrate):
+    seed(engine, users=2)
+    accrued_at = datetime(2024, 6, 1, 12, 0)
+    point = db.scalar(select(PointModel).where(PointModel.user_id == 2))
+    point.extra_profit_per_hour = 25
+    point.last_accrued_at = accrued_at
+    db.execute(text("ALTER TABLE point_leaderboard DROP COLUMN extra_profit_per_hour"))
+    db.execute(text("ALTER TABLE point_leaderboard DROP COLUMN last_accrued_at"))
+    db.commit()
+
+    migrate("b8d2f4a6c931_point_leaderboard_accrual.py")
+
+    row = db.get(PointLeaderboardModel, 2)
+    assert (row.extra_profit_per_hour, row.last_accrued_at) == (25, accrued_at)
+
+
+def test_accrual_migration_backfills_in_app_time(engine, db, migrate):
+    seed(engine, users=2)
+    db.execute(text("ALTER TABLE point DROP COLUMN last_accrued_at"))
+    db.commit()
+
+    before = datetime.now().replace(microsecond=0)
+    migrate("e7c20b9a4d15_point_accrual.py")
+
+    stamps = db.scalars(select(PointModel.last_accrued_at)).all()
+    assert len(stamps) == 2
+    assert all(before <= stamp <= datetime.now() for stamp in stamps)
@@ -0,0 +1,102 @@
+"""Point updates are appended to the ledger and visible on every read path right away"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, text
+
+from app.point import leaderboard, ledger, schemas
+from app.point.api.v1 import service
+from app.point.models import PointLeaderboardModel, PointLedgerModel, PointModel
+from app.user.api.v1 import service as user_service
+from benchmarks.seed import seed
+
+
+def _update(db, point_id, type_, **payload):
+    return service.update_point(
+        schemas.PointUpdateByIdRequestSchema(id=point_id, type=type_, access_token="", point_payload=payload), db
+    )
+
+
+def _point(db, point_id):
+    db.expire_all()
+    return db.get(PointModel, point_id)
+
+
+def test_update_appends_without_writing_the_row(engine, db):
+    seed(engine, users=3)
+    point = _point(db, 2)
+    before, total = point.login_amount, db.get(PointLeaderboardModel, point.user_id).total_points
+
+    response = _update(db, 2, "add", login_amount=40, custom_logs={"source": "test"})
+
+    assert response.point_base.point.login_amount == before + 40
+    point = _point(db, 2)
+    assert point.login_amount == before
+    assert ledger.balance(point).login_amount == before + 40
+    assert db.get(PointLeaderboardModel, point.user_id).total_points == total
+    assert leaderboard.get_user_rank(db, point.user_id)["total_points"] == total + 40
+    entries = db.scalars(select(PointLedgerModel).where(PointLedgerModel.user_id == point.user_id)).all()
+    assert [(entry.reason, entry.login_amount, entry.compacted) for entry in entries] == [("update_add", 40, False)]
+
+
+def test_list_and_user_detail_see_the_update(engine, db):
+    seed(engine, users=3)
+    login_amount = _point(db, 1).login_amount - 5
+    _update(db, 1, "minus", login_amount=5)
+
+    listed = service.retrieve_point_list(db, [1]).items[0]
+    user = user_service.retrieve_user_extra_detail(1, None, None, None, db)
+
+    assert listed.point_base.point.login_amount == login_amount
+    assert user.user_details.point[0].login_amount == login_amount
+
+
+def test_rate_change_materializes_the_old_rate(engine, db):
+    seed(engine, users=1)
+    point = db.get(PointModel, 1)
+    point.extra_profit_per_hour = 10
+    point.last_accrued_at = datetime.now() - timedelta(hours=3)
+    db.commit()
+
+    _update(db, 1, "add", extra_profit_per_hour=20)
+
+    point = _point(db, 1)
+    assert point.extra_profit_per_hour == 30
+    assert point.profit_amount == 30
+    assert db.scalars(select(PointLedgerModel.compacted)).all() == [True]
+
+
+def test_compaction_folds_the_pending_entries_into_the_rows(engine, db, client):
+    seed(engine, users=3)
+    before = {point_id: ledger.balance(_point(db, point_id)) for point_id in (1, 2)}
+    _update(db, 1, "add", login_amount=7)
+    _update(db, 1, "minus", referral_amount=2)
+    _update(db, 2, "add", referral_amount=3)
+
+    progress = client.get("/api/v1/point/ledger/compact").json()
+
+    assert progress["entries"] == 3 and progress["finished"]
+    assert db.scalars(select(PointLedgerModel).where(PointLedgerModel.compacted.is_(False))).all() == []
+    first, second = _point(db, 1), _point(db, 2)
+    assert (first.login_amount, first.referral_amount) == (before[1].login_amount + 7, before[1].referral_amount - 2)
+    assert (first.pending_login_amount, first.pending_referral_amount) == (0, 0)
+    assert second.referral_amount == before[2].referral_amount + 3
+    assert ledger.balance(first).total_points == db.get(PointLeaderboardModel, first.user_id).total_points
+    assert ledger.compact(db)["entries"] == 0
+
+
+def test_migration_marks_the_existing_entries_compacted(engine, db, migrate):
+    seed(engine, users=2)
+    # The point_ledger table as d1a6f4c83e92 left it, its entries already applied to the rows
+    db.execute(text("DROP INDEX ix_point_ledger_pending"))
+    db.execute(text("ALTER TABLE point_ledger DROP COLUMN compacted"))
+    db.execute(text(
+        "INSERT INTO point_ledger (user_id, login_amount, referral_amount, extra_profit_per_hour, reason, created_at) "
+        "VALUES (1, 5, 0, 0, 'update_add', '2024-06-01 12:00:00')"
+    ))
+    db.commit()
+
+    migrate("e5b7a9c3f182_point_ledger_compaction.py")
+
+    assert db.scalars(select(PointLedgerModel.compacted)).all() == [True]
+    point = _point(db, 1)
+    assert ledger.balance(point).login_amount == point.login_amount
@@ -0,0 +1,62 @@
+"""Slow query and N+1 detection"""
+import logging
+
+import pytest
+from sqlalchemy import select
+
+from app.user.models import UserModel
+from core import profiler as profiler_module
+from core.profiler import NPlusOneError, QueryProfiler
+from core.request_stats import collecting
+
+
+@pytest.fixture
+def attach(engine):
+    attached = []
+
+    def run(profiler):
+        profiler.attach(engine)
+        attached.append(profiler)
+        return profiler
+
+    yield run
+    for profiler in attached:
+        profiler.detach(engine)
+
+
+def _repeat(engine, times):
+    with engine.connect() as conn:
+        for user_id in range(times):
+            conn.execute(select(UserModel.id).where(UserModel.id == user_id)).all()
+
+
+def test_strict_mode_raises_past_the_threshold(engine, attach):
+    attach(QueryProfiler(slow_query_ms=60_000, n_plus_one_threshold=2, strict=True))
+
+    with collecting():
+        _repeat(engine, 2)
+        with pytest.raises(NPlusOneError):
+            _repeat(engine, 1)
+
+
+def test_lenient_mode_only_logs(engine, attach, caplog):
+    attach(QueryProfiler(slow_query_ms=60_000, n_plus_one_threshold=2))
+
+    with collecting(), caplog.at_level(logging.WARNING):
+        _repeat(engine, 5)
+
+    assert len([record for record in caplog.records if "N+1 suspected" in record.message]) == 1
+
+
+def test_streamed_results_are_not_explained(engine, attach, monkeypatch, caplog):
+    explained = []
+    monkeypatch.setattr(profiler_module, "_explain", lambda conn, statement, parameters: explained.append(statement) or ["plan"])
+    attach(QueryProfiler(slow_query_ms=0, n_plus_one_threshold=100))
+
+    with engine.connect() as conn, caplog.at_level(logging.WARNING):
+        conn.execute(select(UserModel.id), execution_options={"stream_results": True}).all()
+        assert explained == []
+        conn.execute(select(UserModel.id)).all()
+
+    assert len(explained) == 1
+    assert len([record for record in caplog.records if record.message.startswith("Slow query")]) == 2
@@ -0,0 +1,48 @@
+"""The referral ranking reads referral_count, the migration and the writers fill it"""
+from sqlalchemy import delete, func, select
+
+from app.friend.api.v1 import service
+from app.friend.leaderboard import rebuild_referral_counts
+from app.friend.models import FriendModel, ReferralCountModel
+from benchmarks.seed import seed
+
+
+def _counts(db):
+    return dict(db.execute(select(ReferralCountModel.sender_id, ReferralCountModel.referral_count)).all())
+
+
+def _expected(db):
+    return dict(db.execute(select(FriendModel.sender_id, func.count(FriendModel.id)).group_by(FriendModel.sender_id)).all())
+
+
+def test_migration_backfills_missing_counts(engine, db, migrate):
+    seed(engine, users=20)
+    kept = db.scalars(select(ReferralCountModel.sender_id)).first()
+    db.execute(delete(ReferralCountModel).where(ReferralCountModel.sender_id != kept))
+    db.get(ReferralCountModel, kept).referral_count = -1
+    db.commit()
+
+    migrate("a4e9c2d7b613_referral_count.py")
+
+    assert _counts(db) == {**_expected(db), kept: -1}
+
+
+def test_rebuild_matches_the_friend_table(engine, db):
+    seed(engine, users=20)
+    db.execute(delete(ReferralCountModel))
+    db.commit()
+
+    assert rebuild_referral_counts(db) == len(_expected(db))
+    assert _counts(db) == _expected(db)
+
+
+def test_update_friend_commits_status_and_counts_together(engine, db):
+    seed(engine, users=20)
+    friend = db.scalars(select(FriendModel)).first()
+
+    updated = service.update_friend(friend.id, None, None, "rejected", None, db)
+
+    assert [response.friend_details.friend_base.status for response in updated] == ["rejected"]
+    db.rollback()
+    assert db.get(FriendModel, friend.id, populate_existing=True).status == "rejected"
+    assert _counts(db) == _expected(db)
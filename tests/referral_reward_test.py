@@ -0,0 +1,55 @@
+"""Referral rewards are credited once, by whichever flow the client uses"""
+from sqlalchemy import select
+
+from app.friend.models import FriendModel
+from app.point import ledger
+from app.point.models import PointLeaderboardModel, PointModel
+from benchmarks.seed import seed
+from core.constants import Constants
+
+
+def _unclaimed_sender(db):
+    sender_id = db.scalars(select(FriendModel.sender_id).where(FriendModel.has_claimed.is_(False))).first()
+    unclaimed = len(db.scalars(select(FriendModel).where(FriendModel.sender_id == sender_id, FriendModel.has_claimed.is_(False))).all())
+    point = db.scalars(select(PointModel).where(PointModel.user_id == sender_id).order_by(PointModel.id)).first()
+    return sender_id, unclaimed, point.id, point.referral_amount
+
+
+def _point(db, sender_id):
+    db.expire_all()
+    return db.scalars(select(PointModel).where(PointModel.user_id == sender_id).order_by(PointModel.id)).first()
+
+
+def test_reward_claim_credits_the_claimed_referrals(engine, db, client):
+    seed(engine, users=20)
+    sender_id, unclaimed, _, before = _unclaimed_sender(db)
+    db.rollback()
+
+    response = client.post("/api/v1/friend/reward-claim", params={"sender_id": sender_id})
+
+    assert response.status_code == 200
+    assert len(response.json()) == unclaimed
+    point = _point(db, sender_id)
+    assert point.referral_amount == before + unclaimed * Constants.referral_reward_points
+    assert db.scalar(select(FriendModel).where(FriendModel.sender_id == sender_id, FriendModel.has_claimed.is_(False))) is None
+    total = db.get(PointLeaderboardModel, sender_id).total_points
+    assert total == point.login_amount + point.referral_amount + point.profit_amount
+
+
+def test_legacy_reward_update_leaves_the_credit_to_point_update(engine, db, client):
+    seed(engine, users=20)
+    sender_id, unclaimed, point_id, before = _unclaimed_sender(db)
+    db.rollback()
+
+    claimed = client.patch("/api/v1/friend/reward-update", params={"sender_id": sender_id})
+    credit = unclaimed * Constants.referral_reward_points
+    updated = client.put(
+        "/api/v1/point/update",
+        json={"id": point_id, "type": "add", "access_token": "", "point_payload": {"referral_amount": credit}},
+    )
+
+    assert claimed.status_code == 200
+    assert len(claimed.json()) == unclaimed
+    assert updated.status_code == 200
+    assert ledger.balance(_point(db, sender_id)).referral_amount == before + credit
+    assert client.patch("/api/v1/friend/reward-update", params={"sender_id": sender_id}).json() == []
@@ -0,0 +1,42 @@
+"""Responses are validated from the rows, the same way on every endpoint"""
+from datetime import datetime, timedelta
+
+from app.game_character.api.v1 import service as game_character_service
+from app.point.api.v1 import service as point_service
+from app.point.models import PointModel
+from app.user import schemas as user_schemas
+from app.user.api.v1 import service as user_service
+from benchmarks.seed import seed
+
+
+def test_update_user_returns_the_extra_detail_payload(engine, db):
+    seed(engine, users=3)
+    request = user_schemas.UserUpdateRequestSchema(id=2, access_token="", user_payload=user_schemas.UserUpdateDetailsSchema(location="JP"))
+
+    updated = user_service.update_user(request, db)
+    detail = user_service.retrieve_user_extra_detail(2, None, None, None, db)
+
+    assert updated.user_details == detail.user_details
+    assert updated.user_details.user_base.personal_info.location == "JP"
+
+
+def test_list_items_carry_accrued_profit_and_singapore_time(engine, db):
+    seed(engine, users=2)
+    point = db.get(PointModel, 1)
+    point.extra_profit_per_hour = 10
+    point.last_accrued_at = datetime.now() - timedelta(hours=2)
+    db.commit()
+
+    listed = point_service.retrieve_point_list(db, [point.user_id]).items[0].point_base.point
+    single = point_service.retrieve_point(1, None, db).point_base.point
+
+    assert listed.profit_amount == single.profit_amount == point.profit_amount + 20
+    assert listed.created_at.utcoffset() == timedelta(hours=8)
+
+
+def test_game_character_list_matches_the_single_view(engine, db):
+    seed(engine, users=2)
+    listed = game_character_service.retrieve_game_character_all_list(db, None, limit=1).items[0]
+    character_id = listed.character_details.game_character_base.id
+
+    assert [listed] == game_character_service.retrieve_game_character(character_id, None, db)
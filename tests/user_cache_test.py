@@ -0,0 +1,104 @@
+"""User detail cache on the memory and the Redis backend"""
+import asyncio
+import fnmatch
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.user import cache as user_cache
+from app.user.api.v1 import service
+from benchmarks.seed import seed
+from core import cache
+
+
+class FakeRedis:
+    """The part of the redis client RedisCache uses, values kept as bytes"""
+
+    def __init__(self):
+        self.data = {}
+        self.expiry = {}
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.threads.add(threading.get_ident())
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        self.expiry[key] = ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, pattern):
+        return [key for key in list(self.data) if fnmatch.fnmatch(key, pattern)]
+
+
+@pytest.fixture
+def fake_redis():
+    client = FakeRedis()
+    cache.set_cache(cache.RedisCache(client, ttl=60))
+    return client
+
+
+def test_backends_implement_the_whole_interface():
+    with pytest.raises(TypeError):
+        cache.CacheBackend()
+
+
+def test_read_from_before_an_invalidation_is_not_stored(engine, db):
+    seed(engine, users=2)
+    started = user_cache.read_started()
+    response = service.retrieve_user(1, None, None, None, db)
+    user_cache.invalidate_user(1)
+
+    user_cache.store_user_response(user_cache.DETAIL, response, started)
+    assert user_cache.get_user_response(user_cache.DETAIL, 1, None, None, None) is None
+
+    user_cache.store_user_response(user_cache.DETAIL, response, user_cache.read_started())
+    assert user_cache.get_user_response(user_cache.DETAIL, 1, None, None, None) == response
+
+
+def test_redis_backend_round_trip(engine, db, fake_redis):
+    seed(engine, users=2)
+    response = service.retrieve_user(2, None, None, None, db)
+    telegram_id = response.user_details.user_base.telegram_info.telegram_id
+
+    assert fake_redis.expiry["golfin:user:detail:2"] == 60
+    assert user_cache.get_user_response(user_cache.DETAIL, None, None, telegram_id, None) == response
+
+    user_cache.invalidate_user(2)
+    assert "golfin:user:detail:2" not in fake_redis.data
+    assert user_cache.get_user_response(user_cache.DETAIL, 2, None, None, None) is None
+
+    cache.get_cache().clear()
+    assert fake_redis.data == {}
+
+
+def test_async_reads_keep_redis_calls_off_the_event_loop(tmp_path, fake_redis):
+    # A file the sync seeder and the async engine both open
+    url = f"sqlite:///{tmp_path / 'cache.db'}"
+    engine = create_engine(url)
+    seed(engine, users=2)
+    engine.dispose()
+
+    async def read():
+        async_engine = create_async_engine(url.replace("sqlite://", "sqlite+aiosqlite://"))
+        try:
+            async with AsyncSession(async_engine) as db:
+                first = await service.retrieve_user_async(1, None, None, None, db)
+                second = await service.retrieve_user_async(1, None, None, None, db)
+                await user_cache.invalidate_user_async(1)
+                return first, second, threading.get_ident()
+        finally:
+            await async_engine.dispose()
+
+    first, second, loop_thread = asyncio.run(read())
+
+    assert second == first
+    assert "golfin:user:detail:1" not in fake_redis.data
+    assert fake_redis.threads and loop_thread not in fake_redis.threads
@@ -0,0 +1,27 @@
+"""Signup creates a user once, a repeated signup is rejected"""
+from sqlalchemy import func, select
+
+from app.user.models import UserModel
+
+SIGNUP = {
+    "app_info": {"active": True, "skin": []},
+    "personal_info": {"location": "SG", "nationality": "SG"},
+    "telegram_info": {"username": "golfer", "telegram_id": "7001", "token_balance": 0, "premium": False, "chat_id": "7001"},
+}
+
+
+def test_repeated_signup_is_rejected_without_the_stored_user(db, client):
+    created = client.post("/api/v1/user/create", json={**SIGNUP, "access_token": "secret"})
+    repeated = client.post("/api/v1/user/create", json=SIGNUP)
+
+    assert created.status_code == 201
+    assert repeated.status_code == 409
+    assert "secret" not in repeated.text
+    assert db.scalar(select(func.count()).select_from(UserModel)) == 1
+
+
+def test_taken_username_is_rejected(client):
+    client.post("/api/v1/user/create", json=SIGNUP)
+    other = {**SIGNUP, "telegram_info": {**SIGNUP["telegram_info"], "telegram_id": "7002"}}
+
+    assert client.post("/api/v1/user/create", json=other).status_code == 400
@@ -0,0 +1,42 @@
+"""User list paging across more users than one load batch"""
+from app.user.api.v1 import service
+from benchmarks.seed import seed
+
+
+def _page_ids(page):
+    return [response.user_details.user_base.id for response in page.items]
+
+
+def test_page_larger_than_load_batch_is_complete(engine, db, monkeypatch):
+    monkeypatch.setattr(service, "USER_LIST_CHUNK_SIZE", 4)
+    seed(engine, users=23)
+
+    page = service.retrieve_users(db, skip=0, limit=10)
+
+    assert _page_ids(page) == list(range(1, 11))
+    assert page.next_cursor is not None
+
+
+def test_cursor_walks_every_user_once(engine, db, monkeypatch):
+    monkeypatch.setattr(service, "USER_LIST_CHUNK_SIZE", 4)
+    seed(engine, users=23)
+
+    seen, cursor = [], None
+    while True:
+        page = service.retrieve_users(db, skip=0, limit=10, cursor=cursor)
+        seen.extend(_page_ids(page))
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert seen == list(range(1, 24))
+
+
+def test_entries_carry_their_relationships(engine, db, monkeypatch):
+    monkeypatch.setattr(service, "USER_LIST_CHUNK_SIZE", 4)
+    seed(engine, users=9)
+
+    page = service.retrieve_users(db, skip=0, limit=9)
+
+    assert all(len(response.user_details.point) == 1 for response in page.items)
+    assert all(len(response.user_details.activity) == 1 for response in page.items)